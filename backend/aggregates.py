@@ -0,0 +1,72 @@
+"""SQL-side aggregates over a user's transactions and envelopes.
+
+Everything here returns plain scalars computed by the database (SUM with CASE
+by type) instead of hydrating ORM rows and summing them in Python.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+
+from database import Cycle, CategoryBudget, Transaction, TransactionType
+
+INCOME_TYPES = (TransactionType.INCOME, TransactionType.SALARY)
+
+
+def _sum_where(condition, value=Transaction.amount):
+    return func.coalesce(func.sum(case((condition, value), else_=0.0)), 0.0)
+
+
+def income_sum():
+    return _sum_where(Transaction.type.in_(INCOME_TYPES))
+
+
+def expense_sum():
+    return _sum_where(Transaction.type == TransactionType.EXPENSE)
+
+
+def month_bounds(now: Optional[datetime] = None) -> tuple:
+    """[start, end) of the calendar month containing `now`."""
+    now = now or datetime.utcnow()
+    start = datetime(now.year, now.month, 1)
+    end = datetime(now.year + 1, 1, 1) if now.month == 12 else datetime(now.year, now.month + 1, 1)
+    return start, end
+
+
+def month_key_bounds(month_key: str) -> tuple:
+    """[start, end) for a "YYYY-MM" key, as used by the report month filters."""
+    return month_bounds(datetime.strptime(month_key, "%Y-%m"))
+
+
+def user_totals(db: Session, user_id: int, period_start: datetime = None, period_end: datetime = None) -> dict:
+    """Lifetime income / expenses for a user, plus expenses inside [period_start, period_end)
+    when a period is given — all from a single aggregate query."""
+    columns = [income_sum(), expense_sum()]
+    if period_start is not None and period_end is not None:
+        columns.append(_sum_where(and_(
+            Transaction.type == TransactionType.EXPENSE,
+            Transaction.date >= period_start,
+            Transaction.date < period_end,
+        )))
+    row = (
+        db.query(*columns)
+        .select_from(Transaction)
+        .join(Cycle, Transaction.cycle_id == Cycle.id)
+        .filter(Cycle.user_id == user_id)
+        .one()
+    )
+    return {
+        "total_income": float(row[0]),
+        "total_expenses": float(row[1]),
+        "period_expenses": float(row[2]) if len(row) > 2 else 0.0,
+    }
+
+
+def envelope_locked(db: Session, cycle_id: int) -> float:
+    """Money allocated to a cycle's envelopes but not yet spent: Σ max(0, allocated − spent)."""
+    remaining = CategoryBudget.allocated_amount - CategoryBudget.spent_amount
+    value = db.query(
+        func.coalesce(func.sum(case((remaining > 0, remaining), else_=0.0)), 0.0)
+    ).filter(CategoryBudget.cycle_id == cycle_id).scalar()
+    return float(value or 0.0)
@@ -1,4 +1,5 @@
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from passwords import hash_password_sync
 from database import User
 
 def register_user(db_session, username, password):
@@ -6,7 +7,7 @@ def register_user(db_session, username, password):
     if existing_user:
         return False, "Username already exists."
     
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password_sync(password)
     new_user = User(username=username, password_hash=password_hash)
     db_session.add(new_user)
     db_session.commit()
@@ -0,0 +1,169 @@
+"""Opening a user in the admin portal: the whole account in one response vs. header + first page.
+
+    python -m benchmarks.admin_user_detail [--sizes 1000,10000,100000] [--polls 20]
+
+Seeds a user per size with that many transactions (plus envelopes, reminders,
+rollups and ledger) and calls the app in-process (httpx ASGI transport):
+
+  before        the previous GET /api/admin/users/{id}: every transaction,
+                envelope and reminder in one response
+  header+page   GET /api/admin/users/{id} and the first page (50) of
+                /api/admin/users/{id}/transactions, what the portal loads
+  deep page     the 20th page of transactions, following next_cursor
+  re-poll       the header and first page again with If-None-Match (304)
+
+Reports p50 / max latency and bytes on the wire per variant.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import SessionLocal, engine, seed_user
+from database import init_db, CategoryBudget, Cycle, Reminder, ReminderType, User
+
+
+def add_legacy_route(app):
+    """GET /bench/user-detail-legacy/{id} with the pre-paging detail body."""
+    from fastapi import Depends
+    from sqlalchemy.orm import Session
+
+    from database import get_db, Transaction, TransactionType
+
+    @app.get("/bench/user-detail-legacy/{user_id}")
+    def legacy_detail(user_id: int, db: Session = Depends(get_db)):
+        user = db.query(User).filter(User.id == user_id).first()
+        all_txs = db.query(Transaction).join(Cycle).filter(Cycle.user_id == user_id).order_by(Transaction.date.desc()).all()
+        total_income = sum(t.amount for t in all_txs if t.type in (TransactionType.INCOME, TransactionType.SALARY))
+        total_expenses = sum(t.amount for t in all_txs if t.type == TransactionType.EXPENSE)
+        cycle = db.query(Cycle).filter(Cycle.user_id == user_id).order_by(Cycle.id.desc()).first()
+        budgets = db.query(CategoryBudget).filter(CategoryBudget.cycle_id == cycle.id).all()
+        locked = sum(max(0.0, b.allocated_amount - b.spent_amount) for b in budgets)
+        reminders = db.query(Reminder).filter(Reminder.user_id == user_id).order_by(Reminder.due_date.asc()).all()
+        return {
+            "id": user.id, "username": user.username,
+            "created_at": user.created_at.strftime("%Y-%m-%d %H:%M") if user.created_at else "—",
+            "total_income": round(total_income, 2), "total_expenses": round(total_expenses, 2),
+            "available_balance": round(total_income - total_expenses - locked, 2),
+            "transactions": [{"id": t.id, "type": t.type.value, "category": t.category, "amount": t.amount,
+                              "source": t.source.value, "description": t.description,
+                              "date": t.date.strftime("%Y-%m-%d %H:%M")} for t in all_txs],
+            "envelopes": [{"id": b.id, "category": b.category_name, "allocated": b.allocated_amount,
+                           "spent": b.spent_amount, "remaining": max(0, b.allocated_amount - b.spent_amount)}
+                          for b in budgets],
+            "reminders": [{"id": r.id, "title": r.title, "amount": r.amount, "type": r.type.value,
+                           "due_date": r.due_date.strftime("%Y-%m-%d") if r.due_date else None,
+                           "is_paid": r.is_paid} for r in reminders],
+        }
+
+
+def seed_account(size: int) -> int:
+    import ledger
+    import rollups
+
+    user_id = seed_user(f"detail_bench_{size}", size)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        cycle_id = db.query(Cycle.id).filter(Cycle.user_id == user_id).scalar()
+    finally:
+        db.close()
+    with engine.begin() as conn:
+        conn.execute(CategoryBudget.__table__.insert(), [
+            {"cycle_id": cycle_id, "category_name": cat, "allocated_amount": 5000.0, "spent_amount": 1000.0}
+            for cat in ("food", "rent", "fun", "transport", "health")
+        ])
+        conn.execute(Reminder.__table__.insert(), [
+            {"user_id": user_id, "title": f"bill {i}", "amount": 100.0, "is_paid": False,
+             "type": ReminderType.BILL.name, "due_date": now + timedelta(days=i)}
+            for i in range(40)
+        ])
+    db = SessionLocal()
+    try:
+        rollups.backfill(db, user_id)
+        ledger.backfill_missing(db)
+        db.commit()
+    finally:
+        db.close()
+    return user_id
+
+
+async def measure(client, fetch, polls: int) -> dict:
+    samples, sizes = [], []
+    for _ in range(polls):
+        t0 = time.perf_counter()
+        sizes.append(await fetch())
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {"p50": statistics.median(samples), "max": samples[-1], "bytes": sizes[-1]}
+
+
+async def run(sizes: list, polls: int) -> list:
+    import httpx
+
+    from main import app
+    from routes.auth import create_access_token
+
+    init_db()
+    add_legacy_route(app)
+    db = SessionLocal()
+    db.add(User(username="detail_bench_admin", password_hash="x", is_admin=True))
+    db.commit()
+    db.close()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'detail_bench_admin'})}"}
+
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        async def get(path, **kw) -> httpx.Response:
+            r = await client.get(path, headers={**headers, **kw.pop("extra", {})}, **kw)
+            assert r.status_code in (200, 304), r.text
+            return r
+
+        for size in sizes:
+            user_id = seed_account(size)
+            base = f"/api/admin/users/{user_id}"
+
+            async def before():
+                return len((await get(f"/bench/user-detail-legacy/{user_id}")).content)
+
+            async def first_view():
+                header, page = await get(base), await get(f"{base}/transactions")
+                return len(header.content) + len(page.content)
+
+            cursor = None
+            for _ in range(19):
+                cursor = (await get(f"{base}/transactions", params={"cursor": cursor} if cursor else {})).json()["next_cursor"]
+
+            async def deep_page():
+                return len((await get(f"{base}/transactions", params={"cursor": cursor})).content)
+
+            tags = ((await get(base)).headers["etag"], (await get(f"{base}/transactions")).headers["etag"])
+
+            async def repoll():
+                header = await get(base, extra={"If-None-Match": tags[0]})
+                page = await get(f"{base}/transactions", extra={"If-None-Match": tags[1]})
+                assert header.status_code == page.status_code == 304
+                return len(header.content) + len(page.content)
+
+            for name, fetch in (("before", before), ("header+page", first_view),
+                                ("deep page", deep_page), ("re-poll", repoll)):
+                rows.append((size, name, await measure(client, fetch, polls if name != "before" or size < 100_000 else 3)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--polls", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = asyncio.run(run([int(s) for s in args.sizes.split(",")], args.polls))
+    print(f"{'transactions':>12}  {'variant':>12}  {'p50 ms':>9}  {'max ms':>9}  {'bytes':>11}")
+    for size, name, r in rows:
+        print(f"{size:>12,}  {name:>12}  {r['p50']:>9.1f}  {r['max']:>9.1f}  {r['bytes']:>11,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Admin user listing at 1k, 10k and 100k users: per-user queries vs. grouped aggregates.
+
+    python -m benchmarks.admin_users [--sizes 1000,10000,100000] [--transactions 12]
+
+Seeds users with a cycle, `--transactions` transactions each, three envelopes
+and two reminders (core inserts, then the rollup and ledger backfills), then times:
+
+  before        the previous list_users: `_user_summary` for every user
+                (only up to 2,000 users; it grows linearly from there)
+  page          one /users/page request: 50 users sorted by balance, spend or
+                id, or filtered by a username search, plus the portal totals
+  full list     /users returning every user in one response
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import SessionLocal, engine, timed
+from database import (
+    init_db, Cycle, CycleStatus, CategoryBudget, Reminder, ReminderType, Transaction, TransactionType,
+    TransactionSource, User,
+)
+
+LEGACY_MAX_USERS = 2000
+
+
+def legacy_list_users(db):
+    """The pre-aggregate list_users body, for comparison."""
+    from routes.admin import UserSummary
+
+    def summary(user):
+        all_txs = db.query(Transaction).join(Cycle).filter(Cycle.user_id == user.id).all()
+        total_income = sum(t.amount for t in all_txs if t.type in (TransactionType.INCOME, TransactionType.SALARY))
+        total_expenses = sum(t.amount for t in all_txs if t.type == TransactionType.EXPENSE)
+        cycle = db.query(Cycle).filter(Cycle.user_id == user.id).order_by(Cycle.id.desc()).first()
+        locked, env_count = 0.0, 0
+        if cycle:
+            budgets = db.query(CategoryBudget).filter(CategoryBudget.cycle_id == cycle.id).all()
+            locked = sum(max(0.0, b.allocated_amount - b.spent_amount) for b in budgets)
+            env_count = len(budgets)
+        rem_count = db.query(Reminder).filter(Reminder.user_id == user.id).count()
+        return UserSummary(
+            id=user.id, username=user.username,
+            created_at=user.created_at.strftime("%Y-%m-%d %H:%M") if user.created_at else "—",
+            total_income=round(total_income, 2), total_expenses=round(total_expenses, 2),
+            available_balance=round(total_income - total_expenses - locked, 2),
+            transaction_count=len(all_txs), envelope_count=env_count, reminder_count=rem_count,
+        )
+
+    users = db.query(User).filter(User.is_admin == False).order_by(User.id).all()
+    return [summary(u) for u in users]
+
+
+def seed_users(start: int, stop: int, per_user: int):
+    """Add users start..stop-1 (ids follow insertion order) with their data, via core inserts."""
+    rnd = random.Random(start)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        first_user = (conn.execute(User.__table__.select().with_only_columns(User.id).order_by(User.id.desc())
+                                   .limit(1)).scalar() or 0) + 1
+        conn.execute(User.__table__.insert(), [
+            {"id": first_user + i, "username": f"bench_user_{n:06d}", "password_hash": "x", "is_admin": False,
+             "created_at": now - timedelta(days=rnd.randint(0, 700))}
+            for i, n in enumerate(range(start, stop))
+        ])
+        user_ids = range(first_user, first_user + stop - start)
+        first_cycle = (conn.execute(Cycle.__table__.select().with_only_columns(Cycle.id).order_by(Cycle.id.desc())
+                                    .limit(1)).scalar() or 0) + 1
+        conn.execute(Cycle.__table__.insert(), [
+            {"id": first_cycle + i, "user_id": uid, "status": CycleStatus.ACTIVE.name, "start_date": now}
+            for i, uid in enumerate(user_ids)
+        ])
+        budgets, reminders, txs = [], [], []
+        for i, uid in enumerate(user_ids):
+            cycle_id = first_cycle + i
+            for category in ("food", "rent", "fun"):
+                budgets.append({"cycle_id": cycle_id, "category_name": category,
+                                "allocated_amount": 5000.0, "spent_amount": float(rnd.randint(0, 7000))})
+            for k in range(2):
+                reminders.append({"user_id": uid, "title": f"bill {k}", "amount": 500.0, "is_paid": False,
+                                  "type": ReminderType.CUSTOM.name, "due_date": now + timedelta(days=k)})
+            for k in range(per_user):
+                income = k == 0
+                txs.append({
+                    "cycle_id": cycle_id,
+                    "type": (TransactionType.SALARY if income else TransactionType.EXPENSE).name,
+                    "category": "salary" if income else rnd.choice(("food", "rent", "fun")),
+                    "amount": float(rnd.randint(20000, 80000) if income else rnd.randint(50, 4000)),
+                    "date": now - timedelta(days=rnd.randint(0, 90)),
+                    "source": TransactionSource.MAIN_BALANCE.name,
+                })
+        conn.execute(CategoryBudget.__table__.insert(), budgets)
+        conn.execute(Reminder.__table__.insert(), reminders)
+        conn.execute(Transaction.__table__.insert(), txs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--transactions", type=int, default=12, help="transactions per user")
+    args = parser.parse_args()
+
+    import ledger
+    import rollups
+    from routes.admin import user_summaries, user_totals
+
+    init_db()
+    print(f"{'users':>8}  {'variant':>22}  {'p50 ms':>9}  {'max ms':>9}")
+    seeded = 0
+    for size in [int(s) for s in args.sizes.split(",")]:
+        seed_users(seeded, size, args.transactions)
+        seeded = size
+        db = SessionLocal()
+        try:
+            rollups.backfill(db)
+            ledger.backfill_missing(db)
+            db.commit()
+
+            if size <= LEGACY_MAX_USERS:
+                t0 = time.perf_counter()
+                legacy = legacy_list_users(db)
+                took = (time.perf_counter() - t0) * 1000
+                print(f"{size:>8,}  {'before (per user)':>22}  {took:>9.0f}  {took:>9.0f}")
+                assert legacy == user_summaries(db), "grouped summaries differ from the per-user ones"
+
+            variants = {
+                "page: balance desc": lambda: (user_totals(db), user_summaries(db, sort="balance", order="desc", limit=50)),
+                "page: spend desc": lambda: (user_totals(db), user_summaries(db, sort="spend", order="desc", limit=50)),
+                "page: id, offset 90%": lambda: (user_totals(db), user_summaries(db, limit=50, offset=int(size * 0.9))),
+                "page: search '0042'": lambda: (user_totals(db, "0042"), user_summaries(db, q="0042", limit=50)),
+                "full list": lambda: user_summaries(db),
+            }
+            for name, fn in variants.items():
+                r = timed(fn, repeat=5 if name == "full list" else 10)
+                print(f"{size:>8,}  {name:>22}  {r['p50']:>9.1f}  {r['p99']:>9.1f}")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Latency of an authenticated no-op endpoint: per-request user lookup vs. the principal cache.
+
+    python -m benchmarks.auth_latency [--requests 2000] [--concurrency 1]
+
+Calls the app in-process (httpx ASGI transport, no network) and reports
+p50/p99 for three variants of the same endpoint:
+
+  before      the previous get_current_user: decode the JWT, open a session via
+              get_db, look the user up by username
+  cache off   the current dependency with AUTH_CACHE_TTL=0: a primary-key
+              lookup on every request
+  cache on    the current dependency: validated principals served from memory
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import init_db  # also points DATABASE_URL at a throw-away database
+
+
+def add_legacy_route(app):
+    """GET /bench/me-legacy with the pre-cache dependency."""
+    from fastapi import Depends, HTTPException
+    from jose import JWTError, jwt
+    from sqlalchemy.orm import Session
+
+    from database import get_db, User
+    from routes.auth import ALGORITHM, SECRET_KEY, oauth2_scheme
+
+    def legacy_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+        try:
+            username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        db.expunge(user)
+        db.commit()
+        return user
+
+    @app.get("/bench/me-legacy")
+    def me_legacy(current_user=Depends(legacy_current_user)):
+        return {"id": current_user.id, "username": current_user.username, "is_admin": current_user.is_admin}
+
+
+async def measure(client, path: str, token: str, requests: int, concurrency: int) -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    samples = []
+
+    async def worker(n: int):
+        for _ in range(n):
+            t0 = time.perf_counter()
+            r = await client.get(path, headers=headers)
+            samples.append((time.perf_counter() - t0) * 1000)
+            assert r.status_code == 200, r.text
+
+    for _ in range(50):  # warm up
+        await client.get(path, headers=headers)
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+async def run(requests: int, concurrency: int):
+    import httpx
+
+    from main import app
+    from routes import auth
+
+    init_db()
+    add_legacy_route(app)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        token = (await client.post("/api/auth/register", json={"username": "auth_bench", "password": "pw"})
+                 ).json()["access_token"]
+
+        results = {"before": await measure(client, "/bench/me-legacy", token, requests, concurrency)}
+        auth.principal_cache.ttl = 0
+        auth.principal_cache.clear()
+        results["cache off"] = await measure(client, "/api/auth/me", token, requests, concurrency)
+        auth.principal_cache.ttl = auth.AUTH_CACHE_TTL or 60
+        results["cache on"] = await measure(client, "/api/auth/me", token, requests, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.concurrency))
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'variant':>10}  {'p50 ms':>8}  {'p99 ms':>8}")
+    for name, r in results.items():
+        print(f"{name:>10}  {r['p50']:>8.3f}  {r['p99']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""SQL statement count and latency of the chat context builder vs. number of past periods.
+
+    python -m benchmarks.chat_context [--cycles 1,10,40,200] [--per-cycle 200] [--repeat 20]
+
+The statement count must not grow with the history; the run exits non-zero if it does.
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import (
+    CATEGORIES, SessionLocal, engine, init_db, timed,
+    User, Cycle, CycleStatus, Transaction, TransactionType, TransactionSource,
+)
+import rollups
+from chat_context import build_chat_context
+
+
+def seed_cycles(username: str, n_cycles: int, per_cycle: int) -> int:
+    """A user with `n_cycles` closed monthly periods plus an active one,
+    `per_cycle` transactions each, and the rollup built for them."""
+    init_db()
+    db = SessionLocal()
+    try:
+        user = User(username=username, password_hash="x", is_admin=False)
+        db.add(user)
+        db.commit()
+        start = datetime.utcnow() - timedelta(days=30 * (n_cycles + 1))
+        cycles = []
+        for i in range(n_cycles + 1):
+            closed = i < n_cycles
+            cycle = Cycle(user_id=user.id, start_date=start + timedelta(days=30 * i),
+                          status=CycleStatus.CLOSED if closed else CycleStatus.ACTIVE)
+            db.add(cycle)
+            cycles.append(cycle)
+        db.commit()
+        user_id, cycle_ids = user.id, [(c.id, c.start_date) for c in cycles]
+    finally:
+        db.close()
+
+    rnd = random.Random(n_cycles)
+    rows = []
+    for cycle_id, cycle_start in cycle_ids:
+        for i in range(per_cycle):
+            rows.append({
+                "cycle_id": cycle_id,
+                "type": TransactionType.EXPENSE.name,
+                "category": rnd.choice(CATEGORIES),
+                "amount": float(rnd.randint(20, 4000)),
+                "date": cycle_start + timedelta(seconds=rnd.randint(0, 29 * 86400)),
+                "source": TransactionSource.MAIN_BALANCE.name,
+                "description": f"bench row {i}",
+            })
+    with engine.begin() as conn:
+        conn.execute(Transaction.__table__.insert(), rows)
+
+    db = SessionLocal()
+    try:
+        rollups.backfill(db, user_id)
+        db.commit()
+    finally:
+        db.close()
+    return user_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cycles", default="1,10,40,200")
+    parser.add_argument("--per-cycle", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'past periods':>12}  {'queries':>7}  {'p50 ms':>9}  {'p99 ms':>9}  {'past_periods ms':>15}")
+    counts = set()
+    for n in [int(s) for s in args.cycles.split(",")]:
+        user_id = seed_cycles(f"bench_ctx_{n}", n, args.per_cycle)
+        db = SessionLocal()
+        try:
+            active = db.query(Cycle).filter(Cycle.user_id == user_id, Cycle.status != CycleStatus.CLOSED).one()
+            build_chat_context(db, user_id, active)  # first call builds the balance ledger
+            context = build_chat_context(db, user_id, active)
+            stats = timed(lambda: build_chat_context(db, user_id, active), repeat=args.repeat)
+        finally:
+            db.close()
+        counts.add(context.stats["queries"])
+        print(f"{n:>12,}  {context.stats['queries']:>7}  {stats['p50']:>9.2f}  {stats['p99']:>9.2f}  "
+              f"{context.stats['timings_ms']['past_periods']:>15.2f}")
+
+    if len(counts) != 1:
+        sys.exit(f"SQL statement count varies with history size: {sorted(counts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Concurrent chat throughput against a local fake LLM: blocking vs. async pipeline.
+
+    python -m benchmarks.chat_load [--concurrency 200] [--llm-latency 3.0] [--users 20]
+
+Starts a fake Azure OpenAI server that answers every chat completion after
+--llm-latency seconds, points the app at it and serves the app with uvicorn.
+It then fires --concurrency simultaneous chats at
+
+  sync   a blocking handler that calls the LLM with the synchronous client
+         (how POST /api/chat/ used to work — one threadpool worker per
+         in-flight LLM call), and
+  async  POST /api/chat/ itself,
+
+while polling /api/health, and reports throughput and health-check latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+
+from benchmarks.common import init_db  # also points DATABASE_URL at a throw-away database
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def fake_llm_app(latency: float):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def completions(deployment: str):
+        await asyncio.sleep(latency)
+        content = json.dumps({"transactions": [], "reminder_actions": [], "ai_insight": "All good."})
+        return {
+            "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": deployment,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+        }
+
+    return app
+
+
+def add_blocking_chat_route(app):
+    """The pre-async pipeline: a sync handler doing DB work and the LLM call in one worker thread."""
+    from fastapi import Depends
+    from openai import AzureOpenAI
+    from sqlalchemy.orm import Session
+
+    import routes.chat as chat
+    from database import get_db
+    from routes.auth import get_current_user
+    from schemas import NLPResponse
+
+    client = AzureOpenAI(
+        azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+        api_key=os.environ["AZURE_OPENAI_API_KEY"],
+        api_version=os.getenv("OPENAI_API_VERSION", "2024-12-01-preview"),
+    )
+
+    @app.post("/bench/chat-sync", response_model=chat.ChatResponse)
+    def chat_sync(req: chat.ChatRequest, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+        sm, active_cycle, context, _key, _cached = chat._load_context(db, current_user.id, req)
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            response_format={"type": "json_object"},
+            messages=[{"role": "system", "content": context.text}, {"role": "user", "content": req.message}],
+        )
+        nlp_response = NLPResponse(**json.loads(response.choices[0].message.content))
+        return chat._apply_response(db, current_user.id, sm, active_cycle, nlp_response)
+
+
+async def run_load(base_url: str, path: str, tokens: list, concurrency: int) -> dict:
+    import httpx
+
+    health = []
+    done = asyncio.Event()
+    limits = httpx.Limits(max_connections=concurrency + 10, max_keepalive_connections=concurrency + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def probe():
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await client.get("/api/health")
+                health.append((time.perf_counter() - t0) * 1000)
+                await asyncio.sleep(0.05)
+
+        async def one(i):
+            r = await client.post(path, json={"message": "how much balance left?"},
+                                  headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+            return r.status_code
+
+        prober = asyncio.create_task(probe())
+        t0 = time.perf_counter()
+        codes = await asyncio.gather(*(one(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await prober
+
+    health.sort()
+    return {
+        "ok": sum(1 for c in codes if c == 200),
+        "elapsed": elapsed,
+        "rps": concurrency / elapsed,
+        "health_p50": statistics.median(health),
+        "health_max": health[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=3.0)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    llm_port, app_port = _free_port(), _free_port()
+    _serve(fake_llm_app(args.llm_latency), llm_port)
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{llm_port}"
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+    # Measure the pipeline, not llm_gateway's concurrency caps
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", str(args.concurrency))
+    os.environ.setdefault("LLM_MAX_PER_USER", str(args.concurrency))
+
+    import httpx
+    init_db()
+    from main import app  # the LLM clients pick up the fake endpoint at import
+    add_blocking_chat_route(app)
+    _serve(app, app_port)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    tokens = []
+    for i in range(args.users):
+        r = httpx.post(f"{base_url}/api/auth/register", json={"username": f"load{i}", "password": "pw"})
+        tokens.append(r.json()["access_token"])
+        httpx.post(f"{base_url}/api/cycles/start", json={"salary_amount": 50000},
+                   headers={"Authorization": f"Bearer {tokens[-1]}"})
+
+    print(f"{args.concurrency} concurrent chats, fake LLM latency {args.llm_latency:.2f}s")
+    print(f"{'pipeline':>8}  {'ok':>5}  {'wall s':>7}  {'req/s':>7}  {'health p50 ms':>13}  {'health max ms':>13}")
+    for name, path in (("sync", "/bench/chat-sync"), ("async", "/api/chat/")):
+        r = asyncio.run(run_load(base_url, path, tokens, args.concurrency))
+        print(f"{name:>8}  {r['ok']:>5}  {r['elapsed']:>7.2f}  {r['rps']:>7.1f}  "
+              f"{r['health_p50']:>13.1f}  {r['health_max']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
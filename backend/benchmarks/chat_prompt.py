@@ -0,0 +1,109 @@
+"""Prompt size and latency of POST /api/chat/ with and without context compaction.
+
+    python -m benchmarks.chat_prompt [--cycles 40] [--per-cycle 300] [--repeat 10] [--live]
+
+Runs process_chat for a heavy user (many past periods, a long current period,
+old paid reminders, 20 long chat turns) twice: once with the full context and
+history as before, once compacted to the configured token budgets. Without
+--live the Azure client is replaced by a stub that records the prompt and
+returns an empty reply, so latency is the server-side part only; with --live
+(AZURE_OPENAI_* set) the real model is called and latency is end to end.
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta
+from functools import partial
+
+from benchmarks.common import SessionLocal, timed, User, Cycle, CycleStatus
+from benchmarks.chat_context import seed_cycles
+import chat_context
+import llm_gateway
+import routes.chat as chat
+from database import Reminder, ReminderType
+
+
+class _StubCompletions:
+    def __init__(self):
+        self.last_messages = []
+
+    async def create(self, model, messages, **kwargs):
+        self.last_messages = messages
+        message = type("Message", (), {"content": json.dumps({"transactions": [], "ai_insight": "ok"})})
+        return type("Response", (), {"choices": [type("Choice", (), {"message": message})]})
+
+
+class _StubClient:
+    def __init__(self):
+        self.chat = type("Chat", (), {"completions": _StubCompletions()})()
+
+
+class _RecordingCompletions:
+    """Wraps the real shared client to keep the last prompt for token counting."""
+
+    def __init__(self, get_client):
+        self._get_client = get_client
+        self.last_messages = []
+
+    async def create(self, model, messages, **kwargs):
+        self.last_messages = messages
+        return await self._get_client().chat.completions.create(model=model, messages=messages, **kwargs)
+
+
+def seed_reminders(user_id: int, n: int):
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        for i in range(n):
+            paid = i % 4 != 0
+            db.add(Reminder(user_id=user_id, title=f"Bill {i}", amount=500.0 + i, type=ReminderType.BILL,
+                            is_paid=paid, due_date=now - timedelta(days=3 * i if paid else -i)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cycles", type=int, default=40)
+    parser.add_argument("--per-cycle", type=int, default=300)
+    parser.add_argument("--reminders", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--live", action="store_true", help="Call the real Azure OpenAI deployment")
+    args = parser.parse_args()
+
+    if args.live:
+        completions = _RecordingCompletions(llm_gateway.get_client)
+        client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})()})()
+    else:
+        client = _StubClient()
+        completions = client.chat.completions
+    llm_gateway.get_client = lambda: client
+
+    user_id = seed_cycles("bench_prompt", args.cycles, args.per_cycle)
+    seed_reminders(user_id, args.reminders)
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": "How much did I spend on food? " * 40}
+               for i in range(20)]
+    req = chat.ChatRequest(message="How am I doing this month?", chat_history=history)
+
+    variants = {
+        "full": (partial(chat_context.build_chat_context, token_budget=None), lambda h: (h or [])[-20:]),
+        "compacted": (chat_context.build_chat_context, chat_context.fit_history),
+    }
+    print(f"{'context':>10}  {'ctx tokens':>10}  {'prompt tokens':>13}  {'p50 ms':>9}  {'p99 ms':>9}")
+    for name, (builder, history_fit) in variants.items():
+        chat.build_chat_context, chat.fit_history = builder, history_fit
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.id == user_id).one()
+            active = db.query(Cycle).filter(Cycle.user_id == user_id, Cycle.status != CycleStatus.CLOSED).one()
+            ctx_tokens = builder(db, user_id, active).stats["tokens"]
+            stats = timed(lambda: asyncio.run(chat.process_chat(req, current_user=user, db=db)), repeat=args.repeat)
+        finally:
+            db.close()
+        prompt_tokens = sum(chat_context.count_tokens(m["content"]) for m in completions.last_messages)
+        print(f"{name:>10}  {ctx_tokens:>10,}  {prompt_tokens:>13,}  {stats['p50']:>9.2f}  {stats['p99']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Time to first byte of POST /api/chat/ vs. the SSE endpoint POST /api/chat/stream.
+
+    python -m benchmarks.chat_stream [--requests 10] [--first-token 1.0] [--token-interval 0.02]
+
+Starts a fake Azure OpenAI server that streams a JSON reply chunk by chunk —
+--first-token seconds before the first chunk, --token-interval between the
+rest (non-streaming requests get the whole reply after the same total time) —
+points the app at it, and times each endpoint from request to first response
+byte, to the first answer token (SSE only) and to the end of the response.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from benchmarks.chat_load import _free_port, _serve
+
+REPLY = json.dumps({
+    "transactions": [],
+    "reminder_actions": [],
+    "report_action": None,
+    "ai_insight": "You have spent ₹18,450 so far this period, most of it on rent and food. "
+                  "At this pace you will end the month with about ₹9,000 left — "
+                  "trimming two food deliveries a week would add roughly ₹2,000 to that.",
+})
+CHUNK_CHARS = 4  # roughly one token
+
+
+def fake_streaming_llm_app(first_token: float, interval: float):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    chunks = [REPLY[i:i + CHUNK_CHARS] for i in range(0, len(REPLY), CHUNK_CHARS)]
+
+    def envelope(deployment: str, **fields) -> dict:
+        return {"id": "fake", "created": int(time.time()), "model": deployment, **fields}
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def completions(deployment: str, request: Request):
+        body = await request.json()
+        if not body.get("stream"):
+            await asyncio.sleep(first_token + interval * (len(chunks) - 1))
+            return envelope(deployment, object="chat.completion", choices=[
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": REPLY}},
+            ])
+
+        async def events():
+            await asyncio.sleep(first_token)
+            for i, piece in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(interval)
+                chunk = envelope(deployment, object="chat.completion.chunk", choices=[
+                    {"index": 0, "finish_reason": None, "delta": {"content": piece}},
+                ])
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+async def time_request(client, path: str, token: str) -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    t0 = time.perf_counter()
+    first_byte = first_token = None
+    buffer = ""
+    async with client.stream("POST", path, json={"message": "how am I doing this month?"}, headers=headers) as r:
+        async for text in r.aiter_text():
+            now = time.perf_counter()
+            if first_byte is None:
+                first_byte = now
+            buffer += text
+            if first_token is None and "event: token" in buffer:
+                first_token = now
+    end = time.perf_counter()
+    if r.status_code != 200:
+        raise SystemExit(f"{path} returned {r.status_code}: {buffer[:200]}")
+    return {
+        "ttfb": (first_byte - t0) * 1000,
+        "first_token": (first_token - t0) * 1000 if first_token else None,
+        "total": (end - t0) * 1000,
+    }
+
+
+async def run(base_url: str, token: str, requests: int) -> dict:
+    import httpx
+
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        for name, path in (("POST /api/chat/", "/api/chat/"), ("POST /api/chat/stream", "/api/chat/stream")):
+            samples = [await time_request(client, path, token) for _ in range(requests)]
+            results[name] = {
+                key: statistics.median(s[key] for s in samples) if samples[0][key] is not None else None
+                for key in ("ttfb", "first_token", "total")
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--first-token", type=float, default=1.0)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    llm_port, app_port = _free_port(), _free_port()
+    _serve(fake_streaming_llm_app(args.first_token, args.token_interval), llm_port)
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{llm_port}"
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+
+    import httpx
+    from main import app  # the LLM clients pick up the fake endpoint at import
+    _serve(app, app_port)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    token = httpx.post(f"{base_url}/api/auth/register", json={"username": "stream", "password": "pw"}).json()["access_token"]
+    httpx.post(f"{base_url}/api/cycles/start", json={"salary_amount": 50000},
+               headers={"Authorization": f"Bearer {token}"})
+
+    n_chunks = -(-len(REPLY) // CHUNK_CHARS)
+    print(f"fake LLM: first chunk after {args.first_token:.2f}s, {n_chunks} chunks "
+          f"{args.token_interval * 1000:.0f} ms apart; p50 over {args.requests} requests")
+    print(f"{'endpoint':>22}  {'TTFB ms':>9}  {'first token ms':>14}  {'total ms':>9}")
+    for name, r in asyncio.run(run(base_url, token, args.requests)).items():
+        first_token = f"{r['first_token']:>14.0f}" if r["first_token"] is not None else f"{'-':>14}"
+        print(f"{name:>22}  {r['ttfb']:>9.0f}  {first_token}  {r['total']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
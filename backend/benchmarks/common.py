@@ -0,0 +1,81 @@
+"""Shared helpers for the offline benchmarks.
+
+Run benchmarks from the backend directory, e.g. `python -m benchmarks.dashboard`.
+They use a throw-away SQLite file unless BENCH_DATABASE_URL points elsewhere.
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Never point a benchmark at the real DATABASE_URL — it seeds large amounts of data.
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or (
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="finai-bench-"), "bench.db")
+)
+# PDF render processes re-import the benchmark module; keep them on the same database
+os.environ["BENCH_DATABASE_URL"] = os.environ["DATABASE_URL"]
+# Repeated identical chats would otherwise be answered from the response cache
+os.environ.setdefault("CHAT_CACHE_BACKEND", "off")
+
+from database import (  # noqa: E402  (DATABASE_URL must be set first)
+    SessionLocal, engine, init_db, User, Cycle, CycleStatus, Transaction, TransactionType, TransactionSource,
+)
+
+CATEGORIES = ["food", "transport", "rent", "shopping", "groceries", "recharge", "fun", "health"]
+
+
+def seed_user(username: str, n_transactions: int, months: int = 24, chunk: int = 50_000) -> int:
+    """Create a user with one cycle and `n_transactions` spread over `months`.
+    Rows go in with core executemany so seeding a million rows stays quick."""
+    init_db()
+    db = SessionLocal()
+    try:
+        user = User(username=username, password_hash="x", is_admin=False)
+        db.add(user)
+        db.commit()
+        cycle = Cycle(user_id=user.id, status=CycleStatus.ACTIVE)
+        db.add(cycle)
+        db.commit()
+        user_id, cycle_id = user.id, cycle.id
+    finally:
+        db.close()
+
+    rnd = random.Random(n_transactions)
+    start = datetime.utcnow() - timedelta(days=30 * months)
+    span = 30 * months * 86400
+    rows = []
+    with engine.begin() as conn:
+        for i in range(n_transactions):
+            is_income = i % 10 == 0
+            rows.append({
+                "cycle_id": cycle_id,
+                "type": (TransactionType.SALARY if is_income else TransactionType.EXPENSE).name,
+                "category": "salary" if is_income else rnd.choice(CATEGORIES),
+                "amount": float(rnd.randint(5000, 80000) if is_income else rnd.randint(20, 4000)),
+                "date": start + timedelta(seconds=rnd.randint(0, span)),
+                "source": TransactionSource.MAIN_BALANCE.name,
+                "description": f"bench row {i}",
+            })
+            if len(rows) >= chunk:
+                conn.execute(Transaction.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(Transaction.__table__.insert(), rows)
+    return user_id
+
+
+def timed(fn, repeat: int = 20) -> dict:
+    """Call `fn` `repeat` times and return latency percentiles in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "mean": statistics.fmean(samples),
+    }
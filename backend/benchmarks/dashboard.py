@@ -0,0 +1,30 @@
+"""Latency of /api/analytics/dashboard at 1k, 100k and 1M transactions per user.
+
+    python -m benchmarks.dashboard [--sizes 1000,100000,1000000] [--repeat 20]
+"""
+import argparse
+
+from benchmarks.common import SessionLocal, User, seed_user, timed
+from routes.analytics import get_dashboard_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'transactions':>12}  {'p50 ms':>9}  {'p99 ms':>9}  {'mean ms':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        user_id = seed_user(f"bench_dash_{size}", size)
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.id == user_id).one()
+            stats = timed(lambda: get_dashboard_metrics(current_user=user, db=db), repeat=args.repeat)
+        finally:
+            db.close()
+        print(f"{size:>12,}  {stats['p50']:>9.2f}  {stats['p99']:>9.2f}  {stats['mean']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
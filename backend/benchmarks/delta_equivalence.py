@@ -0,0 +1,130 @@
+"""Incremental cycle aggregates vs. a full rebuild, over random edit sequences.
+
+    python -m benchmarks.delta_equivalence [--seed 0] [--runs 20] [--steps 200]
+
+For each run, seeds a cycle with envelopes (mixed-case, non-ASCII and duplicate
+names) and applies `--steps` random creates, updates (type, category, amount)
+and deletes through ExpenseStateMachine.apply_transaction_delta, the way the
+transaction routes do. After every step the cycle totals and envelope spend are compared
+with what recalculate_cycle_aggregates rebuilds from the rows. Prints the
+first mismatches with the run seed and step; exits 1 on any mismatch.
+"""
+import argparse
+import math
+import random
+
+from benchmarks.common import (
+    SessionLocal, init_db, Cycle, CycleStatus, Transaction, TransactionType, TransactionSource, User,
+)
+from database import CategoryBudget
+from state_machine import ExpenseStateMachine, TxSnapshot
+
+ENVELOPES = ["Food", "food", "RENT", "fun", "Health", "Café", "ÉPICERIE"]
+# None, case variants of envelope names (also non-ASCII) and names without an envelope
+CATEGORIES = [None, "", "food", "FOOD", "Food", "rent", "Rent", "fun", "health", "HEALTH", "misc", "salary",
+              "café", "CAFÉ", "épicerie", "Épicerie"]
+TYPES = [TransactionType.EXPENSE] * 4 + [TransactionType.INCOME, TransactionType.SALARY, TransactionType.CORRECTION]
+
+
+def snapshot(db, cycle: Cycle) -> dict:
+    state = {
+        "total_expenses": cycle.total_expenses or 0.0,
+        "total_income_other_than_salary": cycle.total_income_other_than_salary or 0.0,
+        "salary_amount": cycle.salary_amount or 0.0,
+    }
+    for b in db.query(CategoryBudget).filter(CategoryBudget.cycle_id == cycle.id).order_by(CategoryBudget.id):
+        state[f"envelope {b.id} ({b.category_name})"] = b.spent_amount or 0.0
+    return state
+
+
+def random_amount(rnd: random.Random) -> float:
+    return round(rnd.uniform(0.01, 5000), 2)
+
+
+def step(db, sm: ExpenseStateMachine, cycle: Cycle, live: list, rnd: random.Random) -> str:
+    """One random create / update / delete, applied as the routes do; returns its label."""
+    op = rnd.choice(("create", "update", "delete")) if live else "create"
+    if op == "create":
+        tx = Transaction(
+            cycle_id=cycle.id, type=rnd.choice(TYPES), category=rnd.choice(CATEGORIES),
+            amount=random_amount(rnd), source=TransactionSource.MAIN_BALANCE,
+        )
+        db.add(tx)
+        db.flush()
+        sm.apply_transaction_delta(cycle, new=TxSnapshot.of(tx))
+        live.append(tx.id)
+    elif op == "update":
+        tx = db.get(Transaction, rnd.choice(live))
+        old = TxSnapshot.of(tx)
+        for field in rnd.sample(("type", "category", "amount"), rnd.randint(1, 3)):
+            if field == "type":
+                tx.type = rnd.choice(TYPES)
+            elif field == "category":
+                tx.category = rnd.choice(CATEGORIES)
+            else:
+                tx.amount = random_amount(rnd)
+        sm.apply_transaction_delta(cycle, old=old, new=TxSnapshot.of(tx))
+    else:
+        tx_id = live.pop(rnd.randrange(len(live)))
+        tx = db.get(Transaction, tx_id)
+        old = TxSnapshot.of(tx)
+        db.delete(tx)
+        sm.apply_transaction_delta(cycle, old=old)
+    label = f"{op} {tx.id}"
+    db.commit()
+    return label
+
+
+def run(seed: int, steps: int) -> list:
+    """Returns (step, label, field, delta value, rebuilt value) for every mismatch."""
+    rnd = random.Random(seed)
+    db = SessionLocal()
+    try:
+        user = User(username=f"delta_check_{seed}", password_hash="x", is_admin=False)
+        db.add(user)
+        db.commit()
+        cycle = Cycle(user_id=user.id, status=CycleStatus.ACTIVE)
+        db.add(cycle)
+        db.commit()
+        for name in ENVELOPES:
+            db.add(CategoryBudget(cycle_id=cycle.id, category_name=name, allocated_amount=10_000.0, spent_amount=0.0))
+        db.commit()
+
+        sm = ExpenseStateMachine(db, user.id)
+        live, mismatches = [], []
+        for i in range(steps):
+            label = step(db, sm, cycle, live, rnd)
+            incremental = snapshot(db, cycle)
+            sm.recalculate_cycle_aggregates(cycle)
+            rebuilt = snapshot(db, cycle)
+            for field, value in rebuilt.items():
+                if not math.isclose(incremental[field], value, abs_tol=1e-6):
+                    mismatches.append((i, label, field, incremental[field], value))
+        return mismatches
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    init_db()
+    failed = 0
+    for seed in range(args.seed, args.seed + args.runs):
+        mismatches = run(seed, args.steps)
+        if mismatches:
+            failed += 1
+            print(f"seed {seed}: {len(mismatches)} mismatches")
+            for i, label, field, incremental, rebuilt in mismatches[:5]:
+                print(f"  step {i} ({label}): {field} delta={incremental:.2f} rebuild={rebuilt:.2f}")
+    print(f"{args.runs - failed}/{args.runs} runs of {args.steps} steps matched the full rebuild")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""LLM gateway behaviour against a local fault-injecting Azure OpenAI stub.
+
+    python -m benchmarks.llm_faults
+
+Starts a stub server whose next replies are scripted (ok, 500, 429 with
+Retry-After, 400, hang, slow, stream that stalls mid-way), runs the gateway
+through each fault with short timeouts, and checks the outcome: retries
+recover transient errors, deadlines hold, the breaker opens / fails fast /
+recovers through a probe, concurrency caps hold at the server, and the chat
+parser and report summary fall back instantly while the breaker is open, and
+sequential calls reuse one pooled keep-alive connection.
+Prints one line per check plus the latency histograms; exits 1 on a failure.
+"""
+import os
+
+# Short limits so every fault resolves in about a second (override via env)
+for _name, _value in {
+    "LLM_TIMEOUT": "0.5", "LLM_DEADLINE": "3", "LLM_MAX_RETRIES": "2", "LLM_RETRY_BASE_DELAY": "0.05",
+    "LLM_BREAKER_FAILURES": "3", "LLM_BREAKER_RESET": "1", "LLM_MAX_CONCURRENCY": "4", "LLM_MAX_PER_USER": "2",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import time  # noqa: E402
+
+from benchmarks.chat_load import _free_port, _serve  # noqa: E402
+
+REPLY = json.dumps({"transactions": [], "reminder_actions": [], "ai_insight": "All good."})
+
+
+class Stub:
+    """Scripted replies: `plan` is consumed one entry per request, then "ok"."""
+
+    def __init__(self):
+        self.plan = []
+        self.requests = 0
+        self.active = 0
+        self.baseline = 0  # requests still hanging from earlier scripts
+        self.max_active = 0
+        self.latency = 0.0
+        self.connections = set()  # client ports seen since the last script()
+
+    def script(self, *plan, latency: float = 0.0):
+        self.plan, self.requests, self.max_active, self.latency = list(plan), 0, 0, latency
+        self.baseline = self.active
+        self.connections = set()
+
+
+def stub_app(stub: Stub):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+
+    def error(status: int, headers: dict = None):
+        return JSONResponse({"error": {"message": f"injected {status}", "type": "injected", "code": str(status)}},
+                            status_code=status, headers=headers)
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def completions(deployment: str, request: Request):
+        body = await request.json()
+        stub.requests += 1
+        stub.connections.add(request.client.port)
+        stub.active += 1
+        stub.max_active = max(stub.max_active, stub.active - stub.baseline)
+        try:
+            behaviour = stub.plan.pop(0) if stub.plan else "ok"
+            await asyncio.sleep(stub.latency)
+            if behaviour == "hang":
+                await asyncio.sleep(30)
+            if behaviour == "500":
+                return error(500)
+            if behaviour == "400":
+                return error(400)
+            if behaviour == "429":
+                return error(429, {"retry-after": "0.3"})
+            if body.get("stream"):
+                async def events():
+                    for i in range(0, len(REPLY), 8):
+                        if behaviour == "stall" and i >= 24:
+                            await asyncio.sleep(30)
+                        chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": deployment,
+                                 "choices": [{"index": 0, "finish_reason": None,
+                                              "delta": {"content": REPLY[i:i + 8]}}]}
+                        yield f"data: {json.dumps(chunk)}\n\n"
+                    yield "data: [DONE]\n\n"
+                return StreamingResponse(events(), media_type="text/event-stream")
+            return {"id": "stub", "object": "chat.completion", "created": 0, "model": deployment,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": REPLY}}]}
+        finally:
+            stub.active -= 1
+
+    return app
+
+
+async def run_checks(stub: Stub, dead_port: int) -> list:
+    import openai
+
+    import llm_gateway
+    import nlp_engine
+    from llm_gateway import LLMUnavailable
+
+    call = dict(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append((name, ok, detail))
+
+    async def outcome(coro):
+        t0 = time.perf_counter()
+        try:
+            await coro
+            result = "ok"
+        except LLMUnavailable as e:
+            result = e.reason
+        except openai.APIStatusError as e:
+            result = f"http_{e.status_code}"
+        return result, time.perf_counter() - t0
+
+    # Transient errors are retried
+    llm_gateway.reset()
+    stub.script("500", "500")
+    result, took = await outcome(llm_gateway.complete("check", **call))
+    check("two 500s then ok: retried to success", result == "ok" and stub.requests == 3,
+          f"{result}, {stub.requests} requests")
+
+    stub.script("429")
+    result, took = await outcome(llm_gateway.complete("check", **call))
+    check("429 honours Retry-After", result == "ok" and took >= 0.3, f"{result} after {took:.2f}s")
+
+    # Timeouts: every attempt hangs; the call ends within the deadline
+    llm_gateway.reset()
+    stub.script("hang", "hang", "hang")
+    result, took = await outcome(llm_gateway.complete("check", **call))
+    check("hanging server: attempts time out, call gives up", result == "exhausted" and took < 3.0,
+          f"{result} after {took:.2f}s, {stub.requests} attempts")
+
+    refused = openai.AsyncAzureOpenAI(azure_endpoint=f"http://127.0.0.1:{dead_port}", api_key="x",
+                                      api_version="2024-12-01-preview", max_retries=0)
+    llm_gateway.reset()
+    result, took = await outcome(llm_gateway.complete("check", client=refused, **call))
+    check("connection refused: retried, then unavailable", result == "exhausted", f"{result} after {took:.2f}s")
+
+    # Non-retryable errors pass through and leave the breaker alone
+    llm_gateway.reset()
+    stub.script("400")
+    result, _ = await outcome(llm_gateway.complete("check", **call))
+    check("400 raised unchanged, not retried", result == "http_400" and stub.requests == 1
+          and llm_gateway.breaker.failures == 0, f"{result}, {stub.requests} requests")
+
+    # Circuit breaker: open after 3 failed attempts, fail fast, probe, close
+    llm_gateway.reset()
+    stub.script("500", "500", "500", "500")
+    await outcome(llm_gateway.complete("check", **call))
+    requests_before = stub.requests
+    result, took = await outcome(llm_gateway.complete("check", **call))
+    check("breaker opens and fails fast", result == "circuit_open" and took < 0.005
+          and stub.requests == requests_before, f"{result} in {took * 1000:.2f} ms")
+
+    t0 = time.perf_counter()
+    reply = await nlp_engine.parse_user_input("how much balance left?", "", None, user_id=1)
+    parse_ms = (time.perf_counter() - t0) * 1000
+    check("chat parser falls back while open", "busy" in (reply.ai_insight or "") and parse_ms < 5,
+          f"{parse_ms:.2f} ms")
+    t0 = time.perf_counter()
+    stats = {"totals": {"expenses": 100, "months_count": 1}}
+    try:  # as routes/reports.py does
+        summary = await nlp_engine.ai_report_summary(stats)
+    except Exception:
+        summary = nlp_engine._fallback_summary(stats)
+    summary_ms = (time.perf_counter() - t0) * 1000
+    check("report summary falls back to rule-based while open",
+          "Connect the AI engine" in " ".join(summary["paragraphs"]) and summary_ms < 5, f"{summary_ms:.2f} ms")
+
+    await asyncio.sleep(1.05)
+    stub.script()
+    result, _ = await outcome(llm_gateway.complete("check", **call))
+    check("after reset timeout the probe closes the breaker", result == "ok" and llm_gateway.breaker.state == "closed",
+          f"{result}, breaker {llm_gateway.breaker.state}")
+
+    # Concurrency caps, measured at the server
+    llm_gateway.reset()
+    stub.script(latency=0.2)
+    await asyncio.gather(*(llm_gateway.complete("check", user_id=7, **call) for _ in range(6)))
+    check("per-user cap (2) holds", stub.max_active <= 2, f"max {stub.max_active} in flight")
+
+    stub.script(latency=0.2)
+    await asyncio.gather(*(llm_gateway.complete("check", user_id=i, **call) for i in range(10)))
+    check("global cap (4) holds", stub.max_active <= 4, f"max {stub.max_active} in flight")
+
+    # Keep-alive: sequential calls share one pooled connection
+    llm_gateway.reset()
+    stub.script()
+    for _ in range(20):
+        await llm_gateway.complete("check", **call)
+    check("20 sequential calls reuse one connection", len(stub.connections) == 1,
+          f"{len(stub.connections)} connection(s)")
+
+    # Streaming
+    llm_gateway.reset()
+    stub.script("500")
+    tokens = []
+    async for kind, value in nlp_engine.stream_user_input("how am I doing?", "", None, user_id=1):
+        tokens.append(value) if kind == "token" else None
+    check("stream open retried, insight streamed", "".join(tokens) == "All good.", repr("".join(tokens)))
+
+    stub.script("stall")
+    t0 = time.perf_counter()
+    async for kind, value in nlp_engine.stream_user_input("how am I doing?", "", None, user_id=1):
+        last = value
+    took = time.perf_counter() - t0
+    check("stalled stream cut off by the chunk timeout", "busy" in (last.ai_insight or "") and took < 1.5,
+          f"{took:.2f}s")
+    return results
+
+
+def main():
+    stub = Stub()
+    stub_port, dead_port = _free_port(), _free_port()
+    _serve(stub_app(stub), stub_port)
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{stub_port}"
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+
+    import llm_gateway
+    results = asyncio.run(run_checks(stub, dead_port))
+    for name, ok, detail in results:
+        print(f"[{'ok' if ok else 'FAIL'}] {name}" + (f" — {detail}" if detail else ""))
+    print(json.dumps(llm_gateway.stats(), indent=1))
+    if not all(ok for _name, ok, _detail in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
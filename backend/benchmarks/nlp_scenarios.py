@@ -0,0 +1,139 @@
+"""Offline accuracy and latency of the fast-path chat parser over the NLP scenario list.
+
+    python -m benchmarks.nlp_scenarios [--repeat 1000] [--verbose]
+
+Each scenario states what the fast path must do with it: parse it to exactly
+(type, amount, category, days back) or leave it to the LLM (None). A fast
+parse of a message meant for the LLM is a false positive — the worst kind of
+miss, since the user gets a wrong entry instead of a slower answer.
+run_nlp_scenarios.py replays the same list against a live server.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+import fast_parser
+
+E, I, S, A = "EXPENSE", "INCOME", "SALARY", "ALLOCATE_BUDGET"
+
+SCENARIOS = [
+    # SECTION 1
+    ("Paid 250 for food", (E, 250, "food", None)),
+    ("Freelancing 8000", (I, 8000, "freelance", None)),
+    ("Got bonus 5000", (I, 5000, "bonus", None)),
+    ("Salary credited 50000", (S, 50000, "salary", None)),
+    ("Paid 500", None),
+    ("Amazon 1200", (E, 1200, "shopping", None)),
+    ("bro 2k", None),
+    ("uber yday 340", (E, 340, "transport", 1)),
+
+    # SECTION 2
+    ("Got salary 50k and paid rent 10k", None),
+
+    # SECTION 3
+    ("Actually it was 700", None),
+    ("Salary was 48k not 50k", None),
+
+    # SECTION 4
+    ("Salary credited 50k", (S, 50000, "salary", None)),
+    ("Got 25k", None),
+    ("Start fresh this month", None),
+
+    # SECTION 5
+    ("Rent 120000", None),
+
+    # SECTION 6
+    ("Paid via credit card 3000", None),
+    ("Paid credit card bill 3000", None),
+    ("Borrowed 5000 from friend", None),
+    ("Returned 2000", None),
+
+    # SECTION 7
+    ("Spent 10 crore", None),
+    ("$50", None),
+
+    # SECTION 8
+    ("yesterday", None),
+    ("last Sunday", None),
+    ("2 weeks ago", None),
+    ("Paid rent on Jan 5", None),
+
+    # SECTION 9
+    ("How much balance left?", None),
+    ("How much did I spend on food?", None),
+    ("Can I afford a trip costing 10k?", None),
+    ("Why am I always broke?", None),
+
+    # SECTION 10 & 11
+    ("Bought groceries and snacks 1500", None),
+    ("My salary date changed", None),
+
+    # SECTION 12 — everyday one-liners
+    ("allocate 5000 to food", (A, 5000, "food", None)),
+    ("budget 3000 for rent", (A, 3000, "rent", None)),
+    ("set aside 2k for fuel", (A, 2000, "fuel", None)),
+    ("spent 2.5k on groceries 2 days ago", (E, 2500, "groceries", 2)),
+    ("swiggy 450", (E, 450, "food", None)),
+    ("₹1,250 petrol", (E, 1250, "fuel", None)),
+    ("paid rs 300 for medicine today", (E, 300, "health", 0)),
+    ("got 1.2 lakh salary", (S, 120000, "salary", None)),
+    ("netflix 649", (E, 649, "entertainment", None)),
+    ("lunch 180 day before yesterday", (E, 180, "food", 2)),
+
+    # Money in / allocations that name a merchant or category — not expenses
+    ("amazon refund 300", None),
+    ("refund 300 from amazon", None),
+    ("cashback 50 on swiggy", None),
+    ("food budget 3000", None),
+    ("food 200 bonus", None),
+]
+
+
+def _outcome(message: str, now: datetime):
+    result = fast_parser.parse(message, now)
+    if result is None:
+        return None
+    tx = result.response.transactions[0]
+    days_back = (now.date() - datetime.fromisoformat(tx.date).date()).days if tx.date else None
+    return (tx.type.value, tx.amount, tx.category, days_back)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    correct = false_positive = hits = expected_hits = 0
+    for message, expected in SCENARIOS:
+        got = _outcome(message, now)
+        ok = got == (expected and (expected[0], float(expected[1]), expected[2], expected[3]))
+        correct += ok
+        hits += got is not None
+        expected_hits += expected is not None
+        false_positive += got is not None and expected is None
+        if args.verbose or not ok:
+            print(f"[{'ok' if ok else 'MISS'}] {message!r}: expected {expected}, got {got}")
+
+    samples = []
+    for _ in range(args.repeat):
+        for message, _expected in SCENARIOS:
+            t0 = time.perf_counter()
+            fast_parser.parse(message, now)
+            samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+
+    print(f"scenarios          {len(SCENARIOS)}")
+    print(f"accuracy           {correct}/{len(SCENARIOS)} ({correct / len(SCENARIOS):.0%})")
+    print(f"fast-path hits     {hits} (expected {expected_hits}), false positives {false_positive}")
+    print(f"LLM calls saved    {hits / len(SCENARIOS):.0%} of messages")
+    print(f"parse latency      p50 {statistics.median(samples):.1f} µs, "
+          f"p99 {samples[int(len(samples) * 0.99)]:.1f} µs")
+    if correct != len(SCENARIOS):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
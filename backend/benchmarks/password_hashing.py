@@ -0,0 +1,138 @@
+"""Login throughput per core and what a sign-in storm does to other requests.
+
+    python -m benchmarks.password_hashing [--logins 48] [--concurrency 16] [--workers 1,2]
+
+First times one verify per hash method in this thread (logins/s on one core
+for each cost setting). Then calls the app in-process (httpx ASGI transport)
+with `--logins` concurrent POST /api/auth/login, hashing on the threadpool
+(workers=0, the previous behaviour) and on PASSWORD_WORKERS hashing
+processes, while a probe polls GET /api/health every 20 ms. Reports logins/s,
+logins/s per core busy hashing, the probe's p50 / max latency, and how many
+logins were turned away with 503 by the admission limit (a final storm run
+with PASSWORD_MAX_PENDING set below the concurrency).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.common import SessionLocal
+
+METHODS = ["scrypt", "scrypt:16384:8:1", "pbkdf2:sha256:600000", "pbkdf2:sha256:1000000"]
+USERS = 8
+
+
+def per_core_rates(repeats: int = 5) -> list:
+    from werkzeug.security import check_password_hash, generate_password_hash
+
+    rows = []
+    for method in METHODS:
+        stored = generate_password_hash("bench-pw", method=method)
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            check_password_hash(stored, "bench-pw")
+        took = (time.perf_counter() - t0) / repeats
+        rows.append((method, took * 1000, 1 / took))
+    return rows
+
+
+def seed_users():
+    import passwords
+    from database import User, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        stored = passwords.hash_password_sync("bench-pw")
+        for i in range(USERS):
+            if not db.query(User).filter(User.username == f"pw_bench_{i}").first():
+                db.add(User(username=f"pw_bench_{i}", password_hash=stored, is_admin=False))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def storm(client, logins: int, concurrency: int) -> dict:
+    probe_ms, codes = [], []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await client.get("/api/health")
+            probe_ms.append((time.perf_counter() - t0) * 1000)
+            await asyncio.sleep(0.02)
+
+    async def worker(n: int, offset: int):
+        for i in range(n):
+            r = await client.post("/api/auth/login",
+                                  json={"username": f"pw_bench_{(offset + i) % USERS}", "password": "bench-pw"})
+            codes.append(r.status_code)
+
+    prober = asyncio.create_task(probe())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(logins // concurrency, c) for c in range(concurrency)))
+    took = time.perf_counter() - t0
+    done.set()
+    await prober
+    probe_ms.sort()
+    return {
+        "seconds": took,
+        "ok": codes.count(200),
+        "rejected": codes.count(503),
+        "other": len(codes) - codes.count(200) - codes.count(503),
+        "probe_p50": statistics.median(probe_ms) if probe_ms else 0.0,
+        "probe_max": probe_ms[-1] if probe_ms else 0.0,
+    }
+
+
+async def run(logins: int, concurrency: int, workers: list) -> list:
+    import httpx
+
+    import passwords
+    from main import app
+
+    seed_users()
+    cores = os.cpu_count() or 1
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for count, max_pending in [(0, logins)] + [(w, logins) for w in workers] + [(workers[-1], max(1, concurrency // 4))]:
+            passwords.shutdown_pool()
+            passwords.PASSWORD_WORKERS, passwords.PASSWORD_MAX_PENDING = count, max_pending
+            passwords.warm_up()
+            if count:
+                await passwords.verify_password(passwords.hash_password_sync("x"), "x")  # processes started
+            r = await storm(client, logins, concurrency)
+            busy_cores = min(cores, count) if count else cores
+            r.update(workers=count, max_pending=max_pending, per_core=r["ok"] / r["seconds"] / busy_cores)
+            results.append(r)
+    passwords.shutdown_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", default="1,2", help="pool sizes to try")
+    args = parser.parse_args()
+
+    print(f"one verify per method, {os.cpu_count()} CPU(s)")
+    print(f"{'method':>22}  {'ms':>7}  {'logins/s/core':>13}")
+    for method, ms, rate in per_core_rates():
+        print(f"{method:>22}  {ms:>7.1f}  {rate:>13.1f}")
+
+    import passwords
+    results = asyncio.run(run(args.logins, args.concurrency, [int(w) for w in args.workers.split(",")]))
+    print(f"\n{args.logins} logins, concurrency {args.concurrency}, method {passwords.stats()['method']}")
+    print(f"{'workers':>7}  {'pending':>7}  {'ok':>4}  {'503':>4}  {'logins/s':>8}  {'per core':>8}  "
+          f"{'health p50 ms':>13}  {'health max ms':>13}")
+    for r in results:
+        print(f"{r['workers'] or 'inline':>7}  {r['max_pending']:>7}  {r['ok']:>4}  {r['rejected']:>4}  "
+              f"{r['ok'] / r['seconds']:>8.1f}  {r['per_core']:>8.1f}  {r['probe_p50']:>13.1f}  {r['probe_max']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
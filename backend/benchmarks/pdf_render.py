@@ -0,0 +1,114 @@
+"""Report PDF throughput and memory at 1k, 10k and 100k ledger rows.
+
+    python -m benchmarks.pdf_render [--sizes 1000,10000,100000] [--sections full]
+
+For each size, seeds a user, builds the analysis and renders the report
+(ledger streamed from the database) three ways: `build_pdf` on a thread of
+this process, on a fresh render process, and through `render_pdf_file` once
+the file is cached. Reports pages per second, the longest stall of a thread
+that ticks every 5 ms meanwhile — the delay every other request on the
+worker would see while ReportLab holds the GIL — and the render process's
+peak RSS.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import SessionLocal, seed_user
+
+SUMMARY = {
+    "headline": "Spending held steady.",
+    "paragraphs": ["Rent and food make up most of the outflow."],
+    "bullets": ["Food: Rs 12,000", "Transport: Rs 3,000"],
+}
+
+
+def page_count(path: str) -> int:
+    with open(path, "rb") as f:
+        return len(re.findall(rb"/Type /Page[^s]", f.read()))
+
+
+def with_ticker(fn):
+    """Run fn() while a thread ticks every 5 ms; returns (result, seconds, longest tick gap in ms)."""
+    done = threading.Event()
+    worst = [0.0]
+
+    def tick():
+        last = time.perf_counter()
+        while not done.is_set():
+            time.sleep(0.005)
+            now = time.perf_counter()
+            worst[0] = max(worst[0], now - last)
+            last = now
+
+    ticker = threading.Thread(target=tick)
+    ticker.start()
+    t0 = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        took = time.perf_counter() - t0
+        done.set()
+        ticker.join()
+    return result, took, worst[0] * 1000
+
+
+def measured_render(path: str, analysis: dict, sections: str, ledger: dict) -> float:
+    """Render in this (fresh) process; returns its peak RSS in MB."""
+    import report_pdf
+    report_pdf.build_pdf(analysis, "bench", sections, path=path, ledger=ledger)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--sections", default="full", choices=["full", "analysis", "transactions"])
+    args = parser.parse_args()
+
+    import report_pdf
+    from routes.reports import build_analysis
+
+    report_pdf.PDF_CACHE_DIR = tempfile.mkdtemp(prefix="finai-pdf-bench-")
+    report_pdf.PDF_WORKERS = max(report_pdf.PDF_WORKERS, 1)
+    out = os.path.join(report_pdf.PDF_CACHE_DIR, "bench.pdf")
+    spawn = multiprocessing.get_context("spawn")
+
+    print(f"sections={args.sections}")
+    print(f"{'rows':>8}  {'pages':>6}  {'mode':>7}  {'seconds':>8}  {'pages/s':>8}  {'max stall ms':>12}  {'peak MB':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        user_id = seed_user(f"bench_pdf_{size}", size, months=12)
+        db = SessionLocal()
+        try:
+            analysis = build_analysis(db, user_id, ledger=False)
+        finally:
+            db.close()
+        analysis["summary"] = SUMMARY
+        ledger = {"user_id": user_id, "months": None}
+
+        _, took, stall = with_ticker(lambda: report_pdf.build_pdf(analysis, "bench", args.sections,
+                                                                   path=out, ledger=ledger))
+        pages = page_count(out)
+        print(f"{size:>8,}  {pages:>6}  {'inline':>7}  {took:>8.2f}  {pages / took:>8.1f}  {stall:>12.1f}  {'-':>8}")
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn, initializer=report_pdf._init_worker) as pool:
+            pool.submit(report_pdf._ready).result()  # process started and warmed up
+            peak, took, stall = with_ticker(
+                lambda: pool.submit(measured_render, out, analysis, args.sections, ledger).result())
+        print(f"{size:>8,}  {pages:>6}  {'process':>7}  {took:>8.2f}  {pages / took:>8.1f}  {stall:>12.1f}  {peak:>8.0f}")
+
+        report_pdf.render_pdf_file(analysis, "bench", args.sections, ledger=ledger)  # fill the cache
+        _, took, stall = with_ticker(lambda: report_pdf.render_pdf_file(analysis, "bench", args.sections, ledger=ledger))
+        print(f"{size:>8,}  {pages:>6}  {'cached':>7}  {took:>8.3f}  {pages / took:>8.0f}  {stall:>12.1f}  {'-':>8}")
+
+    report_pdf.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Background report jobs end to end, against a local stand-in SMTP server.
+
+    python -m benchmarks.report_queue [--jobs 6] [--llm-latency 1.0]
+
+Needs `aiosmtpd` (pip install aiosmtpd; only this script uses it). Starts a
+fake Azure OpenAI server whose report summary takes --llm-latency seconds, an
+aiosmtpd server that accepts any login without TLS, and the app itself with
+its report workers. Then queues PDF and email jobs through the API and checks:
+POST returns a job id long before the job finishes, the status endpoint walks
+queued -> running -> done, the download is a PDF (409 before it is ready), and
+every email arrives with the report attached. Exits 1 on a failure.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import statistics
+import time
+
+from benchmarks.chat_load import _free_port, _serve
+
+SUMMARY = json.dumps({
+    "headline": "You spent ₹6,300 across 3 categories.",
+    "paragraphs": ["Rent is the largest committed cost."],
+    "bullets": ["Food: ₹1,800", "Transport: ₹500"],
+})
+
+
+def fake_summary_llm_app(latency: float):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def completions(deployment: str):
+        await asyncio.sleep(latency)
+        return {
+            "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": deployment,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": SUMMARY}}],
+        }
+
+    return app
+
+
+def start_smtp(port: int) -> list:
+    """aiosmtpd on `port` accepting any credentials over plain SMTP; returns the inbox list."""
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    inbox = []
+
+    class Handler:
+        async def handle_DATA(self, server, session, envelope):
+            inbox.append(envelope)
+            return "250 OK"
+
+    controller = Controller(
+        Handler(), hostname="127.0.0.1", port=port,
+        authenticator=lambda *args: AuthResult(success=True), auth_require_tls=False,
+    )
+    controller.start()
+    return inbox
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=6, help="jobs of each kind")
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("aiosmtpd") is None:
+        raise SystemExit("This check needs aiosmtpd: pip install aiosmtpd")
+
+    llm_port, smtp_port, app_port = _free_port(), _free_port(), _free_port()
+    _serve(fake_summary_llm_app(args.llm_latency), llm_port)
+    inbox = start_smtp(smtp_port)
+    os.environ.update({
+        "AZURE_OPENAI_ENDPOINT": f"http://127.0.0.1:{llm_port}", "AZURE_OPENAI_API_KEY": "fake",
+        "SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(smtp_port), "SMTP_USER": "finai", "SMTP_PASS": "x",
+        "SMTP_FROM": "reports@finai.local", "SMTP_STARTTLS": "false",
+    })
+    os.environ.setdefault("REPORT_JOB_POLL_SECONDS", "0.2")
+
+    import httpx
+    import report_jobs
+    from main import app
+    _serve(app, app_port)
+    client = httpx.Client(base_url=f"http://127.0.0.1:{app_port}", timeout=60)
+
+    token = client.post("/api/auth/register", json={"username": "jobs", "password": "pw"}).json()["access_token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    client.post("/api/cycles/start", json={"salary_amount": 50000})
+    for category, amount in (("rent", 4000), ("food", 1800), ("transport", 500)):
+        client.post("/api/transactions/", json={"type": "EXPENSE", "category": category, "amount": amount})
+
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append((name, ok, detail))
+
+    # Queue everything at once; each POST only inserts a row
+    enqueue_ms, jobs = [], []
+    for i in range(args.jobs * 2):
+        t0 = time.perf_counter()
+        if i % 2:
+            r = client.post("/api/reports/email", json={"to": f"user{i}@example.com", "refresh": True})
+        else:
+            r = client.post("/api/reports/jobs", json={"kind": "pdf", "refresh": True})
+        enqueue_ms.append((time.perf_counter() - t0) * 1000)
+        jobs.append((r.status_code, r.json()))
+    check("enqueue returns 202 with a job id", all(code == 202 and body.get("job_id") for code, body in jobs),
+          f"{jobs[0][0]} {jobs[0][1].get('status')}")
+
+    first = jobs[0][1]["job_id"]
+    early = client.get(f"/api/reports/jobs/{first}/download")
+    check("download before completion is 409", early.status_code == 409, str(early.status_code))
+
+    # Poll until every job settles
+    seen, finished = {}, {}
+    t0 = time.perf_counter()
+    while len(finished) < len(jobs) and time.perf_counter() - t0 < 120:
+        for _code, body in jobs:
+            job_id = body["job_id"]
+            if job_id in finished:
+                continue
+            status = client.get(f"/api/reports/jobs/{job_id}").json()
+            seen.setdefault(job_id, []).append(status["status"])
+            if status["status"] in ("done", "failed"):
+                finished[job_id] = (status, time.perf_counter() - t0)
+        time.sleep(0.1)
+
+    statuses = [s["status"] for s, _ in finished.values()]
+    check("every job finished", statuses.count("done") == len(jobs),
+          f"{statuses.count('done')}/{len(jobs)} done, {statuses.count('failed')} failed")
+    check("status walks queued -> running -> done",
+          any("running" in states and states[-1] == "done" for states in seen.values()))
+
+    pdfs = [client.get(s["download_url"]) for s, _ in finished.values() if s.get("download_url")]
+    check("downloads are PDFs", pdfs and all(r.status_code == 200 and r.content.startswith(b"%PDF") for r in pdfs),
+          f"{len(pdfs)} files")
+
+    time.sleep(0.5)
+    recipients = sorted(rcpt for envelope in inbox for rcpt in envelope.rcpt_tos)
+    attached = all(b"application/pdf" in envelope.original_content for envelope in inbox)
+    check("each email delivered once with the PDF attached", len(inbox) == args.jobs and attached,
+          f"{len(inbox)} received: {', '.join(recipients[:3])}...")
+
+    other = httpx.post(f"http://127.0.0.1:{app_port}/api/auth/register",
+                       json={"username": "someone", "password": "pw"}).json()["access_token"]
+    foreign = client.get(f"/api/reports/jobs/{first}", headers={"Authorization": f"Bearer {other}"})
+    check("other users cannot see the job", foreign.status_code == 404, str(foreign.status_code))
+
+    job_seconds = statistics.median(took for _, took in finished.values()) if finished else 0
+    print(f"{len(jobs)} jobs on {report_jobs.REPORT_WORKERS} workers, summary latency {args.llm_latency:.1f}s")
+    print(f"enqueue p50 {statistics.median(enqueue_ms):.1f} ms, max {max(enqueue_ms):.1f} ms; "
+          f"job done after p50 {job_seconds:.2f}s")
+    for name, ok, detail in results:
+        print(f"[{'ok' if ok else 'FAIL'}] {name}" + (f" — {detail}" if detail else ""))
+    if not all(ok for _name, ok, _detail in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
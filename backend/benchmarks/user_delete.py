@@ -0,0 +1,190 @@
+"""Deleting a large account: per-cycle deletes vs. ON DELETE CASCADE vs. the batched purge job.
+
+    python -m benchmarks.user_delete [--sizes 10000,100000,500000] [--cycles 24]
+
+For each size, seeds a user with that many transactions spread over
+`--cycles` cycles (plus envelopes, reminders, rollups and ledger) and deletes
+it three ways:
+
+  before      the previous delete_user body: per-cycle DELETEs, then the rest
+  cascade     _delete_user_row: one DELETE of the users row
+  purge       purge_user: USER_PURGE_BATCH_SIZE rows per transaction, user last
+
+Meanwhile another thread commits a one-row write every 10 ms on its own
+session; its slowest write is how long any other request's write would wait
+behind the delete. Also reports the statements the delete issued.
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from benchmarks.common import SessionLocal, engine
+from database import (
+    init_db, BalanceLedger, Cycle, CycleStatus, CategoryBudget, MonthlyCategoryRollup, Reminder, ReminderType,
+    ReportSummary, Transaction, TransactionSource, TransactionType, User,
+)
+
+
+def legacy_delete(db, user_id: int):
+    """The pre-cascade delete_user body."""
+    import report_jobs
+    user = db.query(User).filter(User.id == user_id).first()
+    db.query(MonthlyCategoryRollup).filter(MonthlyCategoryRollup.user_id == user_id).delete()
+    for cycle in db.query(Cycle).filter(Cycle.user_id == user_id).all():
+        db.query(CategoryBudget).filter(CategoryBudget.cycle_id == cycle.id).delete()
+        db.query(Transaction).filter(Transaction.cycle_id == cycle.id).delete()
+    db.query(Cycle).filter(Cycle.user_id == user_id).delete()
+    db.query(Reminder).filter(Reminder.user_id == user_id).delete()
+    db.query(BalanceLedger).filter(BalanceLedger.user_id == user_id).delete()
+    db.query(ReportSummary).filter(ReportSummary.user_id == user_id).delete()
+    report_jobs.delete_user_jobs(db, user_id)
+    db.delete(user)
+    db.commit()
+
+
+def seed_account(username: str, n_transactions: int, n_cycles: int) -> int:
+    import ledger
+    import rollups
+
+    rnd = random.Random(n_transactions)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        user = User(username=username, password_hash="x", is_admin=False)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        cycles = [Cycle(user_id=user_id, status=CycleStatus.CLOSED, start_date=now - timedelta(days=30 * (n_cycles - i)))
+                  for i in range(n_cycles)]
+        cycles[-1].status = CycleStatus.ACTIVE
+        db.add_all(cycles)
+        db.commit()
+        cycle_ids = [c.id for c in cycles]
+    finally:
+        db.close()
+
+    with engine.begin() as conn:
+        conn.execute(CategoryBudget.__table__.insert(), [
+            {"cycle_id": cid, "category_name": cat, "allocated_amount": 5000.0, "spent_amount": 1000.0}
+            for cid in cycle_ids for cat in ("food", "rent", "fun", "transport")
+        ])
+        conn.execute(Reminder.__table__.insert(), [
+            {"user_id": user_id, "title": f"bill {i}", "amount": 100.0, "is_paid": False,
+             "type": ReminderType.BILL.name, "due_date": now + timedelta(days=i)}
+            for i in range(50)
+        ])
+        rows = []
+        for i in range(n_transactions):
+            k = i % n_cycles
+            rows.append({
+                "cycle_id": cycle_ids[k],
+                "type": TransactionType.EXPENSE.name,
+                "category": rnd.choice(("food", "rent", "fun", "transport")),
+                "amount": float(rnd.randint(20, 4000)),
+                "date": now - timedelta(days=30 * (n_cycles - k) - rnd.randint(0, 29)),
+                "source": TransactionSource.MAIN_BALANCE.name,
+            })
+            if len(rows) >= 50_000:
+                conn.execute(Transaction.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(Transaction.__table__.insert(), rows)
+
+    db = SessionLocal()
+    try:
+        rollups.backfill(db, user_id)
+        ledger.backfill_missing(db)
+        db.commit()
+    finally:
+        db.close()
+    return user_id
+
+
+def with_writer(fn) -> tuple:
+    """Run fn() while another thread commits a small write every 10 ms.
+    Returns (seconds, slowest write in ms, failed writes)."""
+    done = threading.Event()
+    worst, failed = [0.0], [0]
+
+    def write():
+        db = SessionLocal()
+        try:
+            bystander = db.query(User.id).filter(User.username == "bystander").scalar()
+            while not done.is_set():
+                t0 = time.perf_counter()
+                try:
+                    db.add(Reminder(user_id=bystander, title="ping", amount=1.0))
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    failed[0] += 1
+                worst[0] = max(worst[0], time.perf_counter() - t0)
+                time.sleep(0.01)
+        finally:
+            db.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    time.sleep(0.05)
+    t0 = time.perf_counter()
+    try:
+        fn()
+    finally:
+        took = time.perf_counter() - t0
+        done.set()
+        writer.join()
+    return took, worst[0] * 1000, failed[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,500000")
+    parser.add_argument("--cycles", type=int, default=24)
+    args = parser.parse_args()
+
+    from routes.admin import USER_PURGE_BATCH_SIZE, _delete_user_row, purge_user
+
+    init_db()
+    db = SessionLocal()
+    db.add(User(username="bystander", password_hash="x", is_admin=False))
+    db.commit()
+    db.close()
+
+    statements = [0]
+    deleting = [None]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == deleting[0]:
+            statements[0] += 1
+
+    def cascade(db, user_id):
+        _delete_user_row(db, user_id)
+        db.commit()
+
+    print(f"{args.cycles} cycles per user; purge batch {USER_PURGE_BATCH_SIZE}")
+    print(f"{'transactions':>12}  {'mode':>8}  {'seconds':>8}  {'statements':>10}  {'slowest other write ms':>22}  {'failed':>6}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for name, delete in (("before", legacy_delete), ("cascade", cascade), ("purge", purge_user)):
+            user_id = seed_account(f"delete_{name}_{size}", size, args.cycles)
+            db = SessionLocal()
+            statements[0], deleting[0] = 0, threading.get_ident()
+            try:
+                took, worst, failed = with_writer(lambda: delete(db, user_id))
+            finally:
+                deleting[0] = None
+                db.close()
+            check = SessionLocal()
+            left = check.query(Transaction).join(Cycle).filter(Cycle.user_id == user_id).count() + \
+                check.query(User).filter(User.id == user_id).count()
+            check.close()
+            assert left == 0, f"{name} left {left} rows behind"
+            print(f"{size:>12,}  {name:>8}  {took:>8.2f}  {statements[0]:>10}  {worst:>22.1f}  {failed:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Financial context handed to the chat LLM.
+
+`build_chat_context` assembles the balance snapshot, past periods, current
+period transactions, envelopes and reminders for one user. Each section is a
+fixed number of SQL statements whatever the history size: past periods and
+their per-category spend come from a single GROUP BY over the monthly rollup,
+instead of one transaction query per past cycle.
+
+The context is compacted to a token budget (CHAT_CONTEXT_TOKEN_BUDGET):
+  - only the newest CHAT_CONTEXT_RECENT_TRANSACTIONS lines of the current
+    period are kept verbatim; older ones become per-category totals,
+  - paid reminders due more than CHAT_CONTEXT_PAID_REMINDER_DAYS ago are dropped,
+  - if still over budget, recent lines and past periods are halved in turn,
+    the dropped ones folded into the summaries.
+`token_budget=None` gives the full, uncompacted context.
+
+Every build is instrumented — `ChatContext.stats` carries the number of SQL
+statements issued, per-section timings in milliseconds and the token count
+of the produced text. Compare across history sizes with:
+    python -m benchmarks.chat_context
+    python -m benchmarks.chat_prompt
+"""
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, NamedTuple
+
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.orm import Session
+
+import ledger
+from database import Cycle, CategoryBudget, MonthlyCategoryRollup, Reminder, Transaction, TransactionType
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "3000"))
+RECENT_TRANSACTIONS = int(os.getenv("CHAT_CONTEXT_RECENT_TRANSACTIONS", "30"))
+PAID_REMINDER_DAYS = int(os.getenv("CHAT_CONTEXT_PAID_REMINDER_DAYS", "30"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_MAX_TURNS = 20
+
+
+class ChatContext(NamedTuple):
+    text: str
+    sections: dict
+    stats: dict
+
+
+@contextmanager
+def count_queries(db: Session):
+    """Count SQL statements sent on the session's connection inside the block.
+    Yields a dict whose "queries" entry is updated live."""
+    counter = {"queries": 0}
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    conn = db.connection()
+    event.listen(conn, "before_cursor_execute", _count)
+    try:
+        yield counter
+    finally:
+        event.remove(conn, "before_cursor_execute", _count)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Token counting
+# ──────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in `text` — exact with tiktoken installed, else ~4 characters per token."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def fit_history(chat_history: List[dict], token_budget: int = HISTORY_TOKEN_BUDGET) -> List[dict]:
+    """The newest chat turns (at most HISTORY_MAX_TURNS) that fit in `token_budget`."""
+    kept, used = [], 0
+    for turn in reversed((chat_history or [])[-HISTORY_MAX_TURNS:]):
+        used += count_tokens(str(turn.get("content", "")))
+        if used > token_budget:
+            break
+        kept.append(turn)
+    return kept[::-1]
+
+
+# ──────────────────────────────────────────────────────────────
+#  Sections
+# ──────────────────────────────────────────────────────────────
+
+def _category_label(category) -> str:
+    return category.capitalize() if category else "Other"
+
+
+def load_transactions(db: Session, cycle: Cycle, recent: int = None) -> tuple:
+    """Current period lines, oldest first. With `recent`, only the newest `recent`
+    rows are loaded and everything older comes back as {(type, category): [total, count]}."""
+    columns = (Transaction.id, Transaction.date, Transaction.type, Transaction.category,
+               Transaction.amount, Transaction.source, Transaction.description)
+    query = db.query(*columns).filter(Transaction.cycle_id == cycle.id)
+    if recent is None:
+        return query.order_by(Transaction.date.asc()).all(), {}
+
+    rows = query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(recent).all()[::-1]
+    older = {}
+    if len(rows) == recent:
+        category = func.coalesce(func.lower(Transaction.category), "")
+        grouped = db.query(
+            Transaction.type, category, func.sum(Transaction.amount), func.count(Transaction.id),
+        ).filter(Transaction.cycle_id == cycle.id)
+        if rows:
+            oldest = rows[0]
+            grouped = grouped.filter(or_(
+                Transaction.date < oldest.date,
+                and_(Transaction.date == oldest.date, Transaction.id < oldest.id),
+            ))
+        grouped = grouped.group_by(Transaction.type, category).all()
+        older = {(tx_type, cat): [total, count] for tx_type, cat, total, count in grouped}
+    return rows, older
+
+
+def transactions_section(rows: list, older: dict, keep: int = None) -> str:
+    """Render `rows` verbatim; with `keep`, fold all but the newest `keep` into `older`."""
+    if keep is not None and keep < len(rows):
+        older = {key: list(value) for key, value in older.items()}
+        for row in rows[:len(rows) - keep]:
+            entry = older.setdefault((row.type, (row.category or "").lower()), [0.0, 0])
+            entry[0] += row.amount
+            entry[1] += 1
+        rows = rows[len(rows) - keep:]
+
+    lines = []
+    if older:
+        count = sum(c for _, c in older.values())
+        parts = [
+            f"{tx_type.value} {_category_label(cat)} ₹{round(total, 2)} ({n})"
+            for (tx_type, cat), (total, n) in sorted(older.items(), key=lambda kv: -kv[1][0])
+        ]
+        lines.append(f"Earlier this period ({count} transactions, totals by category): " + ", ".join(parts))
+    lines += [
+        f"Date: {r.date.strftime('%Y-%m-%d %H:%M')}, Type: {r.type.value}, Category: {_category_label(r.category)}, "
+        f"Amount: ₹{r.amount}, Source: {r.source.value}, Description: {r.description}"
+        for r in rows
+    ]
+    return "\n".join(lines) if lines else "No transactions yet."
+
+
+def load_past_periods(db: Session, user_id: int, active_cycle: Cycle) -> list:
+    """Every closed period with its category spend, oldest first — one grouped
+    query over cycles left-joined to their expense rollup rows."""
+    r = MonthlyCategoryRollup
+    rows = db.query(
+        Cycle.id, Cycle.start_date, Cycle.status, Cycle.salary_amount,
+        Cycle.total_income_other_than_salary, Cycle.total_expenses,
+        r.category, func.sum(r.total),
+    ).outerjoin(r, and_(
+        r.user_id == Cycle.user_id,  # lets the join use ix_monthly_category_rollup_user_month
+        r.cycle_id == Cycle.id,
+        r.type == TransactionType.EXPENSE,
+    )).filter(
+        Cycle.user_id == user_id,
+        Cycle.id != active_cycle.id,
+    ).group_by(
+        Cycle.id, Cycle.start_date, Cycle.status, Cycle.salary_amount,
+        Cycle.total_income_other_than_salary, Cycle.total_expenses, r.category,
+    ).order_by(Cycle.id.asc(), func.min(r.first_date)).all()
+
+    periods = {}
+    for cycle_id, start, status, salary, other_income, spent, category, total in rows:
+        period = periods.setdefault(cycle_id, {
+            "label": start.strftime("%b %Y"), "status": status,
+            "income": salary + other_income, "spent": spent, "categories": {},
+        })
+        if total is not None:
+            label = _category_label(category)
+            period["categories"][label] = period["categories"].get(label, 0.0) + total
+    return list(periods.values())
+
+
+def past_periods_section(periods: list, keep: int = None) -> str:
+    """Render `periods`; with `keep`, all but the newest `keep` become one summary line."""
+    lines = []
+    if keep is not None and keep < len(periods):
+        folded, periods = periods[:len(periods) - keep], periods[len(periods) - keep:]
+        lines.append(
+            f"{len(folded)} earlier periods ({folded[0]['label']} – {folded[-1]['label']}): "
+            f"Income ₹{round(sum(p['income'] for p in folded), 2)}, "
+            f"Total Spent ₹{round(sum(p['spent'] for p in folded), 2)}"
+        )
+    for p in periods:
+        cat_str = ", ".join(f"{k}: ₹{v}" for k, v in p["categories"].items()) if p["categories"] else "None"
+        lines.append(f"Period {p['label']}: Income ₹{p['income']}, Total Spent ₹{p['spent']}, "
+                     f"Categories ({cat_str}), Status: {p['status'].value}")
+    return "\n".join(lines) if lines else "No past financial periods yet."
+
+
+def envelopes_section(budgets: list) -> str:
+    return "\n".join([
+        f"Envelope '{b.category_name}': Allocated ₹{b.allocated_amount}, Spent ₹{b.spent_amount}, "
+        f"Remaining ₹{max(0, b.allocated_amount - b.spent_amount)}"
+        for b in budgets
+    ]) if budgets else "No budget envelopes set."
+
+
+def reminders_section(db: Session, user_id: int, now: datetime, paid_days: int = None) -> str:
+    """All reminders by due date; with `paid_days`, paid ones due (or created, when
+    undated) more than `paid_days` ago are left out."""
+    query = db.query(Reminder).filter(Reminder.user_id == user_id)
+    if paid_days is not None:
+        cutoff = now - timedelta(days=paid_days)
+        query = query.filter(or_(
+            Reminder.is_paid.is_(False),
+            Reminder.is_paid.is_(None),
+            func.coalesce(Reminder.due_date, Reminder.created_at) >= cutoff,
+        ))
+    reminders = query.order_by(Reminder.due_date.asc()).all()
+    lines = []
+    for r in reminders:
+        status = "PAID" if r.is_paid else ("OVERDUE" if r.due_date and r.due_date < now else "UPCOMING")
+        due = r.due_date.strftime("%Y-%m-%d") if r.due_date else "No due date"
+        lines.append(f"Reminder [{r.id}] '{r.title}' | Type: {r.type.value} | Amount: ₹{r.amount} | "
+                     f"Due: {due} | Status: {status} | Notes: {r.notes or 'None'}")
+    return "\n".join(lines) if lines else "No reminders or loans set."
+
+
+def snapshot_section(db: Session, user_id: int, cycle: Cycle, budgets: list) -> str:
+    available_balance = ledger.get_balance(db, user_id)
+    total_allocated = sum(b.allocated_amount for b in budgets)
+    total_envelope_remaining = sum(max(0, b.allocated_amount - b.spent_amount) for b in budgets)
+    return (
+        f"CURRENT FINANCIAL SNAPSHOT:\n"
+        f"  Available Balance (excl. envelopes): ₹{available_balance}\n"
+        f"  Total Allocated to Envelopes: ₹{total_allocated}\n"
+        f"  Total Envelope Remaining: ₹{total_envelope_remaining}\n"
+        f"  Total Money Available (Balance + Envelopes): ₹{available_balance + total_envelope_remaining}\n"
+        f"  Monthly Income: ₹{cycle.salary_amount + cycle.total_income_other_than_salary} | Total Spent: ₹{cycle.total_expenses}"
+    )
+
+
+def render(sections: dict) -> str:
+    return (
+        f"{sections['snapshot']}\n\n"
+        f"PAST FINANCIAL PERIODS:\n{sections['past_periods']}\n\n"
+        f"CURRENT PERIOD TRANSACTIONS:\n{sections['transactions']}\n\n"
+        f"BUDGET ENVELOPES:\n{sections['envelopes']}\n\n"
+        f"REMINDERS & LOANS:\n{sections['reminders']}"
+    )
+
+
+# ──────────────────────────────────────────────────────────────
+#  Builder
+# ──────────────────────────────────────────────────────────────
+
+def _compaction_steps(n_transactions: int, n_periods: int):
+    """(verbatim transactions, verbatim past periods) to try, largest first."""
+    yield n_transactions, n_periods
+    while n_transactions or n_periods:
+        n_transactions, n_periods = n_transactions // 2, n_periods // 2
+        yield n_transactions, n_periods
+
+
+def build_chat_context(
+    db: Session,
+    user_id: int,
+    active_cycle: Cycle,
+    now: datetime = None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    recent_transactions: int = RECENT_TRANSACTIONS,
+    paid_reminder_days: int = PAID_REMINDER_DAYS,
+) -> ChatContext:
+    """Build the LLM context for `user_id` whose current period is `active_cycle`,
+    compacted to `token_budget` tokens where possible (None = no compaction)."""
+    now = now or datetime.utcnow()
+    compact = token_budget is not None
+    timings = {}
+    sections = {}
+
+    def timed(name, fn, *args):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        timings[name] = round((time.perf_counter() - t0) * 1000, 3)
+        return result
+
+    started = time.perf_counter()
+    with count_queries(db) as counter:
+        budgets = db.query(CategoryBudget).filter(CategoryBudget.cycle_id == active_cycle.id).all()
+        sections["snapshot"] = timed("snapshot", snapshot_section, db, user_id, active_cycle, budgets)
+        periods = timed("past_periods", load_past_periods, db, user_id, active_cycle)
+        rows, older = timed("transactions", load_transactions, db, active_cycle,
+                            recent_transactions if compact else None)
+        sections["envelopes"] = timed("envelopes", envelopes_section, budgets)
+        sections["reminders"] = timed("reminders", reminders_section, db, user_id, now,
+                                      paid_reminder_days if compact else None)
+
+    t0 = time.perf_counter()
+    kept = (len(rows), len(periods))
+    for kept in _compaction_steps(len(rows), len(periods)):
+        sections["transactions"] = transactions_section(rows, older, kept[0])
+        sections["past_periods"] = past_periods_section(periods, kept[1])
+        text = render(sections)
+        tokens = count_tokens(text)
+        if not compact or tokens <= token_budget:
+            break
+    timings["compaction"] = round((time.perf_counter() - t0) * 1000, 3)
+
+    stats = {
+        "queries": counter["queries"],
+        "total_ms": round((time.perf_counter() - started) * 1000, 3),
+        "timings_ms": timings,
+        "tokens": tokens,
+        "token_budget": token_budget,
+        "verbatim_transactions": kept[0],
+        "summarized_transactions": sum(c for _, c in older.values()) + len(rows) - kept[0],
+        "verbatim_periods": kept[1],
+    }
+    return ChatContext(text=text, sections=sections, stats=stats)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum
 from typing import List, Optional
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum as SQLEnum, Boolean, Text, create_engine
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum as SQLEnum, Boolean, Text, Index, UniqueConstraint, create_engine, event
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 
 Base = declarative_base()
@@ -36,6 +36,12 @@ class ReminderType(str, Enum):
     SUBSCRIPTION = "SUBSCRIPTION"
     CUSTOM = "CUSTOM"
 
+class JobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -45,14 +51,19 @@ class User(Base):
     is_admin = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    cycles = relationship("Cycle", back_populates="user")
-    reminders = relationship("Reminder", back_populates="user")
+    # Child rows go with the user via ON DELETE CASCADE (see routes/admin.py delete_user)
+    cycles = relationship("Cycle", back_populates="user", passive_deletes=True)
+    reminders = relationship("Reminder", back_populates="user", passive_deletes=True)
 
 class Cycle(Base):
     __tablename__ = "cycles"
+    __table_args__ = (
+        # get_active_cycle / history: WHERE user_id = ? ORDER BY id DESC
+        Index("ix_cycles_user_id_id", "user_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     start_date = Column(DateTime, default=datetime.utcnow)
     end_date = Column(DateTime, nullable=True)
     
@@ -74,14 +85,18 @@ class Cycle(Base):
     status = Column(SQLEnum(CycleStatus), default=CycleStatus.ACTIVE)
     
     user = relationship("User", back_populates="cycles")
-    transactions = relationship("Transaction", back_populates="cycle")
-    budgets = relationship("CategoryBudget", back_populates="cycle")
+    transactions = relationship("Transaction", back_populates="cycle", passive_deletes=True)
+    budgets = relationship("CategoryBudget", back_populates="cycle", passive_deletes=True)
 
 class CategoryBudget(Base):
     __tablename__ = "category_budgets"
+    __table_args__ = (
+        # Envelopes of a cycle, optionally by name
+        Index("ix_category_budgets_cycle_category", "cycle_id", "category_name"),
+    )
     
     id = Column(Integer, primary_key=True)
-    cycle_id = Column(Integer, ForeignKey("cycles.id"))
+    cycle_id = Column(Integer, ForeignKey("cycles.id", ondelete="CASCADE"))
     category_name = Column(String, nullable=False)
     allocated_amount = Column(Float, default=0.0)
     spent_amount = Column(Float, default=0.0)
@@ -91,9 +106,17 @@ class CategoryBudget(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Ledger listings: WHERE cycle_id IN (...) ORDER BY date
+        Index("ix_transactions_cycle_date", "cycle_id", "date"),
+        # Corrections / per-category aggregates: WHERE cycle_id = ? AND type = ? AND category ...
+        Index("ix_transactions_cycle_type_category", "cycle_id", "type", "category"),
+        # report_pdf.ledger_fingerprint: count / max(id) / max(updated_at) per cycle and month, index-only
+        Index("ix_transactions_cycle_date_updated", "cycle_id", "date", "id", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True)
-    cycle_id = Column(Integer, ForeignKey("cycles.id"))
+    cycle_id = Column(Integer, ForeignKey("cycles.id", ondelete="CASCADE"))
     
     type = Column(SQLEnum(TransactionType), nullable=False)
     category = Column(String, nullable=True)
@@ -103,14 +126,20 @@ class Transaction(Base):
     
     description = Column(String, nullable=True)
     confidence_score = Column(Float, nullable=True)
+    # Set by every UPDATE (NULL until the first): report_pdf keys its ledger cache on it
+    updated_at = Column(DateTime, nullable=True, onupdate=datetime.utcnow)
     
     cycle = relationship("Cycle", back_populates="transactions")
 
 class Reminder(Base):
     __tablename__ = "reminders"
+    __table_args__ = (
+        # list_reminders / chat context: WHERE user_id = ? ORDER BY due_date
+        Index("ix_reminders_user_due", "user_id", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     title = Column(String, nullable=False)
     amount = Column(Float, default=0.0)
     due_date = Column(DateTime, nullable=True)
@@ -121,6 +150,82 @@ class Reminder(Base):
 
     user = relationship("User", back_populates="reminders")
 
+class BalanceLedger(Base):
+    """Running per-user totals so the balance can be read without scanning history.
+    Kept in sync by the flush hooks in ledger.py."""
+    __tablename__ = "balance_ledgers"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False, index=True)
+    total_income = Column(Float, default=0.0, nullable=False)
+    total_expenses = Column(Float, default=0.0, nullable=False)
+    # Envelope money allocated but not yet spent (active cycle only)
+    locked_amount = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MonthlyCategoryRollup(Base):
+    """Per user / cycle / month / type / category totals of transactions, so reports
+    and history scale with months × categories instead of rows.
+    Kept in sync by the flush hooks in rollups.py; category is lower-cased, "" = none."""
+    __tablename__ = "monthly_category_rollup"
+    __table_args__ = (
+        UniqueConstraint("user_id", "cycle_id", "month", "type", "category", name="uq_monthly_category_rollup_key"),
+        Index("ix_monthly_category_rollup_user_month", "user_id", "month"),
+        # ON DELETE CASCADE from cycles looks rows up by cycle_id
+        Index("ix_monthly_category_rollup_cycle", "cycle_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    cycle_id = Column(Integer, ForeignKey("cycles.id", ondelete="CASCADE"), nullable=False)
+    month = Column(String(7), nullable=False)  # "YYYY-MM"
+    type = Column(SQLEnum(TransactionType), nullable=False)
+    category = Column(String, nullable=False, default="")
+    total = Column(Float, default=0.0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+    first_date = Column(DateTime, nullable=True)
+    last_date = Column(DateTime, nullable=True)
+
+class ReportSummary(Base):
+    """AI narrative summaries of reports, keyed by a hash of the stats the model
+    was given, so unchanged months are never summarised twice (report_summaries.py)."""
+    __tablename__ = "report_summaries"
+    __table_args__ = (
+        UniqueConstraint("user_id", "stats_hash", name="uq_report_summaries_user_hash"),
+        Index("ix_report_summaries_user_used", "user_id", "used_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    stats_hash = Column(String(64), nullable=False)
+    summary = Column(Text, nullable=False)  # JSON: headline, paragraphs, bullets
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    used_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+
+class ReportJob(Base):
+    """A queued report PDF build or report email, run by the workers in report_jobs.py."""
+    __tablename__ = "report_jobs"
+    __table_args__ = (
+        Index("ix_report_jobs_status_run_after", "status", "run_after"),
+        Index("ix_report_jobs_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(10), nullable=False)  # "pdf" | "email" | "purge"
+    params = Column(Text, nullable=False)  # JSON: months, sections, refresh, to (purge: user_id)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    file_path = Column(String, nullable=True)  # finished PDF
+    worker = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    run_after = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)  # claim time, refreshed while the job runs
+    sent_at = Column(DateTime, nullable=True)  # email jobs: committed before the send, so a retry never resends
+    finished_at = Column(DateTime, nullable=True)
+
 # Database initialization
 import os
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///expense_tracker.db")
@@ -131,20 +236,19 @@ if DATABASE_URL.startswith("postgres://"):
 
 connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 engine = create_engine(DATABASE_URL, connect_args=connect_args, echo=False)
+
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _sqlite_foreign_keys(dbapi_connection, connection_record):
+        # SQLite ignores foreign keys (and so ON DELETE CASCADE) unless enabled per connection
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
-    # Migration: safely add is_admin column to existing databases (PostgreSQL)
-    from sqlalchemy import text
-    with engine.connect() as conn:
-        try:
-            conn.execute(text(
-                "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_admin BOOLEAN NOT NULL DEFAULT FALSE"
-            ))
-            conn.commit()
-        except Exception:
-            conn.rollback()  # column might already exist on SQLite or re-run
+    # Versioned, idempotent schema changes for databases created by older releases
+    from migrations import run_migrations
+    run_migrations(engine)
 
 def get_db():
     db = SessionLocal()
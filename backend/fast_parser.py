@@ -0,0 +1,222 @@
+"""Deterministic fast path for simple chat commands.
+
+Short, unambiguous messages — "paid 250 for food", "uber yday 340",
+"salary credited 50000", "allocate 5000 to food" — are parsed locally into
+the same `NLPResponse` the LLM would return, skipping the model round trip.
+Anything with more than one amount, a correction, a question, a loan/credit
+card/reminder, an unknown merchant or an implausible amount falls through to
+`parse_user_input`.
+
+The grammar understands:
+  amounts     250 · 2,500 · ₹250 · rs 250 · 2k · 2.5k · 1 lakh · 1.2L
+  dates       today · yesterday / yday · day before yesterday · N days ago ·
+              last <weekday> · on <weekday>
+  categories  the known category names and common merchants / synonyms
+
+Each attempt is counted; `stats()` returns the process-wide hit rate that
+POST /api/chat/ reports with every response. Offline accuracy / latency over
+the scenario list:
+    python -m benchmarks.nlp_scenarios
+"""
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from database import TransactionType
+from schemas import NLPResponse, NLPTransaction
+
+MIN_CONFIDENCE = float(os.getenv("CHAT_FAST_PATH_MIN_CONFIDENCE", "0.9"))
+# Larger single entries are left to the LLM to sanity-check
+MAX_AMOUNT = 100_000
+MAX_SALARY = 1_000_000
+
+# Canonical category → words that map to it
+CATEGORY_WORDS = {
+    "food": ("food", "lunch", "dinner", "breakfast", "snacks", "snack", "meal", "tea", "coffee",
+             "swiggy", "zomato", "restaurant", "pizza", "biryani"),
+    "groceries": ("groceries", "grocery", "vegetables", "veggies", "milk", "bigbasket", "blinkit", "zepto"),
+    "transport": ("transport", "uber", "ola", "rapido", "taxi", "cab", "auto", "metro", "bus", "train"),
+    "fuel": ("fuel", "petrol", "diesel"),
+    "rent": ("rent",),
+    "shopping": ("shopping", "amazon", "flipkart", "myntra", "clothes"),
+    "recharge": ("recharge", "mobile", "phone"),
+    "utilities": ("electricity", "water", "wifi", "internet", "broadband", "utilities"),
+    "entertainment": ("entertainment", "movie", "movies", "netflix", "spotify"),
+    "health": ("health", "medicine", "medicines", "doctor", "pharmacy", "hospital", "gym"),
+    "education": ("education", "books", "course", "tuition"),
+    "travel": ("travel", "trip", "flight", "hotel"),
+}
+WORD_TO_CATEGORY = {w: cat for cat, words in CATEGORY_WORDS.items() for w in words}
+
+INCOME_WORDS = {
+    "freelancing": "freelance", "freelance": "freelance", "bonus": "bonus", "refund": "refund",
+    "cashback": "cashback", "interest": "interest", "dividend": "dividend",
+}
+
+# Anything mentioning these needs the LLM (corrections, credit / loans, reminders, questions, multi-part)
+FALLBACK_WORDS = {
+    "actually", "not", "was", "wrong", "correct", "change", "changed", "instead", "undo", "delete", "remove",
+    "and", "&", "plus", "also", "then", "split",
+    "card", "credit", "borrowed", "lent", "loan", "emi", "owe", "returned", "return",
+    "remind", "reminder", "bill", "due", "subscription",
+    "report", "email", "download", "pdf",
+    "how", "what", "why", "when", "can", "should", "afford", "?",
+    "fresh", "start", "reset",
+}
+
+_AMOUNT = re.compile(
+    r"(?<![\w.])(?:₹|rs\.?|inr)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|l|lakh|lakhs|lac|lacs)?(?![\w])",
+    re.IGNORECASE,
+)
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "l": 1e5, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5}
+_DAYS_AGO = re.compile(r"\b(\d+) days? ago\b")
+_TOKEN = re.compile(r"[a-z]+|\?|&")
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+EXPENSE_VERBS = {"paid", "pay", "spent", "spend", "bought", "buy", "gave"}
+ALLOCATE_VERBS = {"allocate", "budget", "assign", "set", "put", "aside", "keep"}
+SALARY_VERBS = {"credited", "received", "got", "came", "salary"}
+INCOME_VERBS = {"got", "received", "earned", "credited"}
+FILLER = {"on", "for", "to", "of", "the", "a", "my", "rs", "inr", "rupees", "i", "me", "in", "at", "from",
+          "today", "yesterday", "yday", "ago", "days", "day", "before", "last", "k", "l", "lakh", "lakhs",
+          "lac", "lacs", "thousand"} | set(_WEEKDAYS)
+
+
+class FastParse(NamedTuple):
+    response: NLPResponse
+    confidence: float
+    rule: str
+
+
+_lock = threading.Lock()
+_counters = {"attempts": 0, "hits": 0}
+
+
+def stats() -> dict:
+    with _lock:
+        attempts, hits = _counters["attempts"], _counters["hits"]
+    return {"attempts": attempts, "hits": hits, "hit_rate": round(hits / attempts, 4) if attempts else 0.0}
+
+
+def _record(hit: bool):
+    with _lock:
+        _counters["attempts"] += 1
+        _counters["hits"] += int(hit)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Grammar pieces
+# ──────────────────────────────────────────────────────────────
+
+def parse_amounts(text: str) -> list:
+    """Every amount in `text`, with k / lakh suffixes applied."""
+    amounts = []
+    for number, suffix in _AMOUNT.findall(text):
+        value = float(number.replace(",", ""))
+        if suffix:
+            value *= _MULTIPLIERS[suffix.lower()]
+        amounts.append(value)
+    return amounts
+
+
+def parse_relative_date(text: str, now: datetime) -> Optional[datetime]:
+    """Resolve today / yesterday / N days ago / last <weekday>; None if no date words."""
+    words = _TOKEN.findall(text)
+    if "day before yesterday" in text:
+        return now - timedelta(days=2)
+    if "yesterday" in words or "yday" in words:
+        return now - timedelta(days=1)
+    if "today" in words:
+        return now
+    match = _DAYS_AGO.search(text)
+    if match:
+        return now - timedelta(days=int(match.group(1)))
+    for i, word in enumerate(words):
+        if word in _WEEKDAYS and i > 0 and words[i - 1] in ("last", "on"):
+            back = (now.weekday() - _WEEKDAYS.index(word)) % 7 or 7
+            return now - timedelta(days=back)
+    return None
+
+
+def _iso(date: Optional[datetime]) -> Optional[str]:
+    return date.strftime("%Y-%m-%dT%H:%M:%S") if date else None
+
+
+def _response(tx_type: TransactionType, amount: float, category: Optional[str], date: Optional[datetime],
+              intent: str, confidence: float) -> NLPResponse:
+    return NLPResponse(transactions=[NLPTransaction(
+        type=tx_type, amount=amount, category=category, date=_iso(date),
+        intent=intent, confidence_score=confidence,
+    )])
+
+
+# ──────────────────────────────────────────────────────────────
+#  Rules
+# ──────────────────────────────────────────────────────────────
+
+def _classify(message: str, now: datetime) -> Optional[FastParse]:
+    text = message.strip().lower()
+    if not text or "$" in text or len(text) > 80:
+        return None
+    date = parse_relative_date(text, now)
+    text = _DAYS_AGO.sub(" ", text)  # "2 days ago" is a date, not an amount
+    amounts = parse_amounts(text)
+    if len(amounts) != 1 or not (0 < amounts[0] <= MAX_SALARY):
+        return None
+    amount = amounts[0]
+
+    # Words with the amount removed ("2k" must not leave a stray "k" behind)
+    words = _TOKEN.findall(_AMOUNT.sub(" ", text))
+    if any(w in FALLBACK_WORDS for w in words):
+        return None
+    if date is None and any(w in _WEEKDAYS or w == "ago" for w in words):
+        return None  # a date we could not resolve
+    content = [w for w in words if w not in FILLER]
+    categories = {WORD_TO_CATEGORY[w] for w in content if w in WORD_TO_CATEGORY}
+    unknown = [w for w in content if w not in WORD_TO_CATEGORY and w not in EXPENSE_VERBS
+               and w not in ALLOCATE_VERBS and w not in SALARY_VERBS and w not in INCOME_WORDS
+               and w not in INCOME_VERBS]
+
+    # salary credited 50000 · got salary 50k
+    if "salary" in content and not categories and not unknown:
+        return FastParse(_response(TransactionType.SALARY, amount, "salary", date,
+                                   "Salary credited", 0.95), 0.95, "salary")
+    if amount > MAX_AMOUNT:
+        return None
+
+    # allocate 5000 to food · budget 3000 for rent · set aside 2k for fuel
+    if content and content[0] in ALLOCATE_VERBS and len(categories) == 1 and not unknown and date is None:
+        category = categories.pop()
+        return FastParse(_response(TransactionType.ALLOCATE_BUDGET, amount, category, None,
+                                   f"allocate to {category}", 0.95), 0.95, "allocate")
+
+    # freelancing 8000 · got bonus 5000 · received refund 300
+    income = {INCOME_WORDS[w] for w in content if w in INCOME_WORDS}
+    if len(income) == 1 and not categories and not unknown and not (set(content) & EXPENSE_VERBS):
+        category = income.pop()
+        return FastParse(_response(TransactionType.INCOME, amount, category, date,
+                                   category, 0.92), 0.92, "income")
+
+    # paid 250 for food · uber yday 340 · amazon 1200 · spent 2k on groceries
+    # ("amazon refund 300" / "food budget 3000" mean money in or an allocation: leave them to the LLM)
+    if set(content) & (SALARY_VERBS | INCOME_VERBS | set(INCOME_WORDS) | ALLOCATE_VERBS):
+        return None
+    if len(categories) == 1 and not unknown:
+        category = categories.pop()
+        merchant = next((w for w in content if w in WORD_TO_CATEGORY), category)
+        verb = bool(set(content) & EXPENSE_VERBS)
+        confidence = 0.95 if verb else 0.9
+        return FastParse(_response(TransactionType.EXPENSE, amount, category, date,
+                                   merchant, confidence), confidence, "expense")
+    return None
+
+
+def parse(message: str, now: datetime = None) -> Optional[FastParse]:
+    """Parse `message` locally, or return None when the LLM should handle it."""
+    result = _classify(message, now or datetime.utcnow())
+    if result is not None and result.confidence < MIN_CONFIDENCE:
+        result = None
+    _record(result is not None)
+    return result
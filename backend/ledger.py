@@ -0,0 +1,321 @@
+"""Per-user running balance ledger.
+
+`BalanceLedger` holds each user's income / expense totals and the money locked
+in envelopes, so reading the balance is a single-row lookup instead of a scan
+over the whole transaction history.
+
+The ledger is maintained by session flush hooks: every Transaction, envelope or
+cycle change that goes through the ORM adjusts the matching ledger row inside
+the same DB transaction, whichever route or state-machine handler made it.
+Totals are adjusted with SQL-side increments (`total_income = total_income + d`),
+so concurrent writes by the same user never lose each other's delta. The row is
+created with the user (older users: migration 4, or on first use).
+Bulk `query().delete()` / core inserts bypass the hooks — callers using those
+must call `rebuild_ledger` (or delete the row) themselves.
+
+Reconcile against raw transactions:
+    python ledger.py reconcile [--user ID] [--fix]
+"""
+from datetime import datetime
+
+from sqlalchemy import case, event, func, insert, inspect, literal, select
+from sqlalchemy.orm import Session, attributes
+from sqlalchemy.sql import ClauseElement
+
+import aggregates
+from aggregates import INCOME_TYPES
+from database import (
+    SessionLocal, BalanceLedger, Cycle, CycleStatus, CategoryBudget, Transaction, TransactionType, User,
+)
+
+DRIFT_TOLERANCE = 0.005
+
+
+# ──────────────────────────────────────────────────────────────
+#  Reads
+# ──────────────────────────────────────────────────────────────
+
+def get_ledger(db: Session, user_id: int) -> BalanceLedger:
+    """Return the user's ledger row, building it from raw data the first time."""
+    with db.no_autoflush:
+        ledger = db.query(BalanceLedger).filter(BalanceLedger.user_id == user_id).first()
+        if ledger is None:
+            _insert_missing(db, user_id)
+            ledger = db.query(BalanceLedger).filter(BalanceLedger.user_id == user_id).one()
+    return ledger
+
+
+def get_balance(db: Session, user_id: int) -> float:
+    """Available balance = income − expenses − envelope money still locked."""
+    ledger = get_ledger(db, user_id)
+    return ledger.total_income - ledger.total_expenses - ledger.locked_amount
+
+
+# ──────────────────────────────────────────────────────────────
+#  Full rebuild (first use, reconciliation, bulk writes)
+# ──────────────────────────────────────────────────────────────
+
+def compute_raw_totals(db: Session, user_id: int) -> dict:
+    """Aggregate the user's transactions and active envelopes straight from the tables."""
+    with db.no_autoflush:
+        totals = aggregates.user_totals(db, user_id)
+    return {
+        "total_income": totals["total_income"],
+        "total_expenses": totals["total_expenses"],
+        "locked_amount": compute_locked(db, user_id),
+    }
+
+
+def compute_locked(db: Session, user_id: int) -> float:
+    """Money allocated to the active cycle's envelopes but not yet spent."""
+    with db.no_autoflush:
+        active = db.query(Cycle.id).filter(
+            Cycle.user_id == user_id,
+            Cycle.status != CycleStatus.CLOSED,
+        ).order_by(Cycle.id.desc()).first()
+        return aggregates.envelope_locked(db, active.id) if active else 0.0
+
+
+def _fill_from_raw(db: Session, ledger: BalanceLedger):
+    for key, value in compute_raw_totals(db, ledger.user_id).items():
+        setattr(ledger, key, value)
+
+
+def _insert_missing(db: Session, user_id: int):
+    """INSERT the user's ledger row built from raw data, unless a row already exists.
+    Two first writes can race here, so the loser's INSERT does nothing instead of
+    failing on the unique user_id (Postgres waits for the winner to commit)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    values = {"user_id": user_id, "updated_at": datetime.utcnow(), **compute_raw_totals(db, user_id)}
+    db.connection().execute(
+        dialect_insert(BalanceLedger.__table__).values(**values).on_conflict_do_nothing(index_elements=["user_id"])
+    )
+
+
+def rebuild_ledger(db: Session, user_id: int) -> BalanceLedger:
+    """Overwrite the user's ledger with totals recomputed from raw rows (no commit)."""
+    ledger = get_ledger(db, user_id)
+    _fill_from_raw(db, ledger)
+    return ledger
+
+
+def backfill_missing(db: Session) -> int:
+    """Build the ledger of every user that has none yet with one INSERT … SELECT
+    (grouped totals + the active cycle's envelopes). Returns rows written. No commit."""
+    totals = (
+        select(Cycle.user_id.label("user_id"),
+               aggregates.income_sum().label("income"), aggregates.expense_sum().label("expenses"))
+        .select_from(Transaction)
+        .join(Cycle, Transaction.cycle_id == Cycle.id)
+        .group_by(Cycle.user_id)
+        .subquery()
+    )
+    active = (
+        select(Cycle.user_id.label("user_id"), func.max(Cycle.id).label("cycle_id"))
+        .where(Cycle.status != CycleStatus.CLOSED)
+        .group_by(Cycle.user_id)
+        .subquery()
+    )
+    remaining = CategoryBudget.allocated_amount - CategoryBudget.spent_amount
+    locked = (
+        select(active.c.user_id, func.sum(case((remaining > 0, remaining), else_=0.0)).label("locked"))
+        .join(CategoryBudget, CategoryBudget.cycle_id == active.c.cycle_id)
+        .group_by(active.c.user_id)
+        .subquery()
+    )
+    rows = (
+        select(User.id, func.coalesce(totals.c.income, 0.0), func.coalesce(totals.c.expenses, 0.0),
+               func.coalesce(locked.c.locked, 0.0), literal(datetime.utcnow()))
+        .outerjoin(totals, totals.c.user_id == User.id)
+        .outerjoin(locked, locked.c.user_id == User.id)
+        .where(User.id.not_in(select(BalanceLedger.user_id)))
+    )
+    b = BalanceLedger
+    result = db.execute(insert(b).from_select(
+        [b.user_id, b.total_income, b.total_expenses, b.locked_amount, b.updated_at], rows,
+    ))
+    return result.rowcount
+
+
+def reconcile(db: Session, user_id: int = None, fix: bool = False) -> list:
+    """Compare every stored ledger with the raw data and report drift.
+    With `fix=True` drifted (or missing) ledgers are rewritten and committed."""
+    query = db.query(User.id, User.username).order_by(User.id)
+    if user_id is not None:
+        query = query.filter(User.id == user_id)
+
+    report = []
+    for uid, username in query.all():
+        stored = db.query(BalanceLedger).filter(BalanceLedger.user_id == uid).first()
+        expected = compute_raw_totals(db, uid)
+        # A missing ledger is built lazily on first read, so it only counts as
+        # drift when the user actually has data.
+        drift = {
+            key: round((getattr(stored, key, 0.0) or 0.0) - value, 2)
+            for key, value in expected.items()
+        }
+        drifted = any(abs(d) > DRIFT_TOLERANCE for d in drift.values())
+        if drifted:
+            report.append({"user_id": uid, "username": username, "missing": stored is None,
+                           "expected": expected, "drift": drift})
+            if fix:
+                rebuild_ledger(db, uid)
+    if fix:
+        db.commit()
+    return report
+
+
+# ──────────────────────────────────────────────────────────────
+#  Flush hooks (keep the ledger in step with every ORM write)
+# ──────────────────────────────────────────────────────────────
+
+def committed_value(obj, key):
+    """Value of `key` before the pending change (current value if unchanged)."""
+    hist = attributes.get_history(obj, key)
+    if hist.deleted:
+        return hist.deleted[0]
+    if hist.unchanged:
+        return hist.unchanged[0]
+    return getattr(obj, key)
+
+
+def _effect(tx_type, amount) -> tuple:
+    """(income, expense) contribution of a single transaction."""
+    amount = amount or 0.0
+    if tx_type in INCOME_TYPES:
+        return amount, 0.0
+    if tx_type == TransactionType.EXPENSE:
+        return 0.0, amount
+    return 0.0, 0.0
+
+
+def get_ledger_for_flush(session, user_id: int) -> BalanceLedger:
+    """Like get_ledger, but safe to call from inside a flush: a missing row is
+    built from the committed state (pending changes are applied on top)."""
+    for obj in session.new:
+        if isinstance(obj, BalanceLedger) and obj.user_id == user_id:
+            return obj
+    return get_ledger(session, user_id)
+
+
+def increment(obj, key: str, delta: float):
+    """Add `delta` to a numeric column of `obj`. A stored row gets `SET key = key + delta`
+    at flush, so concurrent writers each add their own change instead of overwriting
+    one another's; a pending or just-assigned value is adjusted in Python. The
+    attribute holds a SQL expression until the flush (it reloads after commit)."""
+    if not delta:
+        return
+    current = getattr(obj, key)
+    if isinstance(current, ClauseElement):
+        setattr(obj, key, current + delta)
+    elif inspect(obj).pending or attributes.get_history(obj, key).added:
+        setattr(obj, key, (current or 0.0) + delta)
+    else:
+        setattr(obj, key, func.coalesce(getattr(type(obj), key), 0.0) + delta)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _ledger_before_flush(session, flush_context, instances):
+    cycle_owner = {}
+    deltas = {}
+    locked_users = session.info.setdefault("ledger_locked_users", set())
+
+    def owner_of(cycle_id, cycle=None):
+        if cycle_id is None:
+            # Transaction attached to a cycle that is itself still pending
+            return cycle.user_id if cycle is not None else None
+        if cycle_id not in cycle_owner:
+            with session.no_autoflush:
+                cycle = session.get(Cycle, cycle_id)
+            cycle_owner[cycle_id] = cycle.user_id if cycle else None
+        return cycle_owner[cycle_id]
+
+    def apply(user_id, income, expense, sign):
+        if user_id is None or (not income and not expense):
+            return
+        totals = deltas.setdefault(user_id, [0.0, 0.0])
+        totals[0] += sign * income
+        totals[1] += sign * expense
+
+    for obj in list(session.new):
+        if isinstance(obj, User):
+            session.info.setdefault("ledger_new_users", []).append(obj)
+        elif isinstance(obj, Transaction):
+            apply(owner_of(obj.cycle_id, obj.cycle), *_effect(obj.type, obj.amount), 1)
+        elif isinstance(obj, CategoryBudget):
+            locked_users.add(owner_of(obj.cycle_id, obj.cycle))
+        elif isinstance(obj, Cycle):
+            locked_users.add(obj.user_id)
+
+    for obj in list(session.dirty):
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, Transaction):
+            apply(owner_of(committed_value(obj, "cycle_id")),
+                  *_effect(committed_value(obj, "type"), committed_value(obj, "amount")), -1)
+            apply(owner_of(obj.cycle_id), *_effect(obj.type, obj.amount), 1)
+        elif isinstance(obj, CategoryBudget):
+            locked_users.add(owner_of(committed_value(obj, "cycle_id")))
+            locked_users.add(owner_of(obj.cycle_id))
+        elif isinstance(obj, Cycle) and attributes.get_history(obj, "status").has_changes():
+            locked_users.add(obj.user_id)
+
+    for obj in list(session.deleted):
+        if isinstance(obj, Transaction):
+            apply(owner_of(committed_value(obj, "cycle_id")),
+                  *_effect(committed_value(obj, "type"), committed_value(obj, "amount")), -1)
+        elif isinstance(obj, CategoryBudget):
+            locked_users.add(owner_of(committed_value(obj, "cycle_id")))
+        elif isinstance(obj, Cycle):
+            locked_users.add(obj.user_id)
+
+    locked_users.discard(None)
+    for user_id, (income, expense) in deltas.items():
+        ledger = get_ledger_for_flush(session, user_id)
+        increment(ledger, "total_income", income)
+        increment(ledger, "total_expenses", expense)
+
+
+@event.listens_for(SessionLocal, "after_flush_postexec")
+def _ledger_after_flush(session, flush_context):
+    # Envelope/cycle changes are now in the DB, so recompute locked money from it.
+    # The ledger row is flushed by the next flush (commit keeps flushing until clean).
+    # New users get their (empty) ledger row in the same transaction, so later
+    # writes only ever UPDATE it.
+    for user in session.info.pop("ledger_new_users", []):
+        session.add(BalanceLedger(user_id=user.id, total_income=0.0, total_expenses=0.0, locked_amount=0.0))
+    users = session.info.pop("ledger_locked_users", set())
+    for user_id in users:
+        ledger = get_ledger_for_flush(session, user_id)
+        locked = compute_locked(session, user_id)
+        if ledger.locked_amount != locked:
+            ledger.locked_amount = locked
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Balance ledger maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("reconcile", help="Rebuild ledgers from raw transactions and report drift")
+    rec.add_argument("--user", type=int, default=None, help="Only this user id")
+    rec.add_argument("--fix", action="store_true", help="Rewrite drifted ledgers")
+    args = parser.parse_args()
+
+    from database import init_db
+    init_db()
+    db = SessionLocal()
+    try:
+        drifted = reconcile(db, user_id=args.user, fix=args.fix)
+        for row in drifted:
+            state = "missing" if row["missing"] else "drift " + ", ".join(
+                f"{k}={v:+,.2f}" for k, v in row["drift"].items() if abs(v) > DRIFT_TOLERANCE
+            )
+            print(f"user {row['user_id']} ({row['username']}): {state}")
+        action = "fixed" if args.fix else "found"
+        print(f"{len(drifted)} ledger(s) with drift {action}.")
+    finally:
+        db.close()
@@ -0,0 +1,423 @@
+"""One gateway for every Azure OpenAI call.
+
+Each call goes through, in order:
+
+  circuit breaker   after LLM_BREAKER_FAILURES consecutive failed attempts the
+                    breaker opens and calls fail immediately for
+                    LLM_BREAKER_RESET seconds; then a single probe call is let
+                    through and its outcome closes or re-opens the breaker
+  concurrency cap   at most LLM_MAX_CONCURRENCY calls in flight per process and
+                    LLM_MAX_PER_USER per user; waiting for a slot counts
+                    against the call's deadline
+  deadline          LLM_TIMEOUT per attempt, LLM_DEADLINE for the whole call
+                    including retries and queueing
+  retries           up to LLM_MAX_RETRIES more attempts for timeouts,
+                    connection errors, 429s and 5xx, with full-jitter
+                    exponential backoff (a 429's Retry-After is honoured)
+
+Anything that ends without an answer for those reasons raises `LLMUnavailable`;
+callers catch it and fall back (rule-based report summary, parser message,
+503). Other API errors (bad request, auth) are raised unchanged and do not
+trip the breaker.
+
+All calls share one AsyncAzureOpenAI client (`get_client()`), built on first
+use with a pooled keep-alive httpx connection pool (HTTP/2 when the optional
+`h2` package is installed) and closed on app shutdown (`close_client()`).
+`openai` and `httpx` are only imported then, so importing the app stays cheap.
+
+`stats()` returns per-purpose latency histograms and outcome counters — served
+at GET /api/admin/llm-stats. Fault-injection check:
+    python -m benchmarks.llm_faults
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_PER_USER = int(os.getenv("LLM_MAX_PER_USER", "2"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Connection pool of the shared client; sized to the concurrency cap by default
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", str(LLM_MAX_CONCURRENCY)))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", str(LLM_MAX_CONCURRENCY)))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "120"))
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def _retryable_errors() -> tuple:
+    import openai
+    return (
+        asyncio.TimeoutError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    )
+
+
+class LLMUnavailable(Exception):
+    """The model could not be reached in time: breaker open, no free slot,
+    deadline passed or retries exhausted. `reason` says which."""
+
+    def __init__(self, reason: str, detail: str = ""):
+        self.reason = reason
+        super().__init__(f"LLM unavailable ({reason}){': ' + detail if detail else ''}")
+
+
+# ──────────────────────────────────────────────────────────────
+#  Shared client
+# ──────────────────────────────────────────────────────────────
+
+_client = None
+_client_loop = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client():
+    """The process-wide AsyncAzureOpenAI client, created on first use.
+
+    Connections are pooled and kept alive between calls, so a warm worker
+    skips the TCP + TLS handshake. The pool belongs to the event loop that
+    created it; a new loop (a script calling asyncio.run twice) gets a new client."""
+    global _client, _client_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if _client is None or _client_loop is not loop:
+        import httpx
+        from openai import AsyncAzureOpenAI
+
+        http_client = httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=LLM_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+            ),
+            # Backstop only — the gateway's own per-attempt timeout fires first
+            timeout=httpx.Timeout(LLM_DEADLINE, connect=10.0),
+        )
+        _client = AsyncAzureOpenAI(
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", ""),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY", ""),
+            api_version=os.getenv("OPENAI_API_VERSION", "2024-12-01-preview"),
+            max_retries=0,  # retries happen here, not in the SDK
+            http_client=http_client,
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    """Close the shared client's connections (app shutdown)."""
+    global _client, _client_loop
+    if _client is not None:
+        client, _client, _client_loop = _client, None, None
+        await client.close()
+
+
+# ──────────────────────────────────────────────────────────────
+#  Circuit breaker
+# ──────────────────────────────────────────────────────────────
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether an attempt may go out now (claims the probe slot when half-open)."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state, self._probe_in_flight = self.HALF_OPEN, False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Open and still cooling down — callers need not even queue for a slot."""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures, self._probe_in_flight = self.CLOSED, 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state, self.opened_at, self._probe_in_flight = self.OPEN, time.monotonic(), False
+
+    def release_probe(self):
+        """A half-open probe ended without a verdict (e.g. a non-retryable error)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+# ──────────────────────────────────────────────────────────────
+#  Concurrency limits
+# ──────────────────────────────────────────────────────────────
+
+class _Limiter:
+    """Process-wide and per-user slot counts. Semaphores are per event loop so
+    the module also works under repeated asyncio.run() (benchmarks, scripts)."""
+
+    def __init__(self, total: int = LLM_MAX_CONCURRENCY, per_user: int = LLM_MAX_PER_USER):
+        self.total = total
+        self.per_user = per_user
+        self._loop = None
+        self._global = None
+        self._users = {}  # user_id -> [semaphore, holders + waiters]
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._global, self._users = loop, asyncio.Semaphore(self.total), {}
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[int], timeout: float):
+        self._bind()
+        entry = None
+        if user_id is not None:
+            entry = self._users.setdefault(user_id, [asyncio.Semaphore(self.per_user), 0])
+            entry[1] += 1
+        acquired = []
+        try:
+            start = time.monotonic()
+            for sem in ([entry[0]] if entry else []) + [self._global]:
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise LLMUnavailable("busy", "no free LLM slot before the deadline")
+                try:
+                    await asyncio.wait_for(sem.acquire(), remaining)
+                except asyncio.TimeoutError:
+                    raise LLMUnavailable("busy", "no free LLM slot before the deadline")
+                acquired.append(sem)
+            yield
+        finally:
+            for sem in acquired:
+                sem.release()
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0 and self._users.get(user_id) is entry:
+                    del self._users[user_id]
+
+    def in_flight(self) -> int:
+        return self.total - self._global._value if self._global is not None else 0
+
+
+# ──────────────────────────────────────────────────────────────
+#  Metrics
+# ──────────────────────────────────────────────────────────────
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float):
+        i = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound), len(LATENCY_BUCKETS_MS))
+        self.counts[i] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def to_dict(self) -> dict:
+        # Cumulative, Prometheus-style
+        buckets, running = {}, 0
+        for bound, count in zip([str(b) for b in LATENCY_BUCKETS_MS] + ["+Inf"], self.counts):
+            running += count
+            buckets[bound] = running
+        return {"buckets_ms": buckets, "count": self.total, "sum_ms": round(self.sum_ms, 1)}
+
+
+_metrics_lock = threading.Lock()
+_histograms = {}  # purpose -> _Histogram (whole calls, retries and queueing included)
+_outcomes = {}    # purpose -> {outcome: count}
+
+
+def _observe(purpose: str, outcome: str, started: float):
+    with _metrics_lock:
+        _histograms.setdefault(purpose, _Histogram()).observe((time.monotonic() - started) * 1000)
+        counts = _outcomes.setdefault(purpose, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+
+def _count(purpose: str, outcome: str):
+    with _metrics_lock:
+        counts = _outcomes.setdefault(purpose, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+
+breaker = CircuitBreaker()
+limiter = _Limiter()
+
+
+def stats() -> dict:
+    with _metrics_lock:
+        calls = {
+            purpose: {"latency": hist.to_dict(), "outcomes": dict(_outcomes.get(purpose, {}))}
+            for purpose, hist in _histograms.items()
+        }
+    return {
+        "breaker": {"state": breaker.state, "consecutive_failures": breaker.failures},
+        "in_flight": limiter.in_flight(),
+        "limits": {"global": limiter.total, "per_user": limiter.per_user},
+        "calls": calls,
+    }
+
+
+def reset():
+    """Fresh breaker, limiter and metrics (benchmarks and scripts)."""
+    global breaker, limiter
+    breaker, limiter = CircuitBreaker(), _Limiter()
+    with _metrics_lock:
+        _histograms.clear()
+        _outcomes.clear()
+
+
+# ──────────────────────────────────────────────────────────────
+#  Calls
+# ──────────────────────────────────────────────────────────────
+
+def _backoff(attempt: int, error: Exception) -> float:
+    import openai
+    retry_after = None
+    response = getattr(error, "response", None)
+    if isinstance(error, openai.RateLimitError) and response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after", ""))
+        except ValueError:
+            pass
+    return retry_after if retry_after is not None else random.uniform(0, LLM_RETRY_BASE_DELAY * 2 ** attempt)
+
+
+async def _attempts(client, purpose: str, started: float, end: float, kwargs: dict):
+    """Run create() with the breaker, per-attempt timeout and retries; returns its
+    result (a completion, or an open stream when stream=True). The caller holds
+    the concurrency slot."""
+    import openai
+    retryable = _retryable_errors()
+    last_error = None
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if not breaker.allow():
+            _observe(purpose, "rejected_open", started)
+            raise LLMUnavailable("circuit_open", "recent LLM calls failed; not calling the model")
+        remaining = end - time.monotonic()
+        try:
+            result = await asyncio.wait_for(
+                client.chat.completions.create(**kwargs), min(LLM_TIMEOUT, max(remaining, 0.001)),
+            )
+        except retryable as e:
+            breaker.record_failure()
+            last_error = e
+            _count(purpose, "timeout" if isinstance(e, (asyncio.TimeoutError, openai.APITimeoutError)) else "error")
+            delay = _backoff(attempt, e)
+            if attempt == LLM_MAX_RETRIES or time.monotonic() + delay >= end:
+                break
+            _count(purpose, "retry")
+            await asyncio.sleep(delay)
+            continue
+        except Exception:
+            breaker.release_probe()
+            _observe(purpose, "failed", started)
+            raise
+        breaker.record_success()
+        return result
+    _observe(purpose, "failed", started)
+    raise LLMUnavailable("exhausted", f"{type(last_error).__name__}: {last_error}")
+
+
+@asynccontextmanager
+async def _call_slot(purpose: str, user_id: Optional[int], deadline: float):
+    """Fail fast on an open breaker, then hold a concurrency slot for the call."""
+    started = time.monotonic()
+    if breaker.is_open():
+        _observe(purpose, "rejected_open", started)
+        raise LLMUnavailable("circuit_open", "recent LLM calls failed; not calling the model")
+    try:
+        async with limiter.slot(user_id, deadline):
+            yield started
+    except LLMUnavailable as e:
+        if e.reason == "busy":
+            _observe(purpose, "rejected_busy", started)
+        raise
+
+
+async def complete(purpose: str, user_id: Optional[int] = None, deadline: float = LLM_DEADLINE, client=None,
+                   **kwargs):
+    """`chat.completions.create(**kwargs)` on the shared client (or `client`)
+    through the gateway. `purpose` labels the metrics ("chat", "report_summary",
+    "split", ...)."""
+    async with _call_slot(purpose, user_id, deadline) as started:
+        response = await _attempts(client or get_client(), purpose, started, started + deadline, kwargs)
+    _observe(purpose, "ok", started)
+    return response
+
+
+async def stream(purpose: str, user_id: Optional[int] = None, deadline: float = LLM_DEADLINE, client=None,
+                 **kwargs):
+    """Streaming `create(stream=True, ...)` through the gateway; yields the chunks.
+
+    Opening the stream is retried like `complete`. Once chunks are flowing a
+    failure cannot be retried (part of the answer has been used), so a stall
+    longer than LLM_TIMEOUT between chunks or passing the deadline raises
+    `LLMUnavailable`. The concurrency slot is held until the stream ends."""
+    async with _call_slot(purpose, user_id, deadline) as started:
+        end = started + deadline
+        response = await _attempts(client or get_client(), purpose, started, end, {**kwargs, "stream": True})
+        chunks = response.__aiter__()
+        outcome = "failed"
+        try:
+            while True:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise LLMUnavailable("deadline", "stream did not finish before the deadline")
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), min(LLM_TIMEOUT, remaining))
+                except StopAsyncIteration:
+                    break
+                except _retryable_errors() as e:
+                    breaker.record_failure()
+                    raise LLMUnavailable("stream_failed", f"{type(e).__name__}: {e}")
+                yield chunk
+            outcome = "ok"
+        finally:
+            _observe(purpose, outcome, started)
+            close = getattr(response, "close", None)
+            if close is not None:
+                await close()
@@ -55,6 +55,31 @@ def on_startup():
     finally:
         db.close()
 
+@app.on_event("startup")
+async def start_report_workers():
+    # Background PDF / email jobs (REPORT_WORKERS=0 to run them in a separate process)
+    import asyncio
+    import passwords
+    import report_jobs
+    import report_pdf
+    report_jobs.start_workers(asyncio.get_running_loop())
+    # Start the PDF render and password hashing processes now rather than on first use
+    report_pdf.warm_up()
+    passwords.warm_up()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Let running report jobs finish, stop the PDF and hashing processes, then close the pooled LLM connections
+    from fastapi.concurrency import run_in_threadpool
+    import llm_gateway
+    import passwords
+    import report_jobs
+    import report_pdf
+    await run_in_threadpool(report_jobs.stop_workers)
+    await run_in_threadpool(report_pdf.shutdown_pool)
+    await run_in_threadpool(passwords.shutdown_pool)
+    await llm_gateway.close_client()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Expense Tracker API"}
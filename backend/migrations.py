@@ -0,0 +1,236 @@
+"""Versioned schema migrations, applied by init_db() on every startup.
+
+`Base.metadata.create_all` only creates missing *tables*; it never alters an
+existing one. Each step below brings a database created by an older release up
+to date. Steps are idempotent (they check before changing anything) and the
+applied version numbers are recorded in `schema_migrations`, so they run once
+per database on both SQLite and PostgreSQL.
+
+Check that the hot queries still use their indexes (SQLite):
+    python migrations.py check-plans
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.exc import IntegrityError
+
+from database import Base, Cycle, CategoryBudget, MonthlyCategoryRollup, Reminder, Transaction
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+
+def _add_is_admin_column(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("users")}
+    if "is_admin" not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN is_admin BOOLEAN NOT NULL DEFAULT FALSE"))
+
+
+def _create_query_indexes(conn):
+    for model in (Transaction, Cycle, CategoryBudget, Reminder):
+        columns = {c["name"] for c in inspect(conn).get_columns(model.__tablename__)}
+        for index in model.__table__.indexes:
+            # Indexes on columns a later step adds are created by that step
+            if all(c.name in columns for c in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+def _backfill_monthly_rollup(conn):
+    from sqlalchemy.orm import Session
+    from rollups import backfill
+    session = Session(bind=conn)
+    backfill(session)
+    session.flush()
+
+
+def _backfill_balance_ledgers(conn):
+    # Ledgers used to be built lazily on a user's first balance read; the admin
+    # listing sorts on them, so every user needs one
+    from sqlalchemy.orm import Session
+    from ledger import backfill_missing
+    session = Session(bind=conn)
+    backfill_missing(session)
+    session.flush()
+
+
+def _add_transaction_updated_at(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("transactions")}
+    if "updated_at" not in columns:
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN updated_at TIMESTAMP"))
+    for index in Transaction.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _rollup_undated_transactions(conn):
+    # The rollup used to skip transactions without a date; they now go under the
+    # "undated" month key, so rebuild the users that have any
+    from sqlalchemy.orm import Session
+    from rollups import backfill
+    session = Session(bind=conn)
+    user_ids = [uid for (uid,) in session.query(Cycle.user_id).join(Transaction).filter(
+        Transaction.date.is_(None)).distinct()]
+    for user_id in user_ids:
+        backfill(session, user_id)
+    session.flush()
+
+
+def _add_report_job_sent_at(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("report_jobs")}
+    if "sent_at" not in columns:
+        conn.execute(text("ALTER TABLE report_jobs ADD COLUMN sent_at TIMESTAMP"))
+
+
+def _needs_cascade(conn, table) -> bool:
+    return any(
+        (fk["options"].get("ondelete") or "").upper() != "CASCADE"
+        for fk in inspect(conn).get_foreign_keys(table.name)
+    )
+
+
+def _rebuild_sqlite_table(conn, table):
+    """SQLite can't alter a foreign key: create the table afresh from its model,
+    copy the rows whose parents still exist (old deletes left orphans), swap it in."""
+    new_name = f"{table.name}__new"
+    create = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.exec_driver_sql(create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {new_name} ", 1))
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    columns = ", ".join(c.name for c in table.columns if c.name in existing)
+    parents_exist = " AND ".join(
+        f"({fk.parent.name} IS NULL OR {fk.parent.name} IN (SELECT {fk.column.name} FROM {fk.column.table.name}))"
+        for fk in table.foreign_keys
+    ) or "1 = 1"
+    conn.exec_driver_sql(
+        f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name} WHERE {parents_exist}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    conn.exec_driver_sql(f"ALTER TABLE {new_name} RENAME TO {table.name}")
+    for index in table.indexes:
+        index.create(conn)
+
+
+def _cascade_foreign_keys(conn):
+    tables = [t for t in Base.metadata.sorted_tables if t.foreign_keys and _needs_cascade(conn, t)]
+    if tables and conn.dialect.name == "sqlite":
+        # Rebuilding needs foreign keys off, which SQLite only allows outside a
+        # transaction, so it runs on a connection of its own. Parents go first.
+        with conn.engine.connect() as rebuild:
+            rebuild.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            try:
+                rebuild.exec_driver_sql("BEGIN")
+                for table in tables:
+                    _rebuild_sqlite_table(rebuild, table)
+                rebuild.commit()
+            except Exception:
+                rebuild.rollback()
+                raise
+            finally:
+                rebuild.exec_driver_sql("PRAGMA foreign_keys=ON")
+    else:
+        for table in tables:
+            for fk in inspect(conn).get_foreign_keys(table.name):
+                if (fk["options"].get("ondelete") or "").upper() == "CASCADE":
+                    continue
+                columns = ", ".join(fk["constrained_columns"])
+                referred = ", ".join(fk["referred_columns"])
+                conn.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT "{fk["name"]}"'))
+                conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD CONSTRAINT "{fk["name"]}" FOREIGN KEY ({columns}) '
+                    f'REFERENCES {fk["referred_table"]} ({referred}) ON DELETE CASCADE'
+                ))
+    for index in MonthlyCategoryRollup.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+# (version, name, step) — append only, never renumber.
+MIGRATIONS = [
+    (1, "users.is_admin column", _add_is_admin_column),
+    (2, "composite indexes for transactions, cycles, budgets, reminders", _create_query_indexes),
+    (3, "backfill monthly_category_rollup", _backfill_monthly_rollup),
+    (4, "build missing balance_ledgers", _backfill_balance_ledgers),
+    (5, "ON DELETE CASCADE foreign keys to users and cycles", _cascade_foreign_keys),
+    (6, "transactions.updated_at column and index", _add_transaction_updated_at),
+    (7, "monthly_category_rollup rows for undated transactions", _rollup_undated_transactions),
+    (8, "report_jobs.sent_at column", _add_report_job_sent_at),
+]
+
+
+def run_migrations(engine):
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                step(conn)
+                conn.execute(schema_migrations.insert().values(version=version, name=name))
+            print(f"Applied migration {version}: {name}")
+        except IntegrityError:
+            # Another worker recorded this version first; its changes are already in.
+            pass
+
+
+# ──────────────────────────────────────────────────────────────
+#  Query-plan regression check
+# ──────────────────────────────────────────────────────────────
+
+def hot_queries(db):
+    """The route queries the indexes above were designed for, with the index each should use."""
+    from database import CycleStatus, TransactionType
+    return [
+        ("transactions by cycle, newest first", "ix_transactions_cycle_date",
+         db.query(Transaction).filter(Transaction.cycle_id == 1).order_by(Transaction.date.desc())),
+        ("latest expense in a category (corrections)", "ix_transactions_cycle_type_category",
+         db.query(Transaction).filter(
+             Transaction.cycle_id == 1,
+             Transaction.type == TransactionType.EXPENSE,
+             Transaction.category == "food",
+         )),
+        ("active cycle for a user", "ix_cycles_user_id_id",
+         db.query(Cycle).filter(Cycle.user_id == 1, Cycle.status != CycleStatus.CLOSED).order_by(Cycle.id.desc())),
+        ("envelopes of a cycle", "ix_category_budgets_cycle_category",
+         db.query(CategoryBudget).filter(CategoryBudget.cycle_id == 1)),
+        ("reminders by due date", "ix_reminders_user_due",
+         db.query(Reminder).filter(Reminder.user_id == 1).order_by(Reminder.due_date.asc())),
+    ]
+
+
+def check_query_plans(db) -> list:
+    """EXPLAIN QUERY PLAN every hot query (SQLite only) and return
+    (label, expected_index, uses_index, plan_text) tuples."""
+    results = []
+    dialect = db.get_bind().dialect
+    for label, index_name, query in hot_queries(db):
+        sql = str(query.statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        plan = " | ".join(str(row[-1]) for row in db.execute(text("EXPLAIN QUERY PLAN " + sql)))
+        results.append((label, index_name, index_name in plan, plan))
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    from database import SessionLocal, init_db, DATABASE_URL
+
+    if sys.argv[1:] != ["check-plans"]:
+        sys.exit("usage: python migrations.py check-plans")
+    if not DATABASE_URL.startswith("sqlite"):
+        sys.exit("check-plans reads SQLite's EXPLAIN QUERY PLAN output; point DATABASE_URL at SQLite.")
+
+    init_db()
+    db = SessionLocal()
+    try:
+        results = check_query_plans(db)
+    finally:
+        db.close()
+    for label, index_name, ok, plan in results:
+        print(f"[{'ok' if ok else 'MISSING'}] {label}: expected {index_name}\n      {plan}")
+    if not all(ok for _, _, ok, _ in results):
+        sys.exit(1)
@@ -1,24 +1,19 @@
 import os
+import re
 import json
-from openai import AzureOpenAI
 from schemas import NLPResponse
+import llm_gateway
+from llm_gateway import LLMUnavailable
 from dotenv import load_dotenv
 from datetime import datetime
-from typing import List
+from typing import Any, AsyncIterator, List, Tuple
 
 load_dotenv()
 
-client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", ""),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY", ""),
-    api_version=os.getenv("OPENAI_API_VERSION", "2024-12-01-preview"),
-)
+# Model calls are async and go through llm_gateway, which owns the shared
+# client, timeouts, retries and concurrency limits.
 
-def parse_user_input(
-    user_input: str,
-    data_context: str = "",
-    chat_history: List[dict] = None
-) -> NLPResponse:
+def _build_messages(user_input: str, data_context: str = "", chat_history: List[dict] = None) -> List[dict]:
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     system_prompt = f"""You are FinAI — a warm, intelligent financial assistant for a personal expense tracker. You help the user log transactions, manage budget envelopes, manage payment reminders/loans, and answer questions about their finances.
@@ -119,11 +114,43 @@ OUTPUT FORMAT (strict JSON, all fields present, null for unused)
                 messages.append({"role": role, "content": content})
 
     messages.append({"role": "user", "content": user_input})
+    return messages
+
+
+def _snag_response() -> NLPResponse:
+    response = NLPResponse(
+        transactions=[],
+        reminder_actions=[],
+        ai_insight="I hit a slight snag — could you rephrase that? 😊"
+    )
+    response._fallback = True
+    return response
+
+
+def _unavailable_response() -> NLPResponse:
+    # The gateway gave up or the breaker is open — answer at once instead of waiting
+    response = NLPResponse(
+        transactions=[],
+        reminder_actions=[],
+        ai_insight="The AI assistant is busy right now, so I couldn't read that one. "
+                   "Simple entries like \"paid 250 for food\" still work — try again in a minute! 🙏"
+    )
+    response._fallback = True
+    return response
 
+
+async def parse_user_input(
+    user_input: str,
+    data_context: str = "",
+    chat_history: List[dict] = None,
+    user_id: int = None
+) -> NLPResponse:
+    messages = _build_messages(user_input, data_context, chat_history)
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
 
     try:
-        response = client.chat.completions.create(
+        response = await llm_gateway.complete(
+            "chat", user_id,
             model=deployment_name,
             response_format={"type": "json_object"},
             messages=messages
@@ -132,20 +159,105 @@ OUTPUT FORMAT (strict JSON, all fields present, null for unused)
         parsed_data = json.loads(content)
         return NLPResponse(**parsed_data)
 
+    except LLMUnavailable as e:
+        print(f"Error parsing input: {e}")
+        return _unavailable_response()
     except Exception as e:
         print(f"Error parsing input: {e}")
-        return NLPResponse(
-            transactions=[],
-            reminder_actions=[],
-            ai_insight="I hit a slight snag — could you rephrase that? 😊"
+        return _snag_response()
+
+
+class InsightStream:
+    """Pulls the `ai_insight` string out of a JSON reply while it is still arriving.
+
+    `feed()` takes the next raw chunk of the model's JSON and returns the newly
+    decoded part of the insight text (escapes resolved), or "" if none yet."""
+
+    _KEY = re.compile(r'"ai_insight"\s*:\s*"')
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = None  # index just after the last decoded insight character
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._KEY.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+        out = []
+        buf, i = self._buffer, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # Escape sequence — wait for all of it before decoding
+            if i + 1 >= len(buf):
+                break
+            length = 6 if buf[i + 1] == "u" else 2
+            if length == 6 and i + 6 <= len(buf) and 0xD800 <= int(buf[i + 2:i + 6], 16) <= 0xDBFF:
+                length = 12  # surrogate pair
+            if i + length > len(buf):
+                break
+            out.append(json.loads('"' + buf[i:i + length] + '"'))
+            i += length
+        self._pos = i
+        return "".join(out)
+
+
+async def stream_user_input(
+    user_input: str,
+    data_context: str = "",
+    chat_history: List[dict] = None,
+    user_id: int = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Streaming variant of `parse_user_input`.
+
+    Yields ("token", text) for each piece of `ai_insight` as the model writes it,
+    then exactly one ("response", NLPResponse) with the complete parse."""
+    messages = _build_messages(user_input, data_context, chat_history)
+    deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
+
+    insight = InsightStream()
+    content = []
+    try:
+        stream = llm_gateway.stream(
+            "chat_stream", user_id,
+            model=deployment_name,
+            response_format={"type": "json_object"},
+            messages=messages,
         )
+        async for chunk in stream:
+            # Azure sends a leading chunk with no choices (content filter results)
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            piece = chunk.choices[0].delta.content
+            content.append(piece)
+            text = insight.feed(piece)
+            if text:
+                yield "token", text
+        parsed = NLPResponse(**json.loads("".join(content)))
+    except LLMUnavailable as e:
+        print(f"Error parsing input: {e}")
+        parsed = _unavailable_response()
+    except Exception as e:
+        print(f"Error parsing input: {e}")
+        parsed = _snag_response()
+    yield "response", parsed
 
 
-def generate_report_summary(stats: dict) -> dict:
-    """Given pre-computed spending statistics, ask GPT-4o for a warm narrative
-    summary + actionable bullet points. Returns a dict with keys:
-    headline (str), paragraphs (list[str]), bullets (list[str]).
-    Falls back to a rule-based summary if the AI call fails."""
+async def ai_report_summary(stats: dict, user_id: int = None) -> dict:
+    """The model-written summary for `stats`; raises if the AI call fails."""
 
     system_prompt = """You are FinAI, a sharp personal-finance analyst. You are given pre-computed
 statistics scoped to a SPECIFIC set of months the user selected (see `selected_months`).
@@ -175,24 +287,21 @@ Output STRICT JSON only, in this exact shape:
 }"""
 
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
-    try:
-        response = client.chat.completions.create(
-            model=deployment_name,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": json.dumps(stats, default=str)},
-            ],
-        )
-        data = json.loads(response.choices[0].message.content)
-        return {
-            "headline": data.get("headline", "Here's your spending review."),
-            "paragraphs": data.get("paragraphs", []) or [],
-            "bullets": data.get("bullets", []) or [],
-        }
-    except Exception as e:
-        print(f"Error generating report summary: {e}")
-        return _fallback_summary(stats)
+    response = await llm_gateway.complete(
+        "report_summary", user_id,
+        model=deployment_name,
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps(stats, default=str)},
+        ],
+    )
+    data = json.loads(response.choices[0].message.content)
+    return {
+        "headline": data.get("headline", "Here's your spending review."),
+        "paragraphs": data.get("paragraphs", []) or [],
+        "bullets": data.get("bullets", []) or [],
+    }
 
 
 def _fallback_summary(stats: dict) -> dict:
@@ -0,0 +1,139 @@
+"""Password hashing and verification off the request path.
+
+Hashing is deliberately slow (scrypt: ~150 ms of CPU at the default cost), so
+a burst of sign-ins run on the request threadpool would starve every other
+endpoint. Here each hash / verify runs on a ProcessPoolExecutor of
+PASSWORD_WORKERS processes (0 = a thread of the app's threadpool) and the
+route awaits it, holding no thread meanwhile.
+
+  PASSWORD_HASH_METHOD   Werkzeug method including its cost, e.g.
+                         "scrypt" (= scrypt:32768:8:1), "scrypt:16384:8:1",
+                         "pbkdf2:sha256:600000"
+  PASSWORD_WORKERS       hashing processes (default min(2, CPUs))
+  PASSWORD_MAX_PENDING   admission limit: hashes queued or running at once;
+                         past it `PasswordBusy` is raised and the route
+                         answers 503 with Retry-After instead of queueing
+
+Hashes made with another method or cost (`needs_rehash`) are replaced with
+the configured one on the user's next successful login.
+
+Throughput benchmark: python -m benchmarks.password_hashing
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(2, os.cpu_count() or 1))))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(max(PASSWORD_WORKERS, 1) * 8)))
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+_rejected = 0
+_admission_lock = threading.Lock()
+
+
+class PasswordBusy(Exception):
+    """Too many hashes already queued; the caller should retry shortly."""
+
+
+def canonical_method(method: str) -> str:
+    """The method string Werkzeug stores in the hash, defaults filled in."""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        return "scrypt:" + ":".join(args or ["32768", "8", "1"])
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = args[1] if len(args) > 1 else str(DEFAULT_PBKDF2_ITERATIONS)
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Unsupported PASSWORD_HASH_METHOD '{method}'")
+
+
+_METHOD = canonical_method(PASSWORD_HASH_METHOD)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    return password_hash.split("$", 1)[0] != _METHOD
+
+
+def hash_password_sync(password: str) -> str:
+    """Hash in the calling thread (startup seeding, scripts)."""
+    return generate_password_hash(password, method=_METHOD)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Process pool
+# ──────────────────────────────────────────────────────────────
+
+def _ready() -> bool:
+    return True
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def warm_up():
+    """Start the hashing processes now instead of on the first login."""
+    if PASSWORD_WORKERS > 0:
+        pool = _get_pool()
+        for _ in range(PASSWORD_WORKERS):
+            pool.submit(_ready)
+
+
+def shutdown_pool(wait: bool = True):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+async def _run(fn, *args):
+    global _in_flight, _rejected
+    with _admission_lock:
+        if _in_flight >= PASSWORD_MAX_PENDING:
+            _rejected += 1
+            raise PasswordBusy()
+        _in_flight += 1
+    try:
+        if PASSWORD_WORKERS > 0:
+            try:
+                return await asyncio.wrap_future(_get_pool().submit(fn, *args))
+            except BrokenProcessPool as e:
+                # A worker died; start a fresh pool next time and do this one in a thread
+                print(f"Password hashing pool broken, hashing in-process: {e}")
+                shutdown_pool(wait=False)
+        from fastapi.concurrency import run_in_threadpool
+        return await run_in_threadpool(fn, *args)
+    finally:
+        with _admission_lock:
+            _in_flight -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(generate_password_hash, password, _METHOD)
+
+
+async def verify_password(password_hash: str, password: str) -> bool:
+    return await _run(check_password_hash, password_hash, password)
+
+
+def stats() -> dict:
+    return {
+        "method": _METHOD,
+        "workers": PASSWORD_WORKERS,
+        "max_pending": PASSWORD_MAX_PENDING,
+        "in_flight": _in_flight,
+        "rejected": _rejected,
+    }
@@ -0,0 +1,342 @@
+"""Background jobs for report PDFs and report emails (and admin account purges).
+
+POST /api/reports/jobs (and POST /api/reports/email) only insert a row into
+`report_jobs` and return its id. Worker threads claim queued rows — an
+UPDATE ... WHERE status = 'QUEUED' that only one worker can win, so any number
+of threads and processes can share the table — build the analysis, render the
+PDF to REPORT_JOBS_DIR and, for email jobs, send it over SMTP. Clients poll
+GET /api/reports/jobs/{id} and fetch the file from .../download.
+
+  - Failed jobs are retried up to REPORT_JOB_MAX_ATTEMPTS times with a growing delay.
+  - A job left RUNNING longer than REPORT_JOB_STALE_SECONDS (its worker died) is
+    picked up again. Running jobs refresh started_at (purges after every batch,
+    reports from a heartbeat thread while they render and send), so only a dead
+    worker's job counts as stale. A worker only records the outcome of a job it
+    still owns, and an email job commits sent_at before sending, so a retry or a
+    second worker never sends the same report twice.
+  - Finished jobs and their PDFs are purged after REPORT_JOB_TTL_HOURS.
+
+"purge" jobs (queued by DELETE /api/admin/users/{id} for large accounts) belong
+to the admin who asked and delete the target user in batches (admin.purge_user).
+
+The API process runs REPORT_WORKERS threads (default 2). Their LLM calls are
+handed back to the app's event loop, so they share its client, limits and
+circuit breaker. Set REPORT_WORKERS=0 and run the workers separately with
+    python report_jobs.py
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from database import SessionLocal, JobStatus, ReportJob, User
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+JOBS_DIR = os.getenv("REPORT_JOBS_DIR", os.path.join(tempfile.gettempdir(), "finai-report-jobs"))
+MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = float(os.getenv("REPORT_JOB_RETRY_DELAY", "30"))
+STALE_SECONDS = float(os.getenv("REPORT_JOB_STALE_SECONDS", "900"))
+TTL_HOURS = float(os.getenv("REPORT_JOB_TTL_HOURS", "24"))
+POLL_SECONDS = float(os.getenv("REPORT_JOB_POLL_SECONDS", "1"))
+MAINTENANCE_SECONDS = 60
+HEARTBEAT_SECONDS = max(1.0, STALE_SECONDS / 3)
+
+_wake = threading.Event()
+_stop = threading.Event()
+_workers = []
+_loop = None  # event loop that runs the async parts (analysis + LLM summary)
+_last_maintenance = 0.0
+_maintenance_lock = threading.Lock()
+
+
+# ──────────────────────────────────────────────────────────────
+#  Queue
+# ──────────────────────────────────────────────────────────────
+
+def job_status(job: ReportJob) -> dict:
+    done = job.status == JobStatus.DONE
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status.value.lower(),
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "download_url": f"/api/reports/jobs/{job.id}/download" if done and job.file_path else None,
+    }
+
+
+def enqueue(db, user_id: int, kind: str, params: dict) -> dict:
+    job = ReportJob(user_id=user_id, kind=kind, params=json.dumps(params), status=JobStatus.QUEUED)
+    db.add(job)
+    db.commit()
+    _wake.set()
+    return job_status(job)
+
+
+def get_job(db, user_id: int, job_id: int) -> Optional[ReportJob]:
+    return db.query(ReportJob).filter(ReportJob.id == job_id, ReportJob.user_id == user_id).first()
+
+
+def claim_next(db, worker: str) -> Optional[ReportJob]:
+    """Atomically move the oldest runnable job to RUNNING for `worker`."""
+    for _ in range(5):
+        now = datetime.utcnow()
+        candidate = db.query(ReportJob.id).filter(
+            ReportJob.status == JobStatus.QUEUED,
+            ReportJob.run_after <= now,
+        ).order_by(ReportJob.run_after, ReportJob.id).first()
+        if candidate is None:
+            return None
+        claimed = db.query(ReportJob).filter(
+            ReportJob.id == candidate.id,
+            ReportJob.status == JobStatus.QUEUED,
+        ).update({
+            ReportJob.status: JobStatus.RUNNING,
+            ReportJob.worker: worker,
+            ReportJob.started_at: now,
+            ReportJob.attempts: ReportJob.attempts + 1,
+        }, synchronize_session=False)
+        db.commit()
+        if claimed == 1:
+            return db.get(ReportJob, candidate.id)
+        # Another worker won this one; try the next
+    return None
+
+
+def _remove_file(path: Optional[str]):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def delete_user_jobs(db, user_id: int):
+    """Drop a user's jobs and their PDFs (part of the caller's transaction)."""
+    for (path,) in db.query(ReportJob.file_path).filter(ReportJob.user_id == user_id, ReportJob.file_path.isnot(None)):
+        _remove_file(path)
+    db.query(ReportJob).filter(ReportJob.user_id == user_id).delete(synchronize_session=False)
+
+
+def maintain(db):
+    """Requeue jobs whose worker died and purge expired ones (at most once a minute per process)."""
+    global _last_maintenance
+    with _maintenance_lock:
+        if time.monotonic() - _last_maintenance < MAINTENANCE_SECONDS:
+            return
+        _last_maintenance = time.monotonic()
+    now = datetime.utcnow()
+    for job in db.query(ReportJob).filter(
+        ReportJob.status == JobStatus.RUNNING,
+        ReportJob.started_at < now - timedelta(seconds=STALE_SECONDS),
+    ):
+        _fail(job, "The worker running this job stopped.", now)
+    expired = db.query(ReportJob).filter(
+        ReportJob.status.in_([JobStatus.DONE, JobStatus.FAILED]),
+        ReportJob.finished_at < now - timedelta(hours=TTL_HOURS),
+    ).all()
+    for job in expired:
+        _remove_file(job.file_path)
+        db.delete(job)
+    db.commit()
+
+
+def _failure(attempts: int, error: str, now: datetime) -> dict:
+    """Column values for a failed attempt: back to the queue, or FAILED for good."""
+    if attempts < MAX_ATTEMPTS:
+        return {"error": error, "status": JobStatus.QUEUED,
+                "run_after": now + timedelta(seconds=RETRY_DELAY_SECONDS * attempts)}
+    return {"error": error, "status": JobStatus.FAILED, "finished_at": now}
+
+
+def _fail(job: ReportJob, error: str, now: datetime):
+    for key, value in _failure(job.attempts, error, now).items():
+        setattr(job, key, value)
+
+
+def _owned(db, job: ReportJob, worker: str):
+    """Query for `job` while `worker` still owns it: maintain() may have requeued it
+    and another worker claimed it since (the claim rewrites `worker`)."""
+    return db.query(ReportJob).filter(
+        ReportJob.id == job.id,
+        ReportJob.worker == worker,
+        ReportJob.status.in_([JobStatus.RUNNING, JobStatus.QUEUED]),
+    )
+
+
+# ──────────────────────────────────────────────────────────────
+#  Running jobs
+# ──────────────────────────────────────────────────────────────
+
+def _on_loop(coro):
+    """Run a coroutine on the app's event loop from a worker thread and wait for it."""
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+@contextmanager
+def _heartbeat(job_id: int, worker: str):
+    """Refresh the job's started_at every HEARTBEAT_SECONDS from a side thread (with
+    its own session) while the body runs, so a slow render or send isn't taken for
+    a dead worker by maintain()."""
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(HEARTBEAT_SECONDS):
+            db = SessionLocal()
+            try:
+                db.query(ReportJob).filter(
+                    ReportJob.id == job_id, ReportJob.worker == worker, ReportJob.status == JobStatus.RUNNING,
+                ).update({ReportJob.started_at: datetime.utcnow()}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                print(f"Report job {job_id} heartbeat: {e}")
+            finally:
+                db.close()
+
+    thread = threading.Thread(target=beat, name=f"report-job-{job_id}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_job(db, job: ReportJob):
+    import report_pdf
+    from routes import reports
+
+    params = json.loads(job.params)
+    if job.kind == "purge":
+        from routes import admin
+
+        def heartbeat():
+            # A purge can outlast STALE_SECONDS; show maintain() the worker is alive
+            job.started_at = datetime.utcnow()
+
+        admin.purge_user(db, params["user_id"], heartbeat=heartbeat)
+        return
+
+    worker = job.worker
+    analysis = _on_loop(reports._analysis_with_summary(
+        db, job.user_id, months=params.get("months"), refresh=params.get("refresh", False), ledger=False,
+    ))
+    username = db.query(User.username).filter(User.id == job.user_id).scalar() or ""
+    db.commit()  # don't hold a transaction open while the PDF renders
+    with _heartbeat(job.id, worker):
+        rendered = report_pdf.render_pdf_file(
+            analysis, username=username, sections=params.get("sections") or "full",
+            ledger={"user_id": job.user_id, "months": params.get("months")},
+        )
+
+        # The job keeps its own copy: the render cache may evict its file
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        path = os.path.join(JOBS_DIR, f"report-{job.id}.pdf")
+        shutil.copyfile(rendered, path + ".part")
+        os.replace(path + ".part", path)
+        _owned(db, job, worker).update({ReportJob.file_path: path}, synchronize_session=False)
+        db.commit()
+
+        if job.kind == "email":
+            settings = reports.smtp_settings()
+            if settings is None:
+                raise RuntimeError("Email is not configured on the server.")
+            # Record the send first: if it was recorded already (an earlier attempt
+            # sent it) or the job changed hands, don't send again
+            claimed = _owned(db, job, worker).filter(ReportJob.sent_at.is_(None)).update(
+                {ReportJob.sent_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return
+            with open(path, "rb") as f:
+                pdf_bytes = f.read()
+            try:
+                reports.send_email(reports.report_email(analysis, pdf_bytes, settings["sender"], params["to"]), settings)
+            except Exception:
+                # Not delivered: let the retry send it
+                _owned(db, job, worker).update({ReportJob.sent_at: None}, synchronize_session=False)
+                db.commit()
+                raise
+
+
+def run_next(worker: str) -> bool:
+    """Claim and run one job; False when the queue is empty."""
+    db = SessionLocal()
+    try:
+        maintain(db)
+        job = claim_next(db, worker)
+        if job is None:
+            return False
+        attempts = job.attempts
+        try:
+            run_job(db, job)
+        except Exception as e:
+            print(f"Report job {job.id} failed (attempt {attempts}): {e}")
+            db.rollback()
+            outcome = _failure(attempts, str(e), datetime.utcnow())
+        else:
+            outcome = {"status": JobStatus.DONE, "error": None, "finished_at": datetime.utcnow()}
+        # Only while this worker still owns the job (see _owned)
+        if not _owned(db, job, worker).update(outcome, synchronize_session=False):
+            print(f"Report job {job.id} was taken over by another worker; dropped this attempt's outcome")
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def _work(worker: str):
+    while not _stop.is_set():
+        try:
+            ran = run_next(worker)
+        except Exception as e:
+            print(f"Report worker {worker}: {e}")
+            ran = False
+        if not ran:
+            _wake.wait(POLL_SECONDS)
+            _wake.clear()
+
+
+def start_workers(loop, count: int = REPORT_WORKERS):
+    """Start `count` worker threads; async work is submitted to `loop`."""
+    global _loop
+    _loop = loop
+    _stop.clear()
+    for i in range(count):
+        thread = threading.Thread(target=_work, args=(f"{os.getpid()}-{i}",), name=f"report-worker-{i}", daemon=True)
+        thread.start()
+        _workers.append(thread)
+
+
+def stop_workers(timeout: float = 10.0):
+    """Ask the workers to stop and wait for the current jobs to finish."""
+    _stop.set()
+    _wake.set()
+    for thread in _workers:
+        thread.join(timeout)
+    _workers.clear()
+
+
+if __name__ == "__main__":
+    # Standalone worker process: an event loop on its own thread for the async parts
+    from database import init_db
+
+    init_db()
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="report-jobs-loop", daemon=True).start()
+    start_workers(loop, REPORT_WORKERS or 2)
+    print(f"Report workers running ({REPORT_WORKERS or 2} threads, files in {JOBS_DIR}); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_workers()
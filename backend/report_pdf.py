@@ -0,0 +1,711 @@
+"""Report PDF rendering: ReportLab layout, a process pool and an on-disk cache.
+
+`build_pdf` is CPU-bound (charts, table layout) and holds the GIL, so
+`render_pdf_file` runs it in a ProcessPoolExecutor of PDF_WORKERS processes
+(0 = render in the calling thread). The workers are started with `spawn` —
+the API process runs threads, and forking those is unsafe. Each worker
+imports ReportLab and builds the style sheet once, when it starts
+(`warm_up()` starts them all ahead of the first request). At most
+PDF_MAX_PENDING renders are queued or running at once; callers past that
+wait their turn in their own thread.
+
+The transaction ledger is never held in memory as a whole: the render
+process reads it off a server-side cursor (`ledger_rows`, LEDGER_BATCH_SIZE
+rows per fetch) and turns it into page-sized tables of plain strings, which
+the layout pulls one at a time. The document is written straight to a file
+and served from disk, so memory is bounded by a page of rows rather than by
+the length of the history.
+
+Rendered files are cached in PDF_CACHE_DIR, keyed by a hash of the analysis
+(minus its generation timestamp), the username, `sections` and a cheap
+fingerprint of the ledger (row count, newest id, latest edit). Same data, same PDF: downloading a report again, or downloading and
+then emailing it, renders once. The cache is trimmed to PDF_CACHE_MAX_MB,
+least recently used first.
+
+Benchmark (pages/s, stalls, peak memory): python -m benchmarks.pdf_render
+"""
+import hashlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import chain, groupby
+from typing import Optional
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(2, os.cpu_count() or 1))))
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", str(max(PDF_WORKERS, 1) * 4)))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "finai-pdf-cache"))
+PDF_CACHE_MAX_MB = float(os.getenv("PDF_CACHE_MAX_MB", "200"))
+RENDER_VERSION = 2  # bump when the layout changes so cached PDFs are not reused
+LEDGER_BATCH_SIZE = 1000  # rows fetched from the cursor at a time
+LEDGER_TABLE_ROWS = 36  # ledger rows per table, about one A4 page
+
+# Keys that do not change what is drawn (generated_at is minute-stamped and
+# would make every render a miss)
+_UNHASHED_KEYS = ("generated_at", "summary_cached")
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(PDF_MAX_PENDING, 1))
+
+
+# ──────────────────────────────────────────────────────────────
+#  Ledger rows
+# ──────────────────────────────────────────────────────────────
+
+def ledger_rows(user_id: int, months: Optional[list] = None):
+    """Yield (date "YYYY-MM-DD", type, category, description, amount) for the
+    user's transactions in date order, straight off a server-side cursor; legacy
+    rows with no date come last with date "". Uses its own session: it runs in
+    the render process."""
+    import rollups
+    from database import SessionLocal, Cycle, Transaction
+
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(Transaction.date, Transaction.type, Transaction.category, Transaction.description, Transaction.amount)
+            .join(Cycle)
+            .filter(Cycle.user_id == user_id)
+        )
+        if months:
+            query = query.filter(rollups.months_filter(months))
+        rows = (
+            query.order_by(Transaction.date.asc().nullslast(), Transaction.id.asc())
+            .execution_options(stream_results=True)
+            .yield_per(LEDGER_BATCH_SIZE)
+        )
+        for date, tx_type, category, description, amount in rows:
+            yield (date.strftime("%Y-%m-%d") if date else ""), tx_type.value, category or "—", \
+                description or "", round(amount, 2)
+    finally:
+        db.close()
+
+
+def ledger_fingerprint(user_id: int, months: Optional[list] = None) -> str:
+    """Cache-key part for the ledger: count, newest id and latest edit of the
+    rows in scope. One aggregate query, so a cache hit doesn't read the history:
+    an insert raises the max id, a delete lowers the count, an update sets
+    updated_at."""
+    from sqlalchemy import func
+
+    import rollups
+    from database import SessionLocal, Cycle, Transaction
+
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(func.count(Transaction.id), func.max(Transaction.id), func.max(Transaction.updated_at))
+            .join(Cycle)
+            .filter(Cycle.user_id == user_id)
+        )
+        if months:
+            query = query.filter(rollups.months_filter(months))
+        return repr(tuple(query.one()))
+    finally:
+        db.close()
+
+
+def _analysis_rows(analysis: dict):
+    # Ledger rows carried in the analysis itself (build_analysis(ledger=True))
+    for tx in analysis.get("transactions") or []:
+        yield tx["date"], tx["type"], tx["category"], tx["description"], tx["amount"]
+
+
+# ──────────────────────────────────────────────────────────────
+#  Cache
+# ──────────────────────────────────────────────────────────────
+
+def cache_key(analysis: dict, username: str, sections: str, ledger_hash: Optional[str] = None) -> str:
+    payload = json.dumps(
+        {
+            "version": RENDER_VERSION,
+            "username": username,
+            "sections": sections,
+            "ledger": ledger_hash,
+            "analysis": {k: v for k, v in analysis.items() if k not in _UNHASHED_KEYS},
+        },
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, f"{key}.pdf")
+
+
+def _trim(keep: str):
+    files = []
+    for entry in os.scandir(PDF_CACHE_DIR):
+        if entry.name.endswith(".pdf") and entry.path != keep:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files) + os.path.getsize(keep)
+    limit = PDF_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+# ──────────────────────────────────────────────────────────────
+#  Process pool
+# ──────────────────────────────────────────────────────────────
+
+_WARM_MODULES = (
+    "reportlab.platypus",
+    "reportlab.graphics.charts.barcharts",
+    "reportlab.graphics.charts.piecharts",
+    "reportlab.graphics.charts.legends",
+)
+
+
+def _init_worker():
+    # Pay for the ReportLab imports, fonts and styles once per worker
+    for module in _WARM_MODULES:
+        importlib.import_module(module)
+    _styles()
+
+
+def _ready() -> bool:
+    return True
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def warm_up():
+    """Start every pool worker now (without waiting) instead of on the first PDF."""
+    if PDF_WORKERS > 0:
+        pool = _get_pool()
+        for _ in range(PDF_WORKERS):
+            pool.submit(_ready)
+
+
+def shutdown_pool(wait: bool = True):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def _render(path: str, analysis: dict, username: str, sections: str, ledger: Optional[dict]):
+    build_pdf(analysis, username=username, sections=sections, path=path, ledger=ledger)
+
+
+def render_pdf_file(analysis: dict, username: str = "", sections: str = "full",
+                    ledger: Optional[dict] = None) -> str:
+    """Path of the report PDF in the cache, rendering it on the pool first if needed.
+
+    `ledger` ({"user_id": ..., "months": [...]}) has the render process stream
+    the transaction ledger from the database; without it the ledger comes from
+    analysis["transactions"]. Blocking: call it from a worker thread
+    (run_in_threadpool) in async code."""
+    if sections not in ("full", "transactions"):
+        ledger = None  # no ledger in this PDF
+    ledger_hash = ledger_fingerprint(**ledger) if ledger else None
+    path = _cache_path(cache_key(analysis, username, sections, ledger_hash))
+    try:
+        os.utime(path)  # hit: mark as recently used
+        return path
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    part = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with _pending:
+            if PDF_WORKERS > 0:
+                try:
+                    _get_pool().submit(_render, part, analysis, username, sections, ledger).result()
+                except BrokenProcessPool as e:
+                    # A worker died (killed, out of memory, failed to start); start a
+                    # fresh pool next time and render this one here
+                    print(f"PDF render pool broken, rendering in-process: {e}")
+                    shutdown_pool(wait=False)
+                    _render(part, analysis, username, sections, ledger)
+            else:
+                _render(part, analysis, username, sections, ledger)
+        os.replace(part, path)
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+    _trim(keep=path)
+    return path
+
+
+# ──────────────────────────────────────────────────────────────
+#  Layout
+# ──────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=1)
+def _styles():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    BRAND = colors.HexColor("#3b82f6")
+    DARK = colors.HexColor("#0f172a")
+    SLATE = colors.HexColor("#475569")
+
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle("H1", fontName="Helvetica-Bold", fontSize=22, textColor=DARK, spaceAfter=2))
+    styles.add(ParagraphStyle("Sub", fontName="Helvetica", fontSize=9, textColor=SLATE, spaceAfter=12))
+    styles.add(ParagraphStyle("H2", fontName="Helvetica-Bold", fontSize=13, textColor=DARK, spaceBefore=16, spaceAfter=6))
+    styles.add(ParagraphStyle("Body", fontName="Helvetica", fontSize=10, textColor=SLATE, leading=15, spaceAfter=6))
+    styles.add(ParagraphStyle("Headline", fontName="Helvetica-Bold", fontSize=12, textColor=BRAND, leading=16, spaceAfter=8))
+    styles.add(ParagraphStyle("BulletTxt", fontName="Helvetica", fontSize=10, textColor=SLATE, leading=14))
+    styles.add(ParagraphStyle("Cell", fontName="Helvetica", fontSize=8.5, textColor=SLATE))
+    styles.add(ParagraphStyle("CellR", fontName="Helvetica", fontSize=8.5, textColor=DARK, alignment=2))
+    return styles
+
+
+def build_pdf(analysis: dict, username: str = "", sections: str = "full",
+              path: Optional[str] = None, ledger: Optional[dict] = None) -> Optional[bytes]:
+    # sections: "full" (everything), "analysis" (no line-item ledger),
+    # or "transactions" (statement: KPIs + monthly + full ledger only).
+    # Writes to `path` when given, otherwise returns the PDF bytes. `ledger`
+    # ({"user_id", "months"}) streams the ledger from the database instead of
+    # reading analysis["transactions"].
+    show_narrative = sections in ("full", "analysis")
+    show_ledger = sections in ("full", "transactions")
+
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.platypus import (
+        SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, ListFlowable, ListItem,
+    )
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.charts.legends import Legend
+
+    BRAND = colors.HexColor("#3b82f6")
+    LIGHT = colors.HexColor("#f1f5f9")
+    GREEN = colors.HexColor("#10b981")
+    RED = colors.HexColor("#ef4444")
+    PALETTE = [colors.HexColor(c) for c in
+               ["#3b82f6", "#10b981", "#f59e0b", "#ef4444", "#8b5cf6", "#ec4899", "#f97316", "#14b8a6"]]
+
+    buf = path or io.BytesIO()
+    doc = SimpleDocTemplate(
+        buf, pagesize=A4,
+        topMargin=18 * mm, bottomMargin=16 * mm, leftMargin=16 * mm, rightMargin=16 * mm,
+        title="FinAI Financial Report",
+    )
+    styles = _styles()
+
+    story = []
+    totals = analysis["totals"]
+    rng = analysis["date_range"]
+    range_txt = f"{rng['from']} — {rng['to']}" if rng else "No data yet"
+
+    # ── Header ───────────────────────────────────────────
+    story.append(Paragraph("⚡ FinAI — Financial Report", styles["H1"]))
+    who = f"for {username}  •  " if username else ""
+    sel_labels = analysis.get("selected_labels", [])
+    avail = analysis.get("available_months", [])
+    if sel_labels and len(sel_labels) < len(avail):
+        scope_txt = "Months: " + ", ".join(sel_labels)
+    else:
+        scope_txt = f"All months ({range_txt})"
+    story.append(Paragraph(f"{who}{scope_txt}  •  Generated {analysis['generated_at']}", styles["Sub"]))
+
+    # ── KPI strip ────────────────────────────────────────
+    kpi = [[
+        Paragraph("<b>Total Income</b><br/>" + _rupee(totals["total_income"]), styles["Body"]),
+        Paragraph("<b>Total Spent</b><br/>" + _rupee(totals["total_expenses"]), styles["Body"]),
+        Paragraph("<b>Net Savings</b><br/>" + _rupee(totals["net"]), styles["Body"]),
+        Paragraph("<b>Avg / Month</b><br/>" + _rupee(totals["avg_monthly_expense"]), styles["Body"]),
+    ]]
+    kpi_tbl = Table(kpi, colWidths=[44 * mm] * 4)
+    kpi_tbl.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), LIGHT),
+        ("BOX", (0, 0), (-1, -1), 0.5, colors.white),
+        ("INNERGRID", (0, 0), (-1, -1), 4, colors.white),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("TOPPADDING", (0, 0), (-1, -1), 8),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+        ("LEFTPADDING", (0, 0), (-1, -1), 10),
+    ]))
+    story.append(kpi_tbl)
+
+    # ── Fixed vs Discretionary ───────────────────────────
+    fv = analysis.get("fixed_vs_variable")
+    if fv and totals["total_expenses"]:
+        story.append(Spacer(1, 4))
+        story.append(Paragraph(
+            f"<b>Committed / fixed costs:</b> {_rupee(fv['fixed_total'])} "
+            f"({fv['fixed_pct']:.0f}%)  &nbsp;&nbsp;|&nbsp;&nbsp; "
+            f"<b>Discretionary:</b> {_rupee(fv['variable_total'])} ({fv['variable_pct']:.0f}%)",
+            styles["Body"]))
+
+    # ── AI summary ───────────────────────────────────────
+    summary = analysis.get("summary", {})
+    if show_narrative:
+        story.append(Paragraph("Summary", styles["H2"]))
+    if show_narrative and summary.get("headline"):
+        story.append(Paragraph(summary["headline"], styles["Headline"]))
+    if show_narrative:
+        for para in summary.get("paragraphs", []):
+            story.append(Paragraph(para, styles["Body"]))
+        if summary.get("bullets"):
+            items = [ListItem(Paragraph(b, styles["BulletTxt"]), leftIndent=6) for b in summary["bullets"]]
+            story.append(ListFlowable(items, bulletType="bullet", start="•", leftIndent=12))
+
+    # ── Charts ───────────────────────────────────────────
+    by_cat = analysis["by_category"]
+    by_month = analysis["by_month"]
+    if show_narrative and (by_cat or by_month):
+        story.append(Paragraph("Where your money goes", styles["H2"]))
+        chart_row = []
+
+        if by_cat:
+            top = by_cat[:6]
+            others = sum(c["total"] for c in by_cat[6:])
+            data = [c["total"] for c in top] + ([others] if others else [])
+            labels = [f"{c['category'].title()} {c['pct']:.0f}%" for c in top] + (["Other"] if others else [])
+            d = Drawing(230, 160)
+            pie = Pie()
+            pie.x, pie.y, pie.width, pie.height = 10, 15, 120, 120
+            pie.data = data
+            pie.slices.strokeWidth = 0.5
+            pie.slices.strokeColor = colors.white
+            for i in range(len(data)):
+                pie.slices[i].fillColor = PALETTE[i % len(PALETTE)]
+            d.add(pie)
+            legend = Legend()
+            legend.x, legend.y = 140, 140
+            legend.fontName = "Helvetica"
+            legend.fontSize = 7
+            legend.dxTextSpace = 4
+            legend.deltay = 11
+            legend.dy = 6
+            legend.dx = 6
+            legend.colorNamePairs = [
+                (PALETTE[i % len(PALETTE)], labels[i]) for i in range(len(labels))
+            ]
+            d.add(legend)
+            chart_row.append(d)
+
+        if len(by_month) >= 2:
+            recent = by_month[-6:]
+            d2 = Drawing(250, 160)
+            bc = VerticalBarChart()
+            bc.x, bc.y, bc.width, bc.height = 30, 25, 200, 110
+            bc.data = [[m["income"] for m in recent], [m["expenses"] for m in recent]]
+            bc.categoryAxis.categoryNames = [m["label"].split(" ")[0] for m in recent]
+            bc.categoryAxis.labels.fontSize = 7
+            bc.valueAxis.labels.fontSize = 7
+            bc.valueAxis.valueMin = 0
+            bc.bars[0].fillColor = GREEN
+            bc.bars[1].fillColor = RED
+            bc.barSpacing = 1
+            bc.groupSpacing = 8
+            d2.add(bc)
+            chart_row.append(d2)
+
+        if chart_row:
+            ct = Table([chart_row], colWidths=[90 * mm, 88 * mm][: len(chart_row)])
+            ct.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
+            story.append(ct)
+            if len(by_month) >= 2:
+                story.append(Paragraph(
+                    "<font color='#10b981'>■</font> Income   "
+                    "<font color='#ef4444'>■</font> Expenses  (last 6 months)",
+                    styles["Cell"]))
+
+    # ── Recurring table ──────────────────────────────────
+    recurring = analysis["recurring"]
+    if show_narrative and recurring:
+        story.append(Paragraph("Recurring & repeated spending", styles["H2"]))
+        head = ["Item", "Category", "Cadence", "Times", "Avg", "Total"]
+        rows = [head]
+        for r in recurring[:15]:
+            rows.append([
+                Paragraph(r["label"][:34], styles["Cell"]),
+                Paragraph(r["category"].title(), styles["Cell"]),
+                Paragraph(r["cadence"], styles["Cell"]),
+                Paragraph(str(r["occurrences"]), styles["CellR"]),
+                Paragraph(_rupee(r["avg_amount"]), styles["CellR"]),
+                Paragraph(_rupee(r["total_amount"]), styles["CellR"]),
+            ])
+        t = Table(rows, colWidths=[46 * mm, 26 * mm, 30 * mm, 14 * mm, 24 * mm, 26 * mm], repeatRows=1)
+        t.setStyle(_table_style(BRAND, LIGHT))
+        story.append(t)
+
+    # ── Category table ───────────────────────────────────
+    if show_narrative and by_cat:
+        story.append(Paragraph("Category breakdown", styles["H2"]))
+        rows = [["Category", "Transactions", "% of spend", "Total"]]
+        for c in by_cat:
+            rows.append([
+                Paragraph(c["category"].title(), styles["Cell"]),
+                Paragraph(str(c["count"]), styles["CellR"]),
+                Paragraph(f"{c['pct']:.1f}%", styles["CellR"]),
+                Paragraph(_rupee(c["total"]), styles["CellR"]),
+            ])
+        t = Table(rows, colWidths=[66 * mm, 34 * mm, 34 * mm, 32 * mm], repeatRows=1)
+        t.setStyle(_table_style(BRAND, LIGHT))
+        story.append(t)
+
+    # ── Monthly table ────────────────────────────────────
+    if by_month:
+        story.append(Paragraph("Month-by-month", styles["H2"]))
+        rows = [["Month", "Income", "Expenses", "Net", "Txns"]]
+        for m in reversed(by_month):
+            rows.append([
+                Paragraph(m["label"], styles["Cell"]),
+                Paragraph(_rupee(m["income"]), styles["CellR"]),
+                Paragraph(_rupee(m["expenses"]), styles["CellR"]),
+                Paragraph(_rupee(m["net"]), styles["CellR"]),
+                Paragraph(str(m["count"]), styles["CellR"]),
+            ])
+        t = Table(rows, colWidths=[40 * mm, 34 * mm, 34 * mm, 34 * mm, 24 * mm], repeatRows=1)
+        t.setStyle(_table_style(BRAND, LIGHT))
+        story.append(t)
+
+    # ── Category × month comparison (only if 2+ months) ──
+    cbm = analysis.get("category_by_month", [])
+    month_labels = analysis.get("selected_labels", [])
+    if show_narrative and cbm and len(month_labels) >= 2:
+        story.append(Paragraph("Category by month", styles["H2"]))
+        month_keys = analysis["selected_months"]
+        head = ["Category"] + month_labels + ["Total"]
+        rows = [head]
+        for c in cbm[:16]:
+            row = [Paragraph(("● " if c["compulsory"] else "") + c["category"].title(), styles["Cell"])]
+            for mk in month_keys:
+                row.append(Paragraph(_rupee(c["per_month"].get(mk, 0)), styles["CellR"]))
+            row.append(Paragraph(_rupee(c["total"]), styles["CellR"]))
+            rows.append(row)
+        # Fit columns to page width (~178mm usable)
+        first_col = 40
+        rest = (178 - first_col) / (len(month_labels) + 1)
+        widths = [first_col * mm] + [rest * mm] * (len(month_labels) + 1)
+        t = Table(rows, colWidths=widths, repeatRows=1)
+        t.setStyle(_table_style(BRAND, LIGHT))
+        story.append(t)
+        story.append(Paragraph("● = committed / fixed cost", styles["Cell"]))
+
+    # ── Full transactions ledger (grouped by month) ─────
+    # Generated while the layout runs: only a page of rows exists at a time
+    ledger_part = ()
+    if show_ledger:
+        rows = ledger_rows(**ledger) if ledger else _analysis_rows(analysis)
+        ledger_part = _ledger_flowables(rows, analysis, doc, styles, show_narrative)
+
+    ending = [Spacer(1, 8 * mm)]
+    scope_note = ("selected months" if sel_labels and len(sel_labels) < len(avail) else "all recorded months")
+    ending.append(Paragraph(
+        f"Generated by FinAI • This report reflects {scope_note}.",
+        styles["Cell"]))
+
+    doc.build(_StreamedStory(story, chain(ledger_part, ending)))
+    return None if path else buf.getvalue()
+
+
+def _ledger_flowables(rows, analysis: dict, doc, styles, page_break: bool):
+    from reportlab.lib.units import mm
+    from reportlab.platypus import PageBreak, Paragraph, Spacer
+
+    import rollups
+
+    LedgerChunk = _ledger_chunk_class()
+    months = {m["month"]: m for m in analysis.get("by_month", [])}
+    started = False
+    for month_key, month_rows in groupby(rows, key=lambda row: row[0][:7] or rollups.UNDATED_MONTH):
+        if not started:
+            if page_break:
+                yield PageBreak()
+            yield Paragraph("Transactions", styles["H2"])
+            started = True
+        month = months.get(month_key)
+        heading = month["label"] if month else rollups.month_label(month_key)
+        if month:
+            heading += f" — {month['count']} entries, spent {_rupee(month['expenses'])}"
+        yield Paragraph(heading, styles["Headline"])
+        chunk, first = [], True
+        for row in month_rows:
+            chunk.append(_ledger_cells(row))
+            if len(chunk) == LEDGER_TABLE_ROWS:
+                yield LedgerChunk(chunk, doc, first)
+                chunk, first = [], False
+        if chunk:
+            yield LedgerChunk(chunk, doc, first)
+        yield Spacer(1, 5 * mm)
+
+
+def _rupee(v) -> str:
+    return "Rs " + f"{v:,.0f}"
+
+
+def _ledger_cells(row) -> list:
+    from reportlab.lib.units import mm
+
+    date, tx_type, category, description, amount = row
+    return [
+        date or "—",
+        _clip(category.title(), 30 * mm),
+        _clip((description or "—")[:40], 62 * mm),
+        tx_type.title(),
+        ("- " if tx_type == "EXPENSE" else "+ ") + _rupee(amount),
+    ]
+
+
+def _clip(text: str, width: float) -> str:
+    """Cut `text` to fit a ledger column (plain cells do not wrap)."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    room = width - 14  # cell padding
+    if stringWidth(text, "Helvetica", 8.5) <= room:
+        return text
+    while text and stringWidth(text + "…", "Helvetica", 8.5) > room:
+        text = text[:-1]
+    return text + "…"
+
+
+class _StreamedStory(list):
+    """A story whose tail is pulled from an iterator as the layout consumes it.
+
+    doc.build only ever looks at the front of the list and deletes flowables
+    once drawn, so topping it up a few at a time keeps the whole document
+    from being materialised."""
+
+    AHEAD = 8
+
+    def __init__(self, head, more):
+        super().__init__(head)
+        self._more = iter(more)
+
+    def _fill(self):
+        while self._more is not None and list.__len__(self) < self.AHEAD:
+            try:
+                self.append(next(self._more))
+            except StopIteration:
+                self._more = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
+@lru_cache(maxsize=1)
+def _ledger_chunk_class():
+    # Defined on first use so importing this module does not import ReportLab
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Flowable, Table
+
+    class LedgerChunk(Flowable):
+        """Up to LEDGER_TABLE_ROWS ledger rows as a plain-string table.
+
+        The column header is drawn on a month's first chunk and whenever a
+        chunk starts a page; a chunk split across pages continues as a new
+        chunk, so every ledger page starts with the header."""
+
+        def __init__(self, rows: list, doc, first: bool):
+            super().__init__()
+            self.rows, self.doc, self.first = rows, doc, first
+            self._table = None
+            self._header = first
+
+        def wrap(self, availWidth, availHeight):
+            self._header = self.first or bool(getattr(self.doc.frame, "_atTop", False))
+            data = ([["Date", "Category", "Description", "Type", "Amount"]] if self._header else []) + self.rows
+            self._table = Table(data, colWidths=[22 * mm, 30 * mm, 62 * mm, 24 * mm, 30 * mm],
+                                repeatRows=1 if self._header else 0)
+            self._table.setStyle(_ledger_style(self._header))
+            return self._table.wrap(availWidth, availHeight)
+
+        def split(self, availWidth, availHeight):
+            if self._table is None:
+                self.wrap(availWidth, availHeight)
+            parts = self._table.split(availWidth, availHeight)
+            if len(parts) < 2:
+                return parts
+            shown = len(parts[0]._cellvalues) - (1 if self._header else 0)
+            if shown <= 0:
+                return []
+            return [parts[0], LedgerChunk(self.rows[shown:], self.doc, first=False)]
+
+        def draw(self):
+            self._table.drawOn(self.canv, 0, 0)
+
+    return LedgerChunk
+
+
+@lru_cache(maxsize=2)
+def _ledger_style(header: bool):
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    body = 1 if header else 0
+    commands = [
+        ("FONT", (0, body), (-1, -1), "Helvetica", 8.5),
+        ("TEXTCOLOR", (0, body), (-1, -1), colors.HexColor("#475569")),
+        ("TEXTCOLOR", (-1, body), (-1, -1), colors.HexColor("#0f172a")),
+        ("ALIGN", (-1, body), (-1, -1), "RIGHT"),
+        ("ROWBACKGROUNDS", (0, body), (-1, -1), [colors.white, colors.HexColor("#f1f5f9")]),
+        ("LINEBELOW", (0, 0), (-1, -1), 0.25, colors.HexColor("#e2e8f0")),
+        ("TOPPADDING", (0, 0), (-1, -1), 5),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+        ("LEFTPADDING", (0, 0), (-1, -1), 7),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 7),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ]
+    if header:
+        commands += [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#3b82f6")),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 8.5),
+            ("ALIGN", (1, 0), (-1, 0), "RIGHT"),
+            ("ALIGN", (0, 0), (0, 0), "LEFT"),
+        ]
+    return TableStyle(commands)
+
+
+def _table_style(brand, light):
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+    return TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), brand),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 8.5),
+        ("ALIGN", (1, 0), (-1, 0), "RIGHT"),
+        ("ALIGN", (0, 0), (0, 0), "LEFT"),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, light]),
+        ("LINEBELOW", (0, 0), (-1, -1), 0.25, colors.HexColor("#e2e8f0")),
+        ("TOPPADDING", (0, 0), (-1, -1), 5),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+        ("LEFTPADDING", (0, 0), (-1, -1), 7),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 7),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ])
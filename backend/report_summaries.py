@@ -0,0 +1,91 @@
+"""Persistent cache of AI report summaries.
+
+The narrative summary on /api/reports/analysis, /pdf and /email is a full
+model completion over `stats_for_ai`. The same stats always get the same
+summary, so it is stored in `report_summaries` keyed by a stable hash of
+those stats (plus the deployment and SUMMARY_VERSION, bumped whenever the
+prompt changes). Viewing a report and then downloading or emailing it, or
+reopening unchanged months later, reuses the stored summary. New
+transactions change the stats, and so the key, so nothing needs
+invalidating.
+
+Eviction on every store: entries older than REPORT_SUMMARY_MAX_AGE_DAYS are
+dropped, and each user keeps at most REPORT_SUMMARY_MAX_PER_USER, least
+recently used first. Rule-based fallbacks (AI unavailable) are never stored.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import ReportSummary
+
+SUMMARY_VERSION = 1
+MAX_AGE_DAYS = float(os.getenv("REPORT_SUMMARY_MAX_AGE_DAYS", "30"))
+MAX_PER_USER = int(os.getenv("REPORT_SUMMARY_MAX_PER_USER", "50"))
+
+
+def fingerprint(stats: dict) -> str:
+    """Stable hash of the stats the model sees (independent of dict key order)."""
+    payload = json.dumps(
+        {
+            "version": SUMMARY_VERSION,
+            "deployment": os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o"),
+            "stats": stats,
+        },
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lookup(db: Session, user_id: int, stats_hash: str) -> Optional[dict]:
+    """The stored summary for this fingerprint, or None if missing or too old."""
+    row = db.query(ReportSummary).filter(
+        ReportSummary.user_id == user_id,
+        ReportSummary.stats_hash == stats_hash,
+    ).first()
+    if row is None or row.created_at < datetime.utcnow() - timedelta(days=MAX_AGE_DAYS):
+        return None
+    row.used_at = datetime.utcnow()
+    row.hits += 1
+    db.commit()
+    return json.loads(row.summary)
+
+
+def store(db: Session, user_id: int, stats_hash: str, summary: dict):
+    """Save (or refresh) the summary for this fingerprint, then evict."""
+    now = datetime.utcnow()
+    row = db.query(ReportSummary).filter(
+        ReportSummary.user_id == user_id,
+        ReportSummary.stats_hash == stats_hash,
+    ).first()
+    if row is None:
+        db.add(ReportSummary(user_id=user_id, stats_hash=stats_hash, summary=json.dumps(summary),
+                             created_at=now, used_at=now))
+    else:
+        row.summary, row.created_at, row.used_at = json.dumps(summary), now, now
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request stored the same fingerprint first
+        db.rollback()
+    _evict(db, user_id)
+
+
+def _evict(db: Session, user_id: int):
+    db.query(ReportSummary).filter(
+        ReportSummary.created_at < datetime.utcnow() - timedelta(days=MAX_AGE_DAYS),
+    ).delete(synchronize_session=False)
+    stale_ids = [
+        row_id for (row_id,) in db.query(ReportSummary.id)
+        .filter(ReportSummary.user_id == user_id)
+        .order_by(ReportSummary.used_at.desc())
+        .offset(MAX_PER_USER)
+    ]
+    if stale_ids:
+        db.query(ReportSummary).filter(ReportSummary.id.in_(stale_ids)).delete(synchronize_session=False)
+    db.commit()
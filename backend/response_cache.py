@@ -0,0 +1,243 @@
+"""Response cache in front of parse_user_input.
+
+Users ask the same questions ("how much balance left?", "how much did I spend
+on food?") many times a day. A cached answer is keyed on
+
+  - the user,
+  - the normalized message (case, spacing and trailing punctuation ignored),
+  - a fingerprint of the financial context sent to the model (balance,
+    transactions, envelopes, reminders), and
+  - the last assistant turn, so short follow-ups ("yes", "both") still go to
+    the model when the conversation differs,
+
+so an answer is only reused while everything the model saw is unchanged.
+Only pure answers are stored; replies carrying transaction, reminder or report
+actions always go to the model, and so does the next message after a fallback
+reply (model unreachable or unparseable output).
+
+On top of the fingerprint, every committed ORM write to a user's transactions,
+envelopes, cycles or reminders drops that user's entries (flush hooks below);
+bulk writes that bypass the ORM call `invalidate_user` themselves.
+
+Configuration:
+  CHAT_CACHE_BACKEND      memory (default, per process) | sqlite (shared file) | off
+  CHAT_CACHE_PATH         SQLite file for the sqlite backend (default chat_cache.db)
+  CHAT_CACHE_TTL          seconds an entry stays valid (default 600)
+  CHAT_CACHE_MAX_ENTRIES  LRU capacity (default 2048)
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from database import SessionLocal, CategoryBudget, Cycle, Reminder, Transaction
+from ledger import committed_value
+from schemas import NLPResponse
+
+CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "2048"))
+
+
+def normalize_message(message: str) -> str:
+    text = re.sub(r"\s+", " ", (message or "").strip().lower())
+    return text.rstrip("?!. ")
+
+
+def make_key(message: str, context_text: str, chat_history: List[dict] = None) -> str:
+    last_reply = next(
+        (t.get("content", "") for t in reversed(chat_history or []) if t.get("role") == "assistant"), "",
+    )
+    digest = hashlib.sha256()
+    for part in (normalize_message(message), context_text, str(last_reply)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def is_cacheable(response: NLPResponse) -> bool:
+    """Only side-effect-free answers from the model may be replayed; the
+    busy / snag fallbacks would otherwise outlive the outage by CHAT_CACHE_TTL."""
+    return bool(
+        not response._fallback
+        and response.ai_insight
+        and not response.transactions
+        and not response.reminder_actions
+        and response.report_action is None
+        and not response.clarification_needed
+    )
+
+
+# ──────────────────────────────────────────────────────────────
+#  Backends
+# ──────────────────────────────────────────────────────────────
+
+class MemoryCache:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (user_id, key) -> (expires_at, json)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return entry[1]
+
+    def set(self, user_id: int, key: str, value: str):
+        with self._lock:
+            self._entries[(user_id, key)] = (time.time() + self.ttl, value)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for k in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[k]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """LRU with expiry in a SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path: str, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " user_id INTEGER NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, used_at REAL NOT NULL, PRIMARY KEY (user_id, key))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_used ON response_cache (used_at)")
+
+    def get(self, user_id: int, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE user_id = ? AND key = ?", (user_id, key),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM response_cache WHERE user_id = ? AND key = ?", (user_id, key))
+                return None
+            self._conn.execute(
+                "UPDATE response_cache SET used_at = ? WHERE user_id = ? AND key = ?", (now, user_id, key),
+            )
+            return row[0]
+
+    def set(self, user_id: int, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (user_id, key, value, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, key, value, now + self.ttl, now),
+            )
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE rowid IN ("
+                " SELECT rowid FROM response_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache WHERE user_id = ?", (user_id,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+
+
+def _make_backend():
+    backend = os.getenv("CHAT_CACHE_BACKEND", "memory").lower()
+    if backend == "off":
+        return None
+    if backend == "sqlite":
+        return SQLiteCache(os.getenv("CHAT_CACHE_PATH", "chat_cache.db"))
+    return MemoryCache()
+
+
+cache = _make_backend()
+_stats = {"hits": 0, "misses": 0}
+
+
+def get(user_id: int, key: str) -> Optional[NLPResponse]:
+    if cache is None:
+        return None
+    value = cache.get(user_id, key)
+    _stats["hits" if value is not None else "misses"] += 1
+    return NLPResponse(**json.loads(value)) if value is not None else None
+
+
+def put(user_id: int, key: str, response: NLPResponse):
+    if cache is not None and is_cacheable(response):
+        cache.set(user_id, key, response.model_dump_json())
+
+
+def invalidate_user(user_id: int):
+    if cache is not None:
+        cache.invalidate_user(user_id)
+
+
+def stats() -> dict:
+    hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"cache_hits": hits, "cache_misses": misses, "cache_hit_rate": round(hits / total, 4) if total else 0.0}
+
+
+# ──────────────────────────────────────────────────────────────
+#  Invalidation hooks
+# ──────────────────────────────────────────────────────────────
+
+@event.listens_for(SessionLocal, "after_flush")
+def _cache_after_flush(session, flush_context):
+    users = session.info.setdefault("cache_invalidate_users", set())
+    cycle_owner = {}
+
+    def owner_of(cycle_id):
+        if cycle_id not in cycle_owner:
+            with session.no_autoflush:
+                cycle = session.get(Cycle, cycle_id) if cycle_id is not None else None
+            cycle_owner[cycle_id] = cycle.user_id if cycle else None
+        return cycle_owner[cycle_id]
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Transaction, CategoryBudget)):
+            users.add(owner_of(obj.cycle_id))
+            users.add(owner_of(committed_value(obj, "cycle_id")))
+        elif isinstance(obj, (Cycle, Reminder)):
+            users.add(obj.user_id)
+    users.discard(None)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _cache_after_commit(session):
+    for user_id in session.info.pop("cache_invalidate_users", set()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _cache_after_rollback(session):
+    session.info.pop("cache_invalidate_users", None)
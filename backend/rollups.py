@@ -0,0 +1,209 @@
+"""Monthly per-category rollup of transactions.
+
+`MonthlyCategoryRollup` keeps one row per (user, cycle, month, type, category)
+with the sum, count and first/last date of the matching transactions. Reports,
+monthly history and the chat context read it instead of re-aggregating raw rows.
+
+Rows are maintained by session flush hooks: every ORM insert/update/delete of a
+Transaction marks the affected rollup keys, and each key is recomputed from the
+(indexed) raw rows right after the flush, in the same DB transaction. Bulk
+writes that bypass the ORM must call `backfill` for the user afterwards.
+
+Legacy transactions without a date are kept under the month key UNDATED_MONTH
+("undated", labelled "Undated"), so the rollup totals match the balance ledger.
+
+Rebuild from scratch (also run once by migration 3):
+    python rollups.py backfill [--user ID]
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, event, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from aggregates import month_key_bounds
+from database import SessionLocal, Cycle, MonthlyCategoryRollup, Transaction
+from ledger import committed_value
+
+
+def normalize_category(category) -> str:
+    return (category or "").lower()
+
+
+UNDATED_MONTH = "undated"  # sorts after every "YYYY-MM" key
+
+
+def month_key(date: datetime) -> str:
+    return date.strftime("%Y-%m") if date else UNDATED_MONTH
+
+
+def month_label(month: str) -> str:
+    """"Jan 2025" for "2025-01", "Undated" for UNDATED_MONTH."""
+    return "Undated" if month == UNDATED_MONTH else datetime.strptime(month, "%Y-%m").strftime("%b %Y")
+
+
+def _month_expr(dialect_name: str):
+    if dialect_name == "postgresql":
+        month = func.to_char(Transaction.date, "YYYY-MM")
+    else:
+        month = func.strftime("%Y-%m", Transaction.date)
+    return func.coalesce(month, UNDATED_MONTH)
+
+
+def _category_expr():
+    return func.coalesce(func.lower(Transaction.category), "")
+
+
+# ──────────────────────────────────────────────────────────────
+#  Recompute / backfill
+# ──────────────────────────────────────────────────────────────
+
+def refresh_key(db: Session, user_id: int, cycle_id: int, month: str, tx_type, category: str):
+    """Recompute one rollup row from the raw transactions it covers."""
+    with db.no_autoflush:
+        total, count, first, last = db.query(
+            func.coalesce(func.sum(Transaction.amount), 0.0),
+            func.count(Transaction.id),
+            func.min(Transaction.date),
+            func.max(Transaction.date),
+        ).filter(
+            Transaction.cycle_id == cycle_id,
+            Transaction.type == tx_type,
+            _category_expr() == category,
+            months_filter([month]),
+        ).one()
+        row = db.query(MonthlyCategoryRollup).filter(
+            MonthlyCategoryRollup.user_id == user_id,
+            MonthlyCategoryRollup.cycle_id == cycle_id,
+            MonthlyCategoryRollup.month == month,
+            MonthlyCategoryRollup.type == tx_type,
+            MonthlyCategoryRollup.category == category,
+        ).first()
+
+    if not count:
+        if row is not None:
+            db.delete(row)
+        return
+    if row is None:
+        row = MonthlyCategoryRollup(user_id=user_id, cycle_id=cycle_id, month=month, type=tx_type, category=category)
+        db.add(row)
+    row.total = float(total)
+    row.count = count
+    row.first_date = first
+    row.last_date = last
+
+
+def backfill(db: Session, user_id: int = None) -> int:
+    """Delete and rebuild rollup rows (all users, or one) with a single
+    INSERT … SELECT … GROUP BY. Returns the number of rows written. No commit."""
+    month = _month_expr(db.get_bind().dialect.name)
+    category = _category_expr()
+    grouped = (
+        select(
+            Cycle.user_id, Transaction.cycle_id, month, Transaction.type, category,
+            func.sum(Transaction.amount), func.count(Transaction.id),
+            func.min(Transaction.date), func.max(Transaction.date),
+        )
+        .select_from(Transaction)
+        .join(Cycle, Transaction.cycle_id == Cycle.id)
+        .group_by(Cycle.user_id, Transaction.cycle_id, month, Transaction.type, category)
+    )
+    delete = db.query(MonthlyCategoryRollup)
+    if user_id is not None:
+        grouped = grouped.where(Cycle.user_id == user_id)
+        delete = delete.filter(MonthlyCategoryRollup.user_id == user_id)
+    delete.delete(synchronize_session=False)
+
+    r = MonthlyCategoryRollup
+    result = db.execute(insert(r).from_select(
+        [r.user_id, r.cycle_id, r.month, r.type, r.category, r.total, r.count, r.first_date, r.last_date],
+        grouped,
+    ))
+    return result.rowcount
+
+
+# ──────────────────────────────────────────────────────────────
+#  Reads
+# ──────────────────────────────────────────────────────────────
+
+def user_rollups(db: Session, user_id: int, months=None, exclude_cycle_id: int = None):
+    """Rollup rows for a user, optionally limited to "YYYY-MM" months."""
+    query = db.query(MonthlyCategoryRollup).filter(MonthlyCategoryRollup.user_id == user_id)
+    if months:
+        query = query.filter(MonthlyCategoryRollup.month.in_(list(months)))
+    if exclude_cycle_id is not None:
+        query = query.filter(MonthlyCategoryRollup.cycle_id != exclude_cycle_id)
+    return query.order_by(MonthlyCategoryRollup.month).all()
+
+
+def months_filter(months):
+    """SQL condition selecting transactions dated inside any of the "YYYY-MM" months
+    (UNDATED_MONTH selects the rows without a date)."""
+    ranges = [month_key_bounds(m) for m in months if m != UNDATED_MONTH]
+    conditions = [and_(Transaction.date >= s, Transaction.date < e) for s, e in ranges]
+    if UNDATED_MONTH in months:
+        conditions.append(Transaction.date.is_(None))
+    return or_(*conditions)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Flush hooks
+# ──────────────────────────────────────────────────────────────
+
+def _key(session, cycle_owner: dict, cycle_id, tx_type, category, date):
+    if cycle_id is None:
+        return None
+    if cycle_id not in cycle_owner:
+        cycle = session.get(Cycle, cycle_id)
+        cycle_owner[cycle_id] = cycle.user_id if cycle else None
+    user_id = cycle_owner[cycle_id]
+    if user_id is None:
+        return None
+    return (user_id, cycle_id, month_key(date), tx_type, normalize_category(category))
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _rollup_after_flush(session, flush_context):
+    # Object state and attribute history still describe the flush here, and
+    # column defaults (e.g. Transaction.date) have been filled in.
+    keys = session.info.setdefault("rollup_keys", set())
+    cycle_owner = {}
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Transaction):
+                keys.add(_key(session, cycle_owner, obj.cycle_id, obj.type, obj.category, obj.date))
+        for obj in session.dirty:
+            if isinstance(obj, Transaction) and session.is_modified(obj):
+                keys.add(_key(session, cycle_owner, committed_value(obj, "cycle_id"), committed_value(obj, "type"),
+                              committed_value(obj, "category"), committed_value(obj, "date")))
+                keys.add(_key(session, cycle_owner, obj.cycle_id, obj.type, obj.category, obj.date))
+        for obj in session.deleted:
+            if isinstance(obj, Transaction):
+                keys.add(_key(session, cycle_owner, committed_value(obj, "cycle_id"), committed_value(obj, "type"),
+                              committed_value(obj, "category"), committed_value(obj, "date")))
+    keys.discard(None)
+
+
+@event.listens_for(SessionLocal, "after_flush_postexec")
+def _rollup_after_flush_postexec(session, flush_context):
+    for key in session.info.pop("rollup_keys", set()):
+        refresh_key(session, *key)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Monthly category rollup maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bf = sub.add_parser("backfill", help="Rebuild rollup rows from raw transactions")
+    bf.add_argument("--user", type=int, default=None, help="Only this user id")
+    args = parser.parse_args()
+
+    from database import init_db
+    init_db()
+    db = SessionLocal()
+    try:
+        written = backfill(db, user_id=args.user)
+        db.commit()
+        print(f"Wrote {written} rollup row(s).")
+    finally:
+        db.close()
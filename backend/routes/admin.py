@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
-from database import get_db, User, Cycle, Transaction, CategoryBudget, Reminder, TransactionType
-from routes.auth import get_current_user
+from database import get_db, User, Cycle, Transaction, CategoryBudget, Reminder, BalanceLedger, MonthlyCategoryRollup, ReportSummary
+from routes.auth import PURGED_PASSWORD_HASH, get_current_user, hash_password, invalidate_principal
+from routes.transactions import keyset_page
+import base64
+import hashlib
+import os
+import time
+import report_jobs
+import response_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -29,88 +39,321 @@ class TransactionRow(BaseModel):
     description: Optional[str]
     date: str
 
-class UserDetail(BaseModel):
+class TransactionRowPage(BaseModel):
+    items: List[TransactionRow]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+class EnvelopeRow(BaseModel):
     id: int
-    username: str
-    created_at: str
+    category: str
+    allocated: float
+    spent: float
+    remaining: float
+
+class EnvelopePage(BaseModel):
+    items: List[EnvelopeRow]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+class ReminderRow(BaseModel):
+    id: int
+    title: str
+    amount: float
+    type: str
+    due_date: Optional[str]
+    is_paid: bool
+
+class ReminderPage(BaseModel):
+    items: List[ReminderRow]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+# ── User listing ───────────────────────────────────────────────────────────
+#
+# Sorting and paging read users joined to balance_ledgers (one row per user with
+# lifetime income / expenses and locked envelope money, kept in step by ledger.py),
+# so ordering 100k users by balance or spend is a single-table scan. The counts
+# for the rows on the page then come from three grouped queries restricted to
+# those ids: transactions from monthly_category_rollup, envelopes of each user's
+# latest cycle, and reminders.
+
+USER_SORTS = {
+    "id": User.id,
+    "username": User.username,
+    "created_at": User.created_at,
+    "income": "total_income",
+    "spend": "total_expenses",
+    "balance": "available_balance",
+}
+
+class UserTotals(BaseModel):
+    users: int
     total_income: float
     total_expenses: float
-    available_balance: float
-    transactions: List[TransactionRow]
-    envelopes: List[dict]
-    reminders: List[dict]
-
-def _user_summary(user: User, db: Session) -> UserSummary:
-    all_txs = db.query(Transaction).join(Cycle).filter(Cycle.user_id == user.id).all()
-    total_income = sum(t.amount for t in all_txs if t.type in (TransactionType.INCOME, TransactionType.SALARY))
-    total_expenses = sum(t.amount for t in all_txs if t.type == TransactionType.EXPENSE)
-    # Envelope locked money
-    cycle = db.query(Cycle).filter(Cycle.user_id == user.id).order_by(Cycle.id.desc()).first()
-    locked = 0.0
-    env_count = 0
-    if cycle:
-        budgets = db.query(CategoryBudget).filter(CategoryBudget.cycle_id == cycle.id).all()
-        locked = sum(max(0.0, b.allocated_amount - b.spent_amount) for b in budgets)
-        env_count = len(budgets)
-    rem_count = db.query(Reminder).filter(Reminder.user_id == user.id).count()
-    return UserSummary(
-        id=user.id,
-        username=user.username,
-        created_at=user.created_at.strftime("%Y-%m-%d %H:%M") if user.created_at else "—",
-        total_income=round(total_income, 2),
-        total_expenses=round(total_expenses, 2),
-        available_balance=round(total_income - total_expenses - locked, 2),
-        transaction_count=len(all_txs),
-        envelope_count=env_count,
-        reminder_count=rem_count,
+    transaction_count: int
+
+class UserPage(BaseModel):
+    items: List[UserSummary]
+    total: int
+    limit: int
+    offset: int
+    totals: UserTotals
+
+def _user_filter(query, q: Optional[str], user_id: Optional[int] = None):
+    query = query.filter(User.is_admin == False)
+    if user_id is not None:
+        query = query.filter(User.id == user_id)
+    if q:
+        query = query.filter(func.lower(User.username).contains(q.lower(), autoescape=True))
+    return query
+
+def _user_counts(db: Session, user_ids: Optional[List[int]] = None) -> dict:
+    """user_id -> (transactions, envelopes in the latest cycle, reminders); all users when `user_ids` is None."""
+    def only(query, column):
+        return query if user_ids is None else query.filter(column.in_(user_ids))
+
+    txs = dict(only(db.query(MonthlyCategoryRollup.user_id, func.sum(MonthlyCategoryRollup.count)),
+                    MonthlyCategoryRollup.user_id).group_by(MonthlyCategoryRollup.user_id))
+    latest = only(db.query(Cycle.user_id.label("user_id"), func.max(Cycle.id).label("cycle_id")),
+                  Cycle.user_id).group_by(Cycle.user_id).subquery()
+    envelopes = dict(db.query(latest.c.user_id, func.count(CategoryBudget.id))
+                     .join(CategoryBudget, CategoryBudget.cycle_id == latest.c.cycle_id)
+                     .group_by(latest.c.user_id))
+    reminders = dict(only(db.query(Reminder.user_id, func.count(Reminder.id)), Reminder.user_id)
+                     .group_by(Reminder.user_id))
+    return {uid: (txs.get(uid, 0), envelopes.get(uid, 0), reminders.get(uid, 0))
+            for uid in (user_ids if user_ids is not None else set(txs) | set(envelopes) | set(reminders))}
+
+def user_summaries(db: Session, q: Optional[str] = None, sort: str = "id", order: str = "asc",
+                   limit: Optional[int] = None, offset: int = 0, user_id: Optional[int] = None) -> List[UserSummary]:
+    """Non-admin users matching `q` (username substring), sorted and paged in SQL."""
+    income = func.coalesce(BalanceLedger.total_income, 0.0)
+    expenses = func.coalesce(BalanceLedger.total_expenses, 0.0)
+    columns = {
+        "total_income": income.label("total_income"),
+        "total_expenses": expenses.label("total_expenses"),
+        "available_balance": (income - expenses - func.coalesce(BalanceLedger.locked_amount, 0.0)).label("available_balance"),
+    }
+    query = db.query(User.id, User.username, User.created_at, *columns.values()).outerjoin(
+        BalanceLedger, BalanceLedger.user_id == User.id)
+    query = _user_filter(query, q, user_id)
+
+    key = USER_SORTS[sort]
+    key = columns[key] if isinstance(key, str) else key
+    if order == "desc":
+        query = query.order_by(key.desc(), User.id.desc())
+    else:
+        query = query.order_by(key.asc(), User.id.asc())
+    if limit is not None:
+        query = query.limit(limit).offset(offset)
+    rows = query.all()
+
+    counts = _user_counts(db, [row.id for row in rows] if limit is not None or user_id is not None else None)
+    return [UserSummary(
+        id=row.id,
+        username=row.username,
+        created_at=row.created_at.strftime("%Y-%m-%d %H:%M") if row.created_at else "—",
+        total_income=round(row.total_income, 2),
+        total_expenses=round(row.total_expenses, 2),
+        available_balance=round(row.available_balance, 2),
+        transaction_count=counts.get(row.id, (0, 0, 0))[0],
+        envelope_count=counts.get(row.id, (0, 0, 0))[1],
+        reminder_count=counts.get(row.id, (0, 0, 0))[2],
+    ) for row in rows]
+
+def user_totals(db: Session, q: Optional[str] = None) -> UserTotals:
+    """Headline numbers for the portal across every user matching `q`."""
+    users, income, expenses = _user_filter(db.query(
+        func.count(User.id),
+        func.coalesce(func.sum(BalanceLedger.total_income), 0.0),
+        func.coalesce(func.sum(BalanceLedger.total_expenses), 0.0),
+    ).outerjoin(BalanceLedger, BalanceLedger.user_id == User.id), q).one()
+    tx_count = db.query(func.coalesce(func.sum(MonthlyCategoryRollup.count), 0)).filter(
+        MonthlyCategoryRollup.user_id.in_(_user_filter(db.query(User.id), q)))
+    return UserTotals(
+        users=users,
+        total_income=round(income, 2),
+        total_expenses=round(expenses, 2),
+        transaction_count=tx_count.scalar(),
     )
 
+def _sort_param():
+    return Query("id", pattern="^(" + "|".join(USER_SORTS) + ")$")
+
 @router.get("/users", response_model=List[UserSummary])
-def list_users(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_users(
+    q: Optional[str] = None,
+    sort: str = _sort_param(),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Every matching user (the portal's full list). Use /users/page for large installs."""
     if not getattr(current_user, "is_admin", False):
         raise HTTPException(status_code=403, detail="Admin access only")
-    users = db.query(User).filter(User.is_admin == False).order_by(User.id).all()
-    return [_user_summary(u, db) for u in users]
+    return user_summaries(db, q=q, sort=sort, order=order)
 
-@router.get("/users/{user_id}", response_model=UserDetail)
-def get_user_detail(user_id: int, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/users/page", response_model=UserPage)
+def list_users_page(
+    q: Optional[str] = None,
+    sort: str = _sort_param(),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """One page of users, searchable by username and sortable by balance, spend,
+    income, name, id or sign-up date; `totals` covers all matches."""
     if not getattr(current_user, "is_admin", False):
         raise HTTPException(status_code=403, detail="Admin access only")
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    totals = user_totals(db, q)
+    return UserPage(
+        items=user_summaries(db, q=q, sort=sort, order=order, limit=limit, offset=offset),
+        total=totals.users,
+        limit=limit,
+        offset=offset,
+        totals=totals,
+    )
+
+# ── User detail ────────────────────────────────────────────────────────────
+#
+# GET /users/{id} is only the header (the same aggregates as the list row); the
+# portal pulls transactions, envelopes and reminders page by page from the
+# sub-resources below, each seeking on a cursor rather than an OFFSET. Every
+# response carries an ETag of its body, so a re-poll with If-None-Match that
+# finds nothing changed is answered 304 with no body.
+
+def _etag_response(request: Request, payload: BaseModel) -> Response:
+    body = payload.model_dump_json().encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def _require_user(db: Session, user_id: int):
+    if not db.query(User.id).filter(User.id == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+
+def _encode_cursor(*parts) -> str:
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, parse) -> tuple:
+    """`parse(*parts)` of a cursor made by `_encode_cursor`; 400 if it doesn't fit."""
+    try:
+        parts = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode()).decode().split("|")
+        return parse(*parts)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _page(rows: list, limit: int, cursor_of) -> tuple:
+    """(rows of this page, next cursor, has_more) from `limit + 1` fetched rows."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, cursor_of(rows[-1]) if has_more else None, has_more
+
+@router.get("/users/{user_id}", response_model=UserSummary)
+def get_user_detail(user_id: int, request: Request, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Header for the detail view: totals and counts, no rows."""
+    if not getattr(current_user, "is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access only")
+    summary = user_summaries(db, user_id=user_id)
+    if not summary:
         raise HTTPException(status_code=404, detail="User not found")
+    return _etag_response(request, summary[0])
 
-    all_txs = db.query(Transaction).join(Cycle).filter(Cycle.user_id == user_id).order_by(Transaction.date.desc()).all()
-    total_income = sum(t.amount for t in all_txs if t.type in (TransactionType.INCOME, TransactionType.SALARY))
-    total_expenses = sum(t.amount for t in all_txs if t.type == TransactionType.EXPENSE)
-
-    cycle = db.query(Cycle).filter(Cycle.user_id == user_id).order_by(Cycle.id.desc()).first()
-    envelopes = []
-    locked = 0.0
-    if cycle:
-        budgets = db.query(CategoryBudget).filter(CategoryBudget.cycle_id == cycle.id).all()
-        locked = sum(max(0.0, b.allocated_amount - b.spent_amount) for b in budgets)
-        envelopes = [{"id": b.id, "category": b.category_name, "allocated": b.allocated_amount, "spent": b.spent_amount, "remaining": max(0, b.allocated_amount - b.spent_amount)} for b in budgets]
-
-    reminders = db.query(Reminder).filter(Reminder.user_id == user_id).order_by(Reminder.due_date.asc()).all()
-    rem_list = [{"id": r.id, "title": r.title, "amount": r.amount, "type": r.type.value, "due_date": r.due_date.strftime("%Y-%m-%d") if r.due_date else None, "is_paid": r.is_paid} for r in reminders]
-
-    return UserDetail(
-        id=user.id,
-        username=user.username,
-        created_at=user.created_at.strftime("%Y-%m-%d %H:%M") if user.created_at else "—",
-        total_income=round(total_income, 2),
-        total_expenses=round(total_expenses, 2),
-        available_balance=round(total_income - total_expenses - locked, 2),
-        transactions=[TransactionRow(
+@router.get("/users/{user_id}/transactions", response_model=TransactionRowPage)
+def get_user_transactions(
+    user_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """The user's ledger, newest first. Pass `next_cursor` back as `cursor` for the next page."""
+    if not getattr(current_user, "is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access only")
+    _require_user(db, user_id)
+    page = keyset_page(db.query(Transaction).join(Cycle).filter(Cycle.user_id == user_id), cursor, limit)
+    return _etag_response(request, TransactionRowPage(
+        items=[TransactionRow(
             id=t.id, type=t.type.value, category=t.category,
             amount=t.amount, source=t.source.value,
             description=t.description,
-            date=t.date.strftime("%Y-%m-%d %H:%M")
-        ) for t in all_txs],
-        envelopes=envelopes,
-        reminders=rem_list,
-    )
+            date=t.date.strftime("%Y-%m-%d %H:%M") if t.date else "—"
+        ) for t in page["items"]],
+        next_cursor=page["next_cursor"],
+        has_more=page["has_more"],
+    ))
+
+@router.get("/users/{user_id}/envelopes", response_model=EnvelopePage)
+def get_user_envelopes(
+    user_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Envelopes of the user's latest cycle, in creation order."""
+    if not getattr(current_user, "is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access only")
+    _require_user(db, user_id)
+    latest = db.query(func.max(Cycle.id)).filter(Cycle.user_id == user_id).scalar_subquery()
+    query = db.query(CategoryBudget).filter(CategoryBudget.cycle_id == latest)
+    if cursor:
+        after_id = _decode_cursor(cursor, int)
+        query = query.filter(CategoryBudget.id > after_id)
+    rows, next_cursor, has_more = _page(query.order_by(CategoryBudget.id).limit(limit + 1).all(), limit,
+                                        lambda b: _encode_cursor(b.id))
+    return _etag_response(request, EnvelopePage(
+        items=[EnvelopeRow(
+            id=b.id, category=b.category_name, allocated=b.allocated_amount, spent=b.spent_amount,
+            remaining=max(0, b.allocated_amount - b.spent_amount),
+        ) for b in rows],
+        next_cursor=next_cursor,
+        has_more=has_more,
+    ))
+
+@router.get("/users/{user_id}/reminders", response_model=ReminderPage)
+def get_user_reminders(
+    user_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """The user's reminders by due date (undated last)."""
+    if not getattr(current_user, "is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access only")
+    _require_user(db, user_id)
+    query = db.query(Reminder).filter(Reminder.user_id == user_id)
+    if cursor:
+        due, after_id = _decode_cursor(cursor, lambda d, i: (datetime.fromisoformat(d) if d else None, int(i)))
+        if due is None:
+            query = query.filter(Reminder.due_date.is_(None), Reminder.id > after_id)
+        else:
+            query = query.filter(or_(
+                Reminder.due_date > due,
+                and_(Reminder.due_date == due, Reminder.id > after_id),
+                Reminder.due_date.is_(None),
+            ))
+    rows = query.order_by(Reminder.due_date.is_(None), Reminder.due_date, Reminder.id).limit(limit + 1).all()
+    rows, next_cursor, has_more = _page(rows, limit, lambda r: _encode_cursor(
+        r.due_date.isoformat() if r.due_date else None, r.id))
+    return _etag_response(request, ReminderPage(
+        items=[ReminderRow(
+            id=r.id, title=r.title, amount=r.amount, type=r.type.value,
+            due_date=r.due_date.strftime("%Y-%m-%d") if r.due_date else None, is_paid=r.is_paid,
+        ) for r in rows],
+        next_cursor=next_cursor,
+        has_more=has_more,
+    ))
 
 # ── User management ────────────────────────────────────────────────────────
 
@@ -121,49 +364,143 @@ class UserCreate(BaseModel):
     username: str
     password: str
 
+# Deleting a user is one DELETE of the users row: cycles, transactions, envelopes,
+# reminders, rollups, ledger, summaries and jobs follow via ON DELETE CASCADE.
+# Accounts with more than USER_PURGE_THRESHOLD transactions (or mode=purge) are
+# instead locked out and handed to a background "purge" job, which deletes their
+# rows in short transactions of USER_PURGE_BATCH_SIZE so other writers never wait
+# behind one huge delete.
+USER_PURGE_THRESHOLD = int(os.getenv("USER_PURGE_THRESHOLD", "20000"))
+USER_PURGE_BATCH_SIZE = int(os.getenv("USER_PURGE_BATCH_SIZE", "1000"))
+
+def _delete_user_row(db: Session, user_id: int) -> int:
+    report_jobs.delete_user_jobs(db, user_id)  # their PDFs live outside the database
+    return db.query(User).filter(User.id == user_id, User.is_admin == False).delete(synchronize_session=False)
+
+def purge_user(db: Session, user_id: int, batch_size: int = USER_PURGE_BATCH_SIZE, heartbeat=None):
+    """Delete a user's data `batch_size` rows per transaction, then the user (run by report_jobs,
+    which passes a `heartbeat` called inside every batch's transaction)."""
+    cycle_ids = db.query(Cycle.id).filter(Cycle.user_id == user_id)
+    for model, condition in (
+        (Transaction, Transaction.cycle_id.in_(cycle_ids)),
+        (MonthlyCategoryRollup, MonthlyCategoryRollup.user_id == user_id),
+        (CategoryBudget, CategoryBudget.cycle_id.in_(cycle_ids)),
+        (Reminder, Reminder.user_id == user_id),
+        (ReportSummary, ReportSummary.user_id == user_id),
+    ):
+        while True:
+            started = time.monotonic()
+            batch = db.query(model.id).filter(condition).limit(batch_size)
+            deleted = db.query(model).filter(model.id.in_(batch)).delete(synchronize_session=False)
+            if heartbeat is not None:
+                heartbeat()
+            db.commit()
+            if deleted < batch_size:
+                break
+            # Stay off the write lock as long as we just held it, so waiting writers get in
+            time.sleep(time.monotonic() - started)
+    _delete_user_row(db, user_id)
+    db.commit()
+    response_cache.invalidate_user(user_id)
+    invalidate_principal(user_id)
+
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_user(
+    user_id: int,
+    response: Response,
+    mode: str = Query("auto", pattern="^(auto|now|purge)$"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Delete a user and all their data: at once (`now`), as a background purge job
+    (`purge`, answers 202 with the job id), or by size (`auto`)."""
     if not getattr(current_user, "is_admin", False):
         raise HTTPException(status_code=403, detail="Admin access only")
     user = db.query(User).filter(User.id == user_id, User.is_admin == False).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found or cannot delete admin")
-    # Cascade: delete all user data
-    cycles = db.query(Cycle).filter(Cycle.user_id == user_id).all()
-    for cycle in cycles:
-        db.query(CategoryBudget).filter(CategoryBudget.cycle_id == cycle.id).delete()
-        db.query(Transaction).filter(Transaction.cycle_id == cycle.id).delete()
-    db.query(Cycle).filter(Cycle.user_id == user_id).delete()
-    db.query(Reminder).filter(Reminder.user_id == user_id).delete()
-    db.delete(user)
+    username = user.username
+
+    if mode == "auto":
+        size = db.query(func.coalesce(func.sum(MonthlyCategoryRollup.count), 0)).filter(
+            MonthlyCategoryRollup.user_id == user_id).scalar()
+        mode = "purge" if size > USER_PURGE_THRESHOLD else "now"
+    if mode == "purge":
+        # Locked out now, live tokens included (auth._load_principal); the job removes the rest
+        user.password_hash = PURGED_PASSWORD_HASH
+        job = report_jobs.enqueue(db, current_user.id, "purge", {"user_id": user_id})
+        invalidate_principal(user_id)
+        response.status_code = 202
+        return {"message": f"User '{username}' is being deleted in the background",
+                "job_id": job["job_id"], "status_url": f"/api/reports/jobs/{job['job_id']}"}
+
+    _delete_user_row(db, user_id)
     db.commit()
-    return {"message": f"User '{user.username}' and all their data deleted"}
+    response_cache.invalidate_user(user_id)
+    invalidate_principal(user_id)
+    return {"message": f"User '{username}' and all their data deleted"}
 
 @router.put("/users/{user_id}/reset-password")
-def reset_password(user_id: int, body: UserResetPassword, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+async def reset_password(user_id: int, body: UserResetPassword, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     if not getattr(current_user, "is_admin", False):
         raise HTTPException(status_code=403, detail="Admin access only")
-    from werkzeug.security import generate_password_hash
-    user = db.query(User).filter(User.id == user_id, User.is_admin == False).first()
-    if not user:
+    password_hash = await hash_password(body.new_password)
+
+    def save():
+        # An account being purged stays locked out
+        user = db.query(User).filter(
+            User.id == user_id, User.is_admin == False, User.password_hash != PURGED_PASSWORD_HASH,
+        ).first()
+        if not user:
+            return None
+        user.password_hash = password_hash
+        db.commit()
+        return user.username
+
+    username = await run_in_threadpool(save)
+    if username is None:
         raise HTTPException(status_code=404, detail="User not found")
-    user.password_hash = generate_password_hash(body.new_password)
-    db.commit()
-    return {"message": f"Password reset for '{user.username}'"}
+    invalidate_principal(user_id)
+    return {"message": f"Password reset for '{username}'"}
 
 @router.post("/users/create", response_model=UserSummary)
-def admin_create_user(body: UserCreate, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+async def admin_create_user(body: UserCreate, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     if not getattr(current_user, "is_admin", False):
         raise HTTPException(status_code=403, detail="Admin access only")
-    from werkzeug.security import generate_password_hash
     from routes.auth import ADMIN_USERNAME
     if body.username.lower() == ADMIN_USERNAME.lower():
         raise HTTPException(status_code=400, detail="Username not allowed")
-    existing = db.query(User).filter(User.username == body.username).first()
-    if existing:
+
+    def taken():
+        exists = db.query(User.id).filter(User.username == body.username).first() is not None
+        db.commit()  # return the pooled connection before awaiting the hash
+        return exists
+
+    if await run_in_threadpool(taken):
         raise HTTPException(status_code=400, detail="Username already exists")
-    new_user = User(username=body.username, password_hash=generate_password_hash(body.password), is_admin=False)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return _user_summary(new_user, db)
+    password_hash = await hash_password(body.password)
+
+    def create():
+        new_user = User(username=body.username, password_hash=password_hash, is_admin=False)
+        db.add(new_user)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        db.refresh(new_user)
+        return user_summaries(db, user_id=new_user.id)[0]
+
+    summary = await run_in_threadpool(create)
+    if summary is None:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    return summary
+
+@router.get("/llm-stats")
+def llm_stats(current_user: dict = Depends(get_current_user)):
+    """LLM gateway state: circuit breaker, calls in flight, and per-purpose
+    latency histograms (cumulative buckets, ms) with outcome counts."""
+    if not getattr(current_user, "is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access only")
+    import llm_gateway
+    return llm_gateway.stats()
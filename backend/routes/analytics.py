@@ -5,9 +5,11 @@ from pydantic import BaseModel
 from typing import List
 from collections import defaultdict
 
-from database import get_db, Cycle, Transaction, TransactionType, CategoryBudget
+from database import get_db, TransactionType, CategoryBudget
 from routes.auth import get_current_user
 from state_machine import ExpenseStateMachine
+import aggregates
+import rollups
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
@@ -25,31 +27,27 @@ def get_dashboard_metrics(current_user: dict = Depends(get_current_user), db: Se
     sm = ExpenseStateMachine(db, current_user.id)
     active_cycle = sm.get_active_cycle()
 
-    # Simple running balance: all income minus expenses minus locked envelope money
-    all_txs = db.query(Transaction).join(Cycle).filter(Cycle.user_id == current_user.id).all()
-    total_income = sum(t.amount for t in all_txs if t.type in (TransactionType.INCOME, TransactionType.SALARY))
-    total_expenses = sum(t.amount for t in all_txs if t.type == TransactionType.EXPENSE)
+    # Simple running balance: all income minus expenses minus locked envelope money.
+    # One aggregate query returns lifetime totals and this month's spend as scalars.
+    now = datetime.utcnow()
+    month_start, month_end = aggregates.month_bounds(now)
+    totals = aggregates.user_totals(db, current_user.id, month_start, month_end)
+    total_income = totals["total_income"]
+    total_expenses = totals["total_expenses"]
 
     # Locked money: envelope allocations not yet spent
-    budgets = db.query(CategoryBudget).filter(CategoryBudget.cycle_id == active_cycle.id).all()
-    total_locked = sum(max(0.0, b.allocated_amount - b.spent_amount) for b in budgets)
+    total_locked = aggregates.envelope_locked(db, active_cycle.id)
 
     available_balance = total_income - total_expenses - total_locked
     net_flow = total_income - total_expenses
 
-
     # Days in current month for spend rate calculation
-    now = datetime.utcnow()
     day_of_month = now.day
     days_in_month = 30
     remaining_days = max(0, days_in_month - day_of_month)
 
     # This month's expenses for burn rate
-    this_month_expenses = sum(
-        t.amount for t in all_txs
-        if t.type == TransactionType.EXPENSE
-        and t.date.year == now.year and t.date.month == now.month
-    )
+    this_month_expenses = totals["period_expenses"]
     daily_average = this_month_expenses / max(1, day_of_month)
 
     burn_rate_status = "STABLE"
@@ -182,31 +180,23 @@ class MonthlyHistoryItem(BaseModel):
 
 @router.get("/monthly-history", response_model=List[MonthlyHistoryItem])
 def get_monthly_history(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Get all cycles for user
-    user_cycle_ids = [c.id for c in db.query(Cycle).filter(Cycle.user_id == current_user.id).all()]
-    if not user_cycle_ids:
-        return []
-    
-    # Get all transactions across all cycles
-    all_txs = db.query(Transaction).filter(Transaction.cycle_id.in_(user_cycle_ids)).all()
-    
+    # Month totals come from the maintained rollup (months × categories rows),
+    # not from every raw transaction.
     monthly: dict = defaultdict(lambda: {"total_income": 0.0, "total_expenses": 0.0, "count": 0})
-    
-    for tx in all_txs:
-        month_key = tx.date.strftime("%Y-%m")
-        monthly[month_key]["count"] += 1
-        if tx.type.value in ("INCOME", "SALARY"):
-            monthly[month_key]["total_income"] += tx.amount
-        elif tx.type.value == "EXPENSE":
-            monthly[month_key]["total_expenses"] += tx.amount
+    for row in rollups.user_rollups(db, current_user.id):
+        monthly[row.month]["count"] += row.count
+        if row.type in (TransactionType.INCOME, TransactionType.SALARY):
+            monthly[row.month]["total_income"] += row.total
+        elif row.type == TransactionType.EXPENSE:
+            monthly[row.month]["total_expenses"] += row.total
     
     result = []
-    for month_key in sorted(monthly.keys(), reverse=True):
+    # Newest month first, legacy undated rows last
+    for month_key in sorted(monthly.keys(), key=lambda k: (k != rollups.UNDATED_MONTH, k), reverse=True):
         data = monthly[month_key]
-        dt = datetime.strptime(month_key, "%Y-%m")
         result.append(MonthlyHistoryItem(
             month=month_key,
-            label=dt.strftime("%b %Y"),
+            label=rollups.month_label(month_key),
             total_income=round(data["total_income"], 2),
             total_expenses=round(data["total_expenses"], 2),
             net=round(data["total_income"] - data["total_expenses"], 2),
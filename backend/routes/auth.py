@@ -1,24 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from werkzeug.security import generate_password_hash, check_password_hash
 from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from typing import NamedTuple, Optional
+from collections import OrderedDict
 
-from database import get_db, User
+from database import get_db, SessionLocal, User
 from fastapi.security import OAuth2PasswordBearer
 import os
+import passwords
+import threading
+import time
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "supersecret-dev-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+# Validated principals are reused for this long without touching the DB (0 = off)
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 ADMIN_USERNAME = "Admin"
 ADMIN_PASSWORD = "FinAIAdmin"
 
+# password_hash of an account an admin purge job is deleting: no password
+# matches it, and tokens issued to it no longer authenticate
+PURGED_PASSWORD_HASH = "!"
+
 class UserCreate(BaseModel):
     username: str
     password: str
@@ -34,6 +47,7 @@ class Token(BaseModel):
     is_admin: bool
 
 def create_access_token(data: dict):
+    # Callers pass sub (username), uid (user id) and adm (admin flag)
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
@@ -46,41 +60,187 @@ def seed_admin(db: Session):
     if not existing:
         admin = User(
             username=ADMIN_USERNAME,
-            password_hash=generate_password_hash(ADMIN_PASSWORD),
+            password_hash=passwords.hash_password_sync(ADMIN_PASSWORD),
             is_admin=True,
         )
         db.add(admin)
         db.commit()
 
+# Hashing runs on the passwords pool (see passwords.py); the routes await it
+# without holding a threadpool thread, and turn its admission limit into a 503.
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-ins right now — please try again in a moment.",
+        headers={"Retry-After": "1"},
+    )
+
+async def hash_password(password: str) -> str:
+    try:
+        return await passwords.hash_password(password)
+    except passwords.PasswordBusy:
+        raise _busy()
+
+async def verify_password(password_hash: str, password: str) -> bool:
+    try:
+        return await passwords.verify_password(password_hash, password)
+    except passwords.PasswordBusy:
+        raise _busy()
+
 @router.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: Session = Depends(get_db)):
     if user.username.lower() == ADMIN_USERNAME.lower():
         raise HTTPException(status_code=400, detail="Username not allowed")
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if db_user:
+
+    def taken():
+        exists = db.query(User.id).filter(User.username == user.username).first() is not None
+        db.commit()  # return the pooled connection before awaiting the hash
+        return exists
+
+    if await run_in_threadpool(taken):
         raise HTTPException(status_code=400, detail="Username already registered")
+    hashed_password = await hash_password(user.password)
 
-    hashed_password = generate_password_hash(user.password)
-    new_user = User(username=user.username, password_hash=hashed_password, is_admin=False)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    def create():
+        new_user = User(username=user.username, password_hash=hashed_password, is_admin=False)
+        db.add(new_user)
+        try:
+            db.commit()
+        except IntegrityError:  # registered by a concurrent request while we hashed
+            db.rollback()
+            return None
+        return new_user.id
 
-    access_token = create_access_token(data={"sub": new_user.username})
-    return {"access_token": access_token, "token_type": "bearer", "username": new_user.username, "is_admin": False}
+    user_id = await run_in_threadpool(create)
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="Username already registered")
+
+    access_token = create_access_token(data={"sub": user.username, "uid": user_id, "adm": False})
+    return {"access_token": access_token, "token_type": "bearer", "username": user.username, "is_admin": False}
 
 @router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not check_password_hash(db_user.password_hash, user.password):
+async def login(user: UserLogin, db: Session = Depends(get_db)):
+    def find():
+        found = db.query(User.id, User.username, User.password_hash, User.is_admin).filter(
+            User.username == user.username).first()
+        db.commit()
+        return found
+
+    db_user = await run_in_threadpool(find)
+    if not db_user or not await verify_password(db_user.password_hash, user.password):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
-    access_token = create_access_token(data={"sub": db_user.username})
-    is_admin = getattr(db_user, "is_admin", False) or False
+    if passwords.needs_rehash(db_user.password_hash):
+        # Legacy method or cost: store the configured one now that we have the password.
+        # Skipped when the pool is saturated; the next login tries again.
+        try:
+            new_hash = await passwords.hash_password(user.password)
+        except passwords.PasswordBusy:
+            new_hash = None
+        if new_hash is not None:
+            def upgrade():
+                db.query(User).filter(User.id == db_user.id, User.password_hash == db_user.password_hash).update(
+                    {User.password_hash: new_hash}, synchronize_session=False)
+                db.commit()
+            await run_in_threadpool(upgrade)
+
+    is_admin = bool(db_user.is_admin)
+    access_token = create_access_token(data={"sub": db_user.username, "uid": db_user.id, "adm": is_admin})
     return {"access_token": access_token, "token_type": "bearer", "username": db_user.username, "is_admin": is_admin}
 
+# ──────────────────────────────────────────────────────────────
+#  Authenticated principal
+# ──────────────────────────────────────────────────────────────
+#
+# Tokens carry the user id and admin flag (uid / adm claims). The first request
+# with a token checks it against the users table (a primary-key lookup) and
+# caches the resulting Principal, keyed by the token, for AUTH_CACHE_TTL
+# seconds; later requests with that token skip both the JWT decode and the DB.
+# Admin routes call `invalidate_principal` when they delete a user, reset a
+# password or create an account. The cache is per process, so other workers
+# pick such changes up within AUTH_CACHE_TTL.
+
+class Principal(NamedTuple):
+    id: int
+    username: str
+    is_admin: bool
+
+
+class PrincipalCache:
+    """Bounded LRU of token -> Principal with per-entry expiry."""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token -> (expires_at, principal)
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[1]
+
+    def set(self, token: str, principal: Principal, token_expires_at: float):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (min(time.time() + self.ttl, token_expires_at), principal)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in [t for t, (_, p) in self._entries.items() if p.id == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def invalidate_principal(user_id: int):
+    """Forget cached principals of `user_id` (after delete, password reset, role change)."""
+    principal_cache.invalidate_user(user_id)
+
+
+def _load_principal(payload: dict) -> Optional[Principal]:
+    db = SessionLocal()
+    try:
+        user_id = payload.get("uid")
+        if user_id is not None:
+            user = db.get(User, user_id)
+            # Ids can be reused after a delete; the username must still match
+            if user is not None and user.username != payload.get("sub"):
+                user = None
+        else:
+            # Tokens issued before the uid claim existed
+            user = db.query(User).filter(User.username == payload.get("sub")).first()
+        if user is None or user.password_hash == PURGED_PASSWORD_HASH:
+            return None
+        return Principal(id=user.id, username=user.username, is_admin=bool(user.is_admin))
+    finally:
+        db.close()
+
+
 # Dependency for protecting other routes
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """The caller's Principal (id, username, is_admin). A cache hit is answered on
+    the event loop with no DB access; a miss runs one short lookup in the threadpool."""
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -88,12 +248,18 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    principal = await run_in_threadpool(_load_principal, payload)
+    if principal is None:
         raise credentials_exception
-    return user
+    principal_cache.set(token, principal, float(payload.get("exp", 0)))
+    return principal
+
+
+@router.get("/me")
+def me(current_user: Principal = Depends(get_current_user)):
+    """The signed-in user, as seen by the API."""
+    return {"id": current_user.id, "username": current_user.username, "is_admin": current_user.is_admin}
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import json
+import time
 
-from database import get_db, Cycle, Transaction, CategoryBudget, Reminder, ReminderType
+from database import get_db, Reminder, ReminderType
 from routes.auth import get_current_user
 from state_machine import ExpenseStateMachine
-from nlp_engine import parse_user_input
+from nlp_engine import parse_user_input, stream_user_input
+from chat_context import build_chat_context, fit_history
+import fast_parser
+import response_cache
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
@@ -18,165 +25,246 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     report_action: Optional[Dict[str, Any]] = None
+    # Which parser handled the message (fast path, response cache or LLM), its
+    # timing and the process-wide fast-path / cache hit rates
+    parser: Optional[Dict[str, Any]] = None
 
-@router.post("/", response_model=ChatResponse)
-def process_chat(req: ChatRequest, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    sm = ExpenseStateMachine(db, current_user.id)
+def _load_context(db: Session, user_id: int, req: ChatRequest = None):
+    """State machine, active cycle and — when `req` still needs the model — the LLM
+    context, its response-cache key and any cached answer for it."""
+    sm = ExpenseStateMachine(db, user_id)
     active_cycle = sm.get_active_cycle()
+    context = cache_key = cached = None
+    if req is not None:
+        # Balance snapshot, past periods, current transactions, envelopes, reminders —
+        # compacted to the configured token budget
+        context = build_chat_context(db, user_id, active_cycle)
+        cache_key = response_cache.make_key(req.message, context.text, req.chat_history)
+        cached = response_cache.get(user_id, cache_key)
+    # End the transaction so the pooled connection is returned during the LLM call;
+    # the session reconnects (and reloads the expired objects) when it is used again.
+    db.commit()
+    return sm, active_cycle, context, cache_key, cached
 
-    # 1. Current transactions
-    transactions = db.query(Transaction).filter(Transaction.cycle_id == active_cycle.id).order_by(Transaction.date.asc()).all()
-    history_context_lines = []
-    for tx in transactions:
-        cat = tx.category.capitalize() if tx.category else "Other"
-        history_context_lines.append(f"Date: {tx.date.strftime('%Y-%m-%d %H:%M')}, Type: {tx.type.value}, Category: {cat}, Amount: ₹{tx.amount}, Source: {tx.source.value}, Description: {tx.description}")
-    history_context = "\n".join(history_context_lines) if history_context_lines else "No transactions yet."
-
-    # 2. Past periods (avoid "cycle" language)
-    all_user_cycles = db.query(Cycle).filter(Cycle.user_id == current_user.id).order_by(Cycle.id.asc()).all()
-    past_periods_data = []
-    for c in all_user_cycles:
-        if c.id != active_cycle.id:
-            txs = db.query(Transaction).filter(Transaction.cycle_id == c.id).all()
-            cat_spending = {}
-            for tx in txs:
-                if tx.type.value == "EXPENSE":
-                    cat = tx.category.capitalize() if tx.category else "Other"
-                    cat_spending[cat] = cat_spending.get(cat, 0.0) + tx.amount
-            cat_str = ", ".join([f"{k}: ₹{v}" for k, v in cat_spending.items()]) if cat_spending else "None"
-            label = c.start_date.strftime("%b %Y")
-            past_periods_data.append(f"Period {label}: Income ₹{c.salary_amount + c.total_income_other_than_salary}, Total Spent ₹{c.total_expenses}, Categories ({cat_str}), Status: {c.status.value}")
-    past_context = "\n".join(past_periods_data) if past_periods_data else "No past financial periods yet."
-
-    # 3. Budget Envelopes
-    budgets = db.query(CategoryBudget).filter(CategoryBudget.cycle_id == active_cycle.id).all()
-    budget_context = "\n".join([
-        f"Envelope '{b.category_name}': Allocated ₹{b.allocated_amount}, Spent ₹{b.spent_amount}, Remaining ₹{max(0, b.allocated_amount - b.spent_amount)}"
-        for b in budgets
-    ]) if budgets else "No budget envelopes set."
-
-    # 4. Reminders / Loans
-    reminders = db.query(Reminder).filter(Reminder.user_id == current_user.id).order_by(Reminder.due_date.asc()).all()
-    now = datetime.utcnow()
-    reminder_lines = []
-    for r in reminders:
-        status = "PAID" if r.is_paid else ("OVERDUE" if r.due_date and r.due_date < now else "UPCOMING")
-        due = r.due_date.strftime("%Y-%m-%d") if r.due_date else "No due date"
-        reminder_lines.append(f"Reminder [{r.id}] '{r.title}' | Type: {r.type.value} | Amount: ₹{r.amount} | Due: {due} | Status: {status} | Notes: {r.notes or 'None'}")
-    reminders_context = "\n".join(reminder_lines) if reminder_lines else "No reminders or loans set."
-
-    # 5. Balance snapshot
-    available_balance = sm.calculate_current_balance(active_cycle)
-    total_allocated = sum(b.allocated_amount for b in budgets)
-    total_envelope_remaining = sum(max(0, b.allocated_amount - b.spent_amount) for b in budgets)
-
-    balance_summary = (
-        f"CURRENT FINANCIAL SNAPSHOT:\n"
-        f"  Available Balance (excl. envelopes): ₹{available_balance}\n"
-        f"  Total Allocated to Envelopes: ₹{total_allocated}\n"
-        f"  Total Envelope Remaining: ₹{total_envelope_remaining}\n"
-        f"  Total Money Available (Balance + Envelopes): ₹{available_balance + total_envelope_remaining}\n"
-        f"  Monthly Income: ₹{active_cycle.salary_amount + active_cycle.total_income_other_than_salary} | Total Spent: ₹{active_cycle.total_expenses}"
-    )
 
-    full_context = (
-        f"{balance_summary}\n\n"
-        f"PAST FINANCIAL PERIODS:\n{past_context}\n\n"
-        f"CURRENT PERIOD TRANSACTIONS:\n{history_context}\n\n"
-        f"BUDGET ENVELOPES:\n{budget_context}\n\n"
-        f"REMINDERS & LOANS:\n{reminders_context}"
-    )
-
-    try:
-        nlp_response = parse_user_input(req.message, full_context, req.chat_history or [])
+def _apply_actions(db: Session, user_id: int, sm: ExpenseStateMachine, active_cycle, nlp_response):
+    """Apply the parsed transaction / reminder / report actions one at a time.
 
-        # Process transaction actions via state machine
+    Yields ("transaction" | "reminder" | "report_action", payload) after each
+    action is committed, then ("done", ChatResponse) with the combined reply."""
+    # Process transaction actions via state machine, one transaction at a time
+    # so each can be reported as soon as it is committed
+    if nlp_response.clarification_needed or not nlp_response.transactions:
         tx_response = sm.process_nlp_response(nlp_response, active_cycle)
+    else:
+        tx_messages = []
+        for tx in nlp_response.transactions:
+            message = sm.process_nlp_response(nlp_response.model_copy(update={"transactions": [tx]}), active_cycle)
+            tx_messages.append(message)
+            yield "transaction", {
+                "type": tx.type.value, "amount": tx.amount, "category": tx.category,
+                "date": tx.date, "message": message,
+            }
+        tx_response = "\n".join(m for m in tx_messages if m).strip()
 
-        # Process reminder actions
-        reminder_responses = []
-        for ra in (nlp_response.reminder_actions or []):
-            try:
-                if ra.action == "create":
-                    due_dt = None
-                    if ra.due_date:
-                        try:
-                            due_dt = datetime.fromisoformat(ra.due_date.replace("Z", "+00:00").replace("+00:00", ""))
-                        except Exception:
-                            due_dt = None
-                    r_type = ReminderType.CUSTOM
+    # Process reminder actions
+    reminder_responses = []
+    for ra in (nlp_response.reminder_actions or []):
+        done_before = len(reminder_responses)
+        try:
+            if ra.action == "create":
+                due_dt = None
+                if ra.due_date:
                     try:
-                        r_type = ReminderType(ra.type.upper())
+                        due_dt = datetime.fromisoformat(ra.due_date.replace("Z", "+00:00").replace("+00:00", ""))
                     except Exception:
-                        pass
-                    new_reminder = Reminder(
-                        user_id=current_user.id,
-                        title=ra.title,
-                        amount=ra.amount,
-                        due_date=due_dt,
-                        type=r_type,
-                        notes=ra.notes,
-                        is_paid=False,
-                    )
-                    db.add(new_reminder)
+                        due_dt = None
+                r_type = ReminderType.CUSTOM
+                try:
+                    r_type = ReminderType(ra.type.upper())
+                except Exception:
+                    pass
+                new_reminder = Reminder(
+                    user_id=user_id,
+                    title=ra.title,
+                    amount=ra.amount,
+                    due_date=due_dt,
+                    type=r_type,
+                    notes=ra.notes,
+                    is_paid=False,
+                )
+                db.add(new_reminder)
+                db.commit()
+                due_str = due_dt.strftime("%d %b %Y") if due_dt else "no due date"
+                reminder_responses.append(f"✅ Reminder added: '{ra.title}' — ₹{ra.amount} due {due_str}")
+
+            elif ra.action == "mark_paid":
+                # Find reminder by title match (case-insensitive)
+                match = db.query(Reminder).filter(
+                    Reminder.user_id == user_id,
+                    Reminder.title.ilike(f"%{ra.title}%"),
+                    Reminder.is_paid == False
+                ).first()
+                if match:
+                    match.is_paid = True
                     db.commit()
-                    due_str = due_dt.strftime("%d %b %Y") if due_dt else "no due date"
-                    reminder_responses.append(f"✅ Reminder added: '{ra.title}' — ₹{ra.amount} due {due_str}")
-
-                elif ra.action == "mark_paid":
-                    # Find reminder by title match (case-insensitive)
-                    match = db.query(Reminder).filter(
-                        Reminder.user_id == current_user.id,
-                        Reminder.title.ilike(f"%{ra.title}%"),
-                        Reminder.is_paid == False
-                    ).first()
-                    if match:
-                        match.is_paid = True
-                        db.commit()
-                        reminder_responses.append(f"✅ Marked '{match.title}' as paid!")
-                    else:
-                        reminder_responses.append(f"Couldn't find an unpaid reminder matching '{ra.title}'.")
-
-                elif ra.action == "delete":
-                    match = db.query(Reminder).filter(
-                        Reminder.user_id == current_user.id,
-                        Reminder.title.ilike(f"%{ra.title}%")
-                    ).first()
-                    if match:
-                        db.delete(match)
-                        db.commit()
-                        reminder_responses.append(f"🗑 Deleted reminder: '{match.title}'")
-                    else:
-                        reminder_responses.append(f"Couldn't find a reminder matching '{ra.title}'.")
-            except Exception as re:
-                reminder_responses.append(f"Error processing reminder: {str(re)}")
-
-        # Report/export action (download or email) — passed to the frontend to act on.
-        # Only actionable when both the action and a valid scope are present; otherwise
-        # force a scope clarification rather than guessing.
-        report_action = None
-        ra_obj = nlp_response.report_action
-        if ra_obj and ra_obj.action in ("email", "download"):
-            if ra_obj.scope in ("analysis", "transactions", "both"):
-                report_action = ra_obj.dict()
-            else:
-                nlp_response.ai_insight = "Do you want the analysis & insights, the full transaction table, or both?"
-
-        # Combine all responses
-        parts = []
-        if tx_response and tx_response != "No valid transactions found.":
-            parts.append(tx_response)
-        if reminder_responses:
-            parts.append("\n".join(reminder_responses))
-
-        if nlp_response.ai_insight:
-            final_insight = nlp_response.ai_insight
-            if parts:
-                return ChatResponse(response="\n\n".join(parts) + "\n\n" + final_insight, report_action=report_action)
-            else:
-                return ChatResponse(response=final_insight, report_action=report_action)
+                    reminder_responses.append(f"✅ Marked '{match.title}' as paid!")
+                else:
+                    reminder_responses.append(f"Couldn't find an unpaid reminder matching '{ra.title}'.")
+
+            elif ra.action == "delete":
+                match = db.query(Reminder).filter(
+                    Reminder.user_id == user_id,
+                    Reminder.title.ilike(f"%{ra.title}%")
+                ).first()
+                if match:
+                    db.delete(match)
+                    db.commit()
+                    reminder_responses.append(f"🗑 Deleted reminder: '{match.title}'")
+                else:
+                    reminder_responses.append(f"Couldn't find a reminder matching '{ra.title}'.")
+        except Exception as re:
+            reminder_responses.append(f"Error processing reminder: {str(re)}")
+        if len(reminder_responses) > done_before:
+            yield "reminder", {"action": ra.action, "title": ra.title, "message": reminder_responses[-1]}
+
+    # Report/export action (download or email) — passed to the frontend to act on.
+    # Only actionable when both the action and a valid scope are present; otherwise
+    # force a scope clarification rather than guessing.
+    report_action = None
+    ra_obj = nlp_response.report_action
+    if ra_obj and ra_obj.action in ("email", "download"):
+        if ra_obj.scope in ("analysis", "transactions", "both"):
+            report_action = ra_obj.dict()
+            yield "report_action", report_action
         else:
-            return ChatResponse(response="\n\n".join(parts) if parts else "Got it!", report_action=report_action)
+            nlp_response.ai_insight = "Do you want the analysis & insights, the full transaction table, or both?"
+
+    # Combine all responses
+    parts = []
+    if tx_response and tx_response != "No valid transactions found.":
+        parts.append(tx_response)
+    if reminder_responses:
+        parts.append("\n".join(reminder_responses))
+
+    if nlp_response.ai_insight:
+        final_insight = nlp_response.ai_insight
+        if parts:
+            yield "done", ChatResponse(response="\n\n".join(parts) + "\n\n" + final_insight, report_action=report_action)
+        else:
+            yield "done", ChatResponse(response=final_insight, report_action=report_action)
+    else:
+        yield "done", ChatResponse(response="\n\n".join(parts) if parts else "Got it!", report_action=report_action)
+
+
+def _apply_response(db: Session, user_id: int, sm: ExpenseStateMachine, active_cycle, nlp_response) -> ChatResponse:
+    """Apply the parsed transaction / reminder / report actions and build the reply."""
+    for _event, payload in _apply_actions(db, user_id, sm, active_cycle, nlp_response):
+        pass
+    return payload
+
 
+def _parser_info(path: str, fast, parse_ms: float) -> Dict[str, Any]:
+    return {
+        "path": path,
+        "rule": fast.rule if fast is not None else None,
+        "confidence": fast.confidence if fast is not None else None,
+        "parse_ms": parse_ms,
+        **fast_parser.stats(),
+        **response_cache.stats(),
+    }
+
+
+@router.post("/", response_model=ChatResponse)
+async def process_chat(req: ChatRequest, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    # DB work runs in the threadpool; the LLM round trip is awaited on the event
+    # loop, so a slow model call holds neither a worker thread nor a DB connection.
+    user_id = current_user.id
+    t0 = time.perf_counter()
+    fast = fast_parser.parse(req.message)
+    parse_ms = round((time.perf_counter() - t0) * 1000, 3)
+    sm, active_cycle, context, cache_key, cached = await run_in_threadpool(
+        _load_context, db, user_id, req if fast is None else None,
+    )
+
+    try:
+        if fast is not None:
+            # Simple command parsed locally — no LLM round trip
+            path, nlp_response = "fast", fast.response
+        elif cached is not None:
+            # Same question against the same financial state — reuse the answer
+            path, nlp_response = "cache", cached
+        else:
+            t0 = time.perf_counter()
+            path = "llm"
+            nlp_response = await parse_user_input(req.message, context.text, fit_history(req.chat_history), user_id)
+            parse_ms = round((time.perf_counter() - t0) * 1000, 3)
+            await run_in_threadpool(response_cache.put, user_id, cache_key, nlp_response)
+        response = await run_in_threadpool(_apply_response, db, user_id, sm, active_cycle, nlp_response)
+        response.parser = _parser_info(path, fast, parse_ms)
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+
+@router.post("/stream")
+async def stream_chat(req: ChatRequest, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Same pipeline as POST /api/chat/, streamed as Server-Sent Events:
+
+      start          {"path": "fast" | "cache" | "llm"}
+      token          {"text": ...}   pieces of the assistant's answer as the model writes them
+      transaction    one per transaction, after it is committed
+      reminder       one per reminder action, after it is committed
+      report_action  the download / email request for the frontend to act on
+      done           the full ChatResponse (same body as POST /api/chat/)
+      error          {"detail": ...} if the pipeline fails part-way
+    """
+    user_id = current_user.id
+    t0 = time.perf_counter()
+    fast = fast_parser.parse(req.message)
+    parse_ms = round((time.perf_counter() - t0) * 1000, 3)
+    sm, active_cycle, context, cache_key, cached = await run_in_threadpool(
+        _load_context, db, user_id, req if fast is None else None,
+    )
+    path = "fast" if fast is not None else "cache" if cached is not None else "llm"
+
+    async def events():
+        yield _sse("start", {"path": path})
+        try:
+            if path == "fast":
+                nlp_response, took_ms = fast.response, parse_ms
+            elif path == "cache":
+                nlp_response, took_ms = cached, parse_ms
+                if cached.ai_insight:
+                    yield _sse("token", {"text": cached.ai_insight})
+            else:
+                t0 = time.perf_counter()
+                async for kind, value in stream_user_input(req.message, context.text, fit_history(req.chat_history), user_id):
+                    if kind == "token":
+                        yield _sse("token", {"text": value})
+                    else:
+                        nlp_response = value
+                took_ms = round((time.perf_counter() - t0) * 1000, 3)
+                await run_in_threadpool(response_cache.put, user_id, cache_key, nlp_response)
+
+            # Each action commits in the threadpool and is reported before the next one runs
+            async for event, payload in iterate_in_threadpool(
+                _apply_actions(db, user_id, sm, active_cycle, nlp_response)
+            ):
+                if event == "done":
+                    payload.parser = _parser_info(path, fast, took_ms)
+                    payload = payload.model_dump()
+                yield _sse(event, payload)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No proxy buffering — nginx would otherwise hold the events until the end
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
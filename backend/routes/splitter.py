@@ -3,22 +3,17 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict
 import os
 import json
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 from collections import defaultdict
 
 from routes.auth import get_current_user
+import llm_gateway
+from llm_gateway import LLMUnavailable
 
 load_dotenv()
 
 router = APIRouter(prefix="/api/splitter", tags=["splitter"])
 
-client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", ""),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY", ""),
-    api_version=os.getenv("OPENAI_API_VERSION", "2024-12-01-preview"),
-)
-
 
 class SplitRequest(BaseModel):
     description: str
@@ -152,7 +147,7 @@ def compute_balances_and_settlements(
 
 
 @router.post("/analyze", response_model=SplitResponse)
-def analyze_split(req: SplitRequest, current_user: dict = Depends(get_current_user)):
+async def analyze_split(req: SplitRequest, current_user: dict = Depends(get_current_user)):
     if not req.description.strip():
         raise HTTPException(status_code=400, detail="Description cannot be empty")
 
@@ -190,7 +185,8 @@ Output JSON:
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
 
     try:
-        response = client.chat.completions.create(
+        response = await llm_gateway.complete(
+            "split", current_user.id,
             model=deployment_name,
             response_format={"type": "json_object"},
             messages=[
@@ -233,5 +229,8 @@ Output JSON:
 
     except HTTPException:
         raise
+    except LLMUnavailable as e:
+        print(f"Split analysis: {e}")
+        raise HTTPException(status_code=503, detail="The AI assistant is busy right now — please try again shortly.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM processing failed: {str(e)}")
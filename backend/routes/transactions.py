@@ -1,12 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+import anyio
+import base64
+import codecs
+import csv
+import io
+import itertools
+import json
+import os
+import re
 
-from database import get_db, Transaction, TransactionType, TransactionSource, Cycle, CycleStatus
+from database import get_db, SessionLocal, Transaction, TransactionType, TransactionSource, Cycle, CycleStatus
 from routes.auth import get_current_user
-from state_machine import ExpenseStateMachine
+from state_machine import ExpenseStateMachine, TxSnapshot
+import ledger
+import rollups
+import response_cache
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
 
@@ -25,7 +40,7 @@ class TransactionResponse(BaseModel):
     type: TransactionType
     category: Optional[str]
     amount: float
-    date: datetime
+    date: Optional[datetime]  # NULL on some legacy rows
     source: TransactionSource
     description: Optional[str]
 
@@ -43,6 +58,190 @@ def get_all_transactions(current_user: dict = Depends(get_current_user), db: Ses
         .all()
     )
 
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+class TransactionFilters(BaseModel):
+    cycle_id: Optional[int] = None
+    type: Optional[TransactionType] = None
+    category: Optional[str] = None
+    source: Optional[TransactionSource] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+def transaction_filters(
+    cycle_id: Optional[int] = None,
+    type: Optional[TransactionType] = None,
+    category: Optional[str] = None,
+    source: Optional[TransactionSource] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> TransactionFilters:
+    return TransactionFilters(
+        cycle_id=cycle_id, type=type, category=category, source=source,
+        min_amount=min_amount, max_amount=max_amount, date_from=date_from, date_to=date_to,
+    )
+
+def filtered_transactions(db: Session, user_id: int, f: TransactionFilters):
+    """The user's transactions narrowed by the server-side filters (date range is [from, to))."""
+    query = db.query(Transaction).join(Cycle).filter(Cycle.user_id == user_id)
+    if f.cycle_id:
+        query = query.filter(Transaction.cycle_id == f.cycle_id)
+    if f.type:
+        query = query.filter(Transaction.type == f.type)
+    if f.category:
+        query = query.filter(Transaction.category.ilike(f.category))
+    if f.source:
+        query = query.filter(Transaction.source == f.source)
+    if f.min_amount is not None:
+        query = query.filter(Transaction.amount >= f.min_amount)
+    if f.max_amount is not None:
+        query = query.filter(Transaction.amount <= f.max_amount)
+    if f.date_from:
+        query = query.filter(Transaction.date >= f.date_from)
+    if f.date_to:
+        query = query.filter(Transaction.date < f.date_to)
+    return query
+
+def encode_cursor(tx: Transaction) -> str:
+    raw = f"{tx.date.isoformat() if tx.date else ''}|{tx.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """(date or None for an undated row, id)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_str, tx_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return (datetime.fromisoformat(date_str) if date_str else None), int(tx_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_page(query, cursor: Optional[str], limit: int) -> dict:
+    """Newest-first page after `cursor`, seeking on (date, id) so deep pages cost
+    the same as the first one (no OFFSET scan). Legacy rows with no date come
+    after all dated ones, newest id first."""
+    c_date, c_id = decode_cursor(cursor) if cursor else (None, None)
+    rows = []
+    if cursor is None or c_date is not None:
+        dated = query.filter(Transaction.date.isnot(None))
+        if c_date is not None:
+            # The redundant `date <= c_date` gives the planner a range it can walk
+            # backwards on (cycle_id, date); with only the OR it sorts every older row.
+            dated = dated.filter(Transaction.date <= c_date, or_(
+                Transaction.date < c_date,
+                and_(Transaction.date == c_date, Transaction.id < c_id),
+            ))
+        rows = dated.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        undated = query.filter(Transaction.date.is_(None))
+        if cursor and c_date is None:
+            undated = undated.filter(Transaction.id < c_id)
+        rows += undated.order_by(Transaction.id.desc()).limit(limit + 1 - len(rows)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+        "has_more": has_more,
+    }
+
+@router.get("/page", response_model=TransactionPage)
+def get_transactions_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    filters: TransactionFilters = Depends(transaction_filters),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Keyset-paginated, filterable ledger. Pass `next_cursor` back as `cursor` for the next page."""
+    return keyset_page(filtered_transactions(db, current_user.id, filters), cursor, limit)
+
+@router.get("/count")
+def count_transactions(
+    filters: TransactionFilters = Depends(transaction_filters),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Number of transactions matching the same filters as /page (COUNT only, no rows loaded)."""
+    query = filtered_transactions(db, current_user.id, filters)
+    return {"count": query.with_entities(func.count(Transaction.id)).scalar() or 0}
+
+EXPORT_COLUMNS = ["id", "cycle_id", "type", "category", "amount", "date", "source", "description"]
+EXPORT_BATCH_SIZE = 1000
+
+def _export_lines(user_id: int, months: Optional[List[str]], fmt: str):
+    """Yield the export body in chunks straight off a server-side cursor, so memory
+    stays flat however long the history is. Uses its own session because the
+    body is produced after the endpoint has returned."""
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(*[getattr(Transaction, c) for c in EXPORT_COLUMNS])
+            .join(Cycle)
+            .filter(Cycle.user_id == user_id)
+        )
+        if months:
+            query = query.filter(rollups.months_filter(months))
+        rows = (
+            query.order_by(Transaction.date.asc(), Transaction.id.asc())
+            .execution_options(stream_results=True)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+        for i, row in enumerate(rows, 1):
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record["type"] = record["type"].value
+            record["source"] = record["source"].value if record["source"] else None
+            # Legacy rows may have no date: an empty CSV cell / JSON null
+            record["date"] = record["date"].isoformat() if record["date"] else None
+            if fmt == "csv":
+                writer.writerow([record[c] for c in EXPORT_COLUMNS])
+            else:
+                buf.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if i % EXPORT_BATCH_SIZE == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+    finally:
+        db.close()
+
+@router.get("/export")
+def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    months: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """Stream the user's full history as CSV or NDJSON. `months` takes the same
+    comma-separated "YYYY-MM" list as the report endpoints ("undated" selects
+    legacy rows without a date)."""
+    month_list = [m.strip() for m in (months or "").split(",") if m.strip()]
+    try:
+        for m in month_list:
+            if m != rollups.UNDATED_MONTH:
+                datetime.strptime(m, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="months must be comma-separated YYYY-MM values")
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"FinAI-Transactions-{datetime.utcnow().strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        _export_lines(current_user.id, month_list, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @router.get("", response_model=List[TransactionResponse])
 @router.get("/", response_model=List[TransactionResponse])
 def get_transactions(
@@ -79,19 +278,231 @@ def create_transaction(tx: TransactionCreate, current_user: dict = Depends(get_c
         description=tx.description
     )
     db.add(new_tx)
+    sm.apply_transaction_delta(cycle, new=TxSnapshot.of(new_tx))
     db.commit()
     db.refresh(new_tx)
     
-    sm.recalculate_cycle_aggregates(cycle)
-    
     return new_tx
 
+# ── Bulk import ────────────────────────────────────────────────────────────
+
+BULK_CHUNK_SIZE = 1000
+BULK_MAX_ERRORS = 500
+BULK_MAX_BYTES = int(float(os.getenv("BULK_MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+BULK_IMPORT_TYPES = (TransactionType.EXPENSE, TransactionType.INCOME, TransactionType.SALARY)
+
+_JSON_WS = re.compile(r"[ \t\n\r]*")
+
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+class BulkImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkRowError]
+    cycles_recalculated: List[int]
+
+def _iter_request_body(request: Request):
+    """The request body chunk by chunk, for a consumer running in the threadpool:
+    each chunk is awaited on the event loop as the worker asks for it."""
+    stream = request.stream()
+    while True:
+        try:
+            yield anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            return
+
+def _iter_text(chunks):
+    """Decode UTF-8 body chunks incrementally, enforcing BULK_MAX_BYTES."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            if size > BULK_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload is larger than {BULK_MAX_BYTES // (1024 * 1024)} MB")
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 text (CSV or a JSON array)")
+    if text:
+        yield text
+
+def _iter_lines(texts):
+    """Re-split decoded chunks into lines (with their newline) for csv.reader."""
+    tail = ""
+    for text in texts:
+        lines = (tail + text).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if tail:
+        yield tail
+
+def _iter_json_array(texts):
+    """Yield the elements of a JSON array as the body arrives; only the unparsed
+    tail of the body is held in memory."""
+    decoder = json.JSONDecoder()
+    texts = iter(texts)
+    buf, pos = "", 0
+
+    def more() -> bool:
+        nonlocal buf, pos
+        text = next(texts, None)
+        if text is None:
+            return False
+        buf, pos = buf[pos:] + text, 0
+        return True
+
+    def peek() -> str:
+        """Next non-whitespace character, "" at the end of the body."""
+        nonlocal pos
+        while True:
+            pos = _JSON_WS.match(buf, pos).end()
+            if pos < len(buf) or not more():
+                return buf[pos:pos + 1]
+
+    if peek() != "[":
+        raise HTTPException(status_code=400, detail="JSON body must be an array of transactions")
+    pos += 1
+    if peek() == "]":
+        pos += 1
+    else:
+        while True:
+            peek()
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if more():
+                    continue
+                raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+            if end == len(buf) and more():
+                continue  # a number or literal may go on in the next chunk
+            pos = end
+            yield record
+            separator = peek()
+            pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise HTTPException(status_code=400, detail="Invalid JSON: expected ',' or ']' after an array element")
+    if peek():
+        raise HTTPException(status_code=400, detail="Invalid JSON: extra data after the array")
+
+def _iter_bulk_rows(chunks, content_type: str):
+    """Yield raw row dicts from a CSV (header row + records) or a JSON array body,
+    parsing the body chunks as they arrive."""
+    texts = _iter_text(chunks)
+    first = next(texts, "")
+    texts = itertools.chain([first], texts)
+    is_json = "json" in content_type or first.lstrip().startswith(("[", "{"))
+    if "csv" in content_type or not is_json:
+        for record in csv.DictReader(_iter_lines(texts)):
+            # Empty CSV cells mean "not given", not an empty string
+            yield {k.strip(): (v.strip() or None) for k, v in record.items() if k and v is not None}
+    else:
+        yield from _iter_json_array(texts)
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+def bulk_import(db: Session, user_id: int, rows) -> BulkImportResponse:
+    """Validate rows one at a time and insert the good ones in chunks with
+    executemany. Cycle aggregates, envelope spend and the balance ledger are
+    recomputed once per affected cycle at the end instead of once per row.
+    Everything is committed once at the end, so a failure leaves no partial import."""
+    sm = ExpenseStateMachine(db, user_id)
+    owned_cycles = {cid for (cid,) in db.query(Cycle.id).filter(Cycle.user_id == user_id).all()}
+    default_cycle_id = None
+    touched, chunk, errors = set(), [], []
+    inserted = failed = 0
+
+    for row_no, raw in enumerate(rows, 1):
+        try:
+            if not isinstance(raw, dict):
+                raise ValueError("row must be an object")
+            tx = TransactionCreate(**raw)
+            if tx.type not in BULK_IMPORT_TYPES:
+                raise ValueError("type must be EXPENSE, INCOME or SALARY")
+            if tx.amount <= 0:
+                raise ValueError("amount must be positive")
+            if tx.cycle_id and tx.cycle_id not in owned_cycles:
+                raise ValueError(f"cycle {tx.cycle_id} not found")
+        except (ValidationError, ValueError, TypeError) as e:
+            failed += 1
+            if len(errors) < BULK_MAX_ERRORS:
+                msg = _validation_message(e) if isinstance(e, ValidationError) else str(e)
+                errors.append(BulkRowError(row=row_no, error=msg))
+            continue
+
+        cycle_id = tx.cycle_id
+        if not cycle_id:
+            if default_cycle_id is None:
+                default_cycle_id = sm.get_active_cycle(commit=False).id
+            cycle_id = default_cycle_id
+        touched.add(cycle_id)
+        chunk.append({
+            "cycle_id": cycle_id,
+            "type": tx.type,
+            "category": tx.category,
+            "amount": tx.amount,
+            "date": tx.date or datetime.utcnow(),
+            "source": tx.source,
+            "description": tx.description,
+        })
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            db.bulk_insert_mappings(Transaction, chunk)
+            inserted += len(chunk)
+            chunk = []
+
+    if chunk:
+        db.bulk_insert_mappings(Transaction, chunk)
+        inserted += len(chunk)
+
+    if inserted:
+        # bulk_insert_mappings skips the ORM flush hooks, so refresh the ledger,
+        # the monthly rollup and the chat response cache explicitly
+        ledger.rebuild_ledger(db, user_id)
+        rollups.backfill(db, user_id)
+        for cycle in db.query(Cycle).filter(Cycle.id.in_(touched)).all():
+            sm.recalculate_cycle_aggregates(cycle, commit=False)
+    db.commit()
+    if inserted:
+        response_cache.invalidate_user(user_id)
+
+    return BulkImportResponse(
+        inserted=inserted,
+        failed=failed,
+        errors=errors,
+        cycles_recalculated=sorted(touched),
+    )
+
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_create_transactions(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Import many transactions at once. Send a JSON array of TransactionCreate
+    objects, or CSV (Content-Type: text/csv) with the same field names as headers.
+    Invalid rows are skipped and reported by row number; the rest are inserted.
+    The body is parsed while it streams in, up to BULK_MAX_UPLOAD_MB (413 above)."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > BULK_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload is larger than {BULK_MAX_BYTES // (1024 * 1024)} MB")
+    rows = _iter_bulk_rows(_iter_request_body(request), request.headers.get("content-type", ""))
+    return await run_in_threadpool(bulk_import, db, current_user.id, rows)
+
 @router.put("/{tx_id}", response_model=TransactionResponse)
 def update_transaction(tx_id: int, tx: TransactionCreate, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     db_tx = db.query(Transaction).join(Cycle).filter(Transaction.id == tx_id, Cycle.user_id == current_user.id).first()
     if not db_tx:
         raise HTTPException(status_code=404, detail="Transaction not found")
         
+    old = TxSnapshot.of(db_tx)
     db_tx.type = tx.type
     db_tx.category = tx.category
     db_tx.amount = tx.amount
@@ -100,13 +511,11 @@ def update_transaction(tx_id: int, tx: TransactionCreate, current_user: dict = D
     db_tx.source = tx.source
     db_tx.description = tx.description
     
+    sm = ExpenseStateMachine(db, current_user.id)
+    sm.apply_transaction_delta(db_tx.cycle, old=old, new=TxSnapshot.of(db_tx))
     db.commit()
     db.refresh(db_tx)
     
-    sm = ExpenseStateMachine(db, current_user.id)
-    cycle = db.query(Cycle).filter(Cycle.id == db_tx.cycle_id).first()
-    sm.recalculate_cycle_aggregates(cycle)
-    
     return db_tx
 
 @router.delete("/{tx_id}")
@@ -115,12 +524,9 @@ def delete_transaction(tx_id: int, current_user: dict = Depends(get_current_user
     if not db_tx:
         raise HTTPException(status_code=404, detail="Transaction not found")
         
-    cycle_id = db_tx.cycle_id
+    sm = ExpenseStateMachine(db, current_user.id)
+    sm.apply_transaction_delta(db_tx.cycle, old=TxSnapshot.of(db_tx))
     db.delete(db_tx)
     db.commit()
     
-    sm = ExpenseStateMachine(db, current_user.id)
-    cycle = db.query(Cycle).filter(Cycle.id == cycle_id).first()
-    sm.recalculate_cycle_aggregates(cycle)
-    
     return {"message": "Transaction deleted successfully"}
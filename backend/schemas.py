@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import Optional, List
 from datetime import datetime
 from database import TransactionType, ReminderType
@@ -34,3 +34,6 @@ class NLPResponse(BaseModel):
     general_query: Optional[str] = Field(None, description="Question the user is asking")
     clarification_needed: Optional[str] = Field(None, description="Question to ask user if ambiguous")
     ai_insight: Optional[str] = Field(None, description="Conversational reply or data answer")
+    # True on nlp_engine's canned replies for when the model is unreachable or its
+    # output unusable — shown to the user, never cached
+    _fallback: bool = PrivateAttr(default=False)
@@ -1,7 +1,29 @@
 from sqlalchemy.orm import Session
+from typing import NamedTuple, Optional
 from database import Cycle, Transaction, CycleStatus, TransactionType, TransactionSource
 from schemas import NLPResponse, NLPTransaction
 from datetime import datetime
+import ledger
+from rollups import normalize_category  # (importing rollups registers its flush hooks)
+
+
+class TxSnapshot(NamedTuple):
+    """The fields of a transaction that feed cycle aggregates, captured before a change."""
+    type: TransactionType
+    category: Optional[str]
+    amount: float
+
+    @classmethod
+    def of(cls, tx: Transaction) -> "TxSnapshot":
+        return cls(tx.type, tx.category, tx.amount)
+
+
+def envelopes_by_name(budgets) -> dict:
+    """Normalised envelope name → the first (lowest id) envelope with that name."""
+    by_name = {}
+    for b in budgets:
+        by_name.setdefault(normalize_category(b.category_name), b)
+    return by_name
 
 
 class ExpenseStateMachine:
@@ -9,8 +31,9 @@ class ExpenseStateMachine:
         self.db = db
         self.user_id = user_id
 
-    def get_active_cycle(self) -> Cycle:
-        """Get or create the single persistent cycle for the user."""
+    def get_active_cycle(self, commit: bool = True) -> Cycle:
+        """Get or create the single persistent cycle for the user.
+        `commit=False` only flushes a new cycle, leaving the commit to the caller."""
         cycle = self.db.query(Cycle).filter(
             Cycle.user_id == self.user_id,
             Cycle.status != CycleStatus.CLOSED
@@ -19,8 +42,11 @@ class ExpenseStateMachine:
         if not cycle:
             cycle = Cycle(user_id=self.user_id, status=CycleStatus.ACTIVE)
             self.db.add(cycle)
-            self.db.commit()
-            self.db.refresh(cycle)
+            if commit:
+                self.db.commit()
+                self.db.refresh(cycle)
+            else:
+                self.db.flush()
         return cycle
 
     def calculate_current_balance(self, cycle: Cycle) -> float:
@@ -31,45 +57,77 @@ class ExpenseStateMachine:
         When you allocate ₹10,000 to food → free balance drops by ₹10,000.
         When you spend ₹800 from food envelope → balance unchanged (₹800 moves from locked→spent).
         When you spend ₹500 outside any envelope → free balance drops by ₹500.
-        """
-        from database import CategoryBudget
-        txs = self.db.query(Transaction).join(Cycle).filter(Cycle.user_id == self.user_id).all()
-        total_income = sum(t.amount for t in txs if t.type in (TransactionType.INCOME, TransactionType.SALARY))
-        total_expense = sum(t.amount for t in txs if t.type == TransactionType.EXPENSE)
-
-        # Locked money: allocated to envelopes but not yet spent
-        active_cycle = self.get_active_cycle()
-        budgets = self.db.query(CategoryBudget).filter(CategoryBudget.cycle_id == active_cycle.id).all()
-        total_locked = sum(max(0.0, b.allocated_amount - b.spent_amount) for b in budgets)
 
-        return total_income - total_expense - total_locked
+        Read from the user's BalanceLedger (kept current on every write), so this
+        no longer scans the transaction history.
+        """
+        return ledger.get_balance(self.db, self.user_id)
 
 
-    def recalculate_cycle_aggregates(self, cycle: Cycle):
-        """Recalculate cycle aggregates from all transactions (across all of user's cycles)."""
-        from database import CategoryBudget
-        # Reset
+    def recalculate_cycle_aggregates(self, cycle: Cycle, commit: bool = True):
+        """Full rebuild: reset the cycle totals and envelope spend, then replay every
+        transaction of the cycle. Envelopes are matched through envelopes_by_name, the
+        same lookup apply_transaction_delta uses, so this is O(transactions + budgets).
+        Use it for repairs and bulk writes; single-row writes should use
+        apply_transaction_delta. `commit=False` leaves the commit to the caller."""
         cycle.total_expenses = 0.0
         cycle.total_income_other_than_salary = 0.0
+        cycle.salary_amount = 0.0
 
-        budgets = self.db.query(CategoryBudget).filter(CategoryBudget.cycle_id == cycle.id).all()
+        budgets = self._budgets(cycle)
         for b in budgets:
             b.spent_amount = 0.0
+        by_name = envelopes_by_name(budgets)
+
+        rows = self.db.query(Transaction.type, Transaction.category, Transaction.amount).filter(
+            Transaction.cycle_id == cycle.id
+        ).all()
+        for tx_type, category, amount in rows:
+            if tx_type == TransactionType.EXPENSE:
+                cycle.total_expenses += amount
+                cat_budget = by_name.get(normalize_category(category)) if category else None
+                if cat_budget:
+                    cat_budget.spent_amount += amount
+            elif tx_type == TransactionType.INCOME:
+                cycle.total_income_other_than_salary += amount
+            elif tx_type == TransactionType.SALARY:
+                cycle.salary_amount += amount
 
-        txs = self.db.query(Transaction).filter(Transaction.cycle_id == cycle.id).all()
-        for tx in txs:
-            if tx.type == TransactionType.EXPENSE:
-                cycle.total_expenses += tx.amount
-                if tx.category:
-                    cat_budget = next((b for b in budgets if b.category_name.lower() == tx.category.lower()), None)
-                    if cat_budget:
-                        cat_budget.spent_amount += tx.amount
-            elif tx.type == TransactionType.INCOME:
-                cycle.total_income_other_than_salary += tx.amount
-            elif tx.type == TransactionType.SALARY:
-                cycle.salary_amount += tx.amount
+        if commit:
+            self.db.commit()
 
-        self.db.commit()
+    def apply_transaction_delta(self, cycle: Cycle, old: "TxSnapshot" = None, new: "TxSnapshot" = None):
+        """Incremental update: undo `old` and apply `new` (either may be None for a
+        create or a delete) on the cycle totals and the matching envelope only.
+        Stored rows are adjusted with SQL-side increments (`total_expenses + :d`), so
+        concurrent writes to the same cycle don't lose each other's change; the
+        attributes reload after the commit. Both snapshots must belong to `cycle`.
+        Does not commit — the caller commits together with the row change."""
+        for snap, sign in ((old, -1), (new, 1)):
+            if snap is None:
+                continue
+            amount = sign * (snap.amount or 0.0)
+            if snap.type == TransactionType.EXPENSE:
+                ledger.increment(cycle, "total_expenses", amount)
+                cat_budget = self._budget_for(cycle, snap.category)
+                if cat_budget:
+                    ledger.increment(cat_budget, "spent_amount", amount)
+            elif snap.type == TransactionType.INCOME:
+                ledger.increment(cycle, "total_income_other_than_salary", amount)
+            elif snap.type == TransactionType.SALARY:
+                ledger.increment(cycle, "salary_amount", amount)
+
+    def _budgets(self, cycle: Cycle) -> list:
+        from database import CategoryBudget
+        return self.db.query(CategoryBudget).filter(
+            CategoryBudget.cycle_id == cycle.id
+        ).order_by(CategoryBudget.id).all()
+
+    def _budget_for(self, cycle: Cycle, category: str):
+        """Envelope matching `category`, looked up exactly as the rebuild path does."""
+        if not category:
+            return None
+        return envelopes_by_name(self._budgets(cycle)).get(normalize_category(category))
 
     def process_nlp_response(self, nlp_res: NLPResponse, cycle: Cycle) -> str:
         if nlp_res.clarification_needed:
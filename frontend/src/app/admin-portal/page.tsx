@@ -14,13 +14,12 @@ interface UserSummary {
     transaction_count: number; envelope_count: number; reminder_count: number;
 }
 interface TxRow { id: number; type: string; category: string | null; amount: number; source: string; description: string | null; date: string; }
-interface UserDetail {
-    id: number; username: string; created_at: string;
-    total_income: number; total_expenses: number; available_balance: number;
-    transactions: TxRow[];
-    envelopes: { id: number; category: string; allocated: number; spent: number; remaining: number; }[];
-    reminders: { id: number; title: string; amount: number; type: string; due_date: string | null; is_paid: boolean; }[];
-}
+interface EnvelopeRow { id: number; category: string; allocated: number; spent: number; remaining: number; }
+interface ReminderRow { id: number; title: string; amount: number; type: string; due_date: string | null; is_paid: boolean; }
+interface Page<T> { items: T[]; next_cursor: string | null; has_more: boolean; }
+type DetailTab = 'transactions' | 'envelopes' | 'reminders';
+interface DetailRows { transactions: Page<TxRow> | null; envelopes: Page<EnvelopeRow> | null; reminders: Page<ReminderRow> | null; }
+const NO_ROWS: DetailRows = { transactions: null, envelopes: null, reminders: null };
 
 const TYPE_COLORS: Record<string, string> = {
     INCOME: 'bg-emerald-500/20 text-emerald-400 ring-1 ring-emerald-500/30',
@@ -34,9 +33,12 @@ export default function AdminPortalPage() {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [expanded, setExpanded] = useState<number | null>(null);
-    const [detail, setDetail] = useState<UserDetail | null>(null);
+    const [detail, setDetail] = useState<UserSummary | null>(null);
     const [detailLoading, setDetailLoading] = useState(false);
-    const [activeTab, setActiveTab] = useState<'transactions' | 'envelopes' | 'reminders'>('transactions');
+    const [activeTab, setActiveTab] = useState<DetailTab>('transactions');
+    // Detail rows are fetched per tab, one page at a time
+    const [rows, setRows] = useState<DetailRows>(NO_ROWS);
+    const [rowsLoading, setRowsLoading] = useState(false);
 
     // Create user form
     const [showCreate, setShowCreate] = useState(false);
@@ -65,13 +67,49 @@ export default function AdminPortalPage() {
 
     useEffect(() => { fetchUsers(); }, []);
 
+    const loadRows = async (id: number, tab: DetailTab, more = false) => {
+        const current = rows[tab];
+        if (!more && current) return;
+        setRowsLoading(true);
+        try {
+            const params = more && current?.next_cursor ? { cursor: current.next_cursor } : {};
+            const r = await api.get(`/admin/users/${id}/${tab}`, { params });
+            setRows(prev => {
+                const before = more ? prev[tab] : null;
+                return { ...prev, [tab]: { ...r.data, items: [...(before?.items || []), ...r.data.items] } };
+            });
+        } finally { setRowsLoading(false); }
+    };
+
+    const openTab = (tab: DetailTab) => {
+        setActiveTab(tab);
+        if (expanded !== null) loadRows(expanded, tab);
+    };
+
     const toggleUser = async (id: number) => {
+        setRows(NO_ROWS);
         if (expanded === id) { setExpanded(null); setDetail(null); return; }
         setExpanded(id); setDetailLoading(true); setActiveTab('transactions');
-        try { const r = await api.get(`/admin/users/${id}`); setDetail(r.data); }
+        try {
+            const [header, txs] = await Promise.all([
+                api.get(`/admin/users/${id}`),
+                api.get(`/admin/users/${id}/transactions`),
+            ]);
+            setDetail(header.data);
+            setRows({ ...NO_ROWS, transactions: txs.data });
+        }
         finally { setDetailLoading(false); }
     };
 
+    const loadMore = (tab: DetailTab) => rows[tab]?.has_more && expanded !== null && (
+        <div className="border-t border-gray-800 px-4 py-2 text-center">
+            <button onClick={() => loadRows(expanded, tab, true)} disabled={rowsLoading}
+                className="text-xs font-medium text-blue-400 hover:text-blue-300 disabled:opacity-50">
+                {rowsLoading ? 'Loading…' : 'Load more'}
+            </button>
+        </div>
+    );
+
     const handleCreate = async (e: React.FormEvent) => {
         e.preventDefault(); setCreating(true);
         try {
@@ -308,13 +346,13 @@ export default function AdminPortalPage() {
                                                             <div className="space-y-4">
                                                                 <div className="flex gap-2">
                                                                     {(['transactions', 'envelopes', 'reminders'] as const).map(tab => (
-                                                                        <button key={tab} onClick={() => setActiveTab(tab)}
+                                                                        <button key={tab} onClick={() => openTab(tab)}
                                                                             className={`px-4 py-1.5 text-sm font-medium rounded-lg transition-all ${activeTab === tab
                                                                                 ? 'bg-red-500/20 text-red-400 ring-1 ring-red-500/40'
                                                                                 : 'text-gray-400 hover:text-gray-200 hover:bg-gray-800'}`}>
                                                                             {tab.charAt(0).toUpperCase() + tab.slice(1)}
                                                                             <span className="ml-1.5 text-[11px] opacity-60">
-                                                                                ({tab === 'transactions' ? detail.transactions.length : tab === 'envelopes' ? detail.envelopes.length : detail.reminders.length})
+                                                                                ({tab === 'transactions' ? detail.transaction_count : tab === 'envelopes' ? detail.envelope_count : detail.reminder_count})
                                                                             </span>
                                                                         </button>
                                                                     ))}
@@ -328,8 +366,8 @@ export default function AdminPortalPage() {
                                                                                     <tr>{['Date', 'Type', 'Category', 'Source', 'Amount', 'Description'].map(h => <th key={h} className="px-4 py-2 text-left text-gray-500 font-medium">{h}</th>)}</tr>
                                                                                 </thead>
                                                                                 <tbody className="divide-y divide-gray-800/50">
-                                                                                    {detail.transactions.length === 0 && <tr><td colSpan={6} className="px-4 py-6 text-center text-gray-600">No transactions</td></tr>}
-                                                                                    {detail.transactions.map(t => (
+                                                                                    {rows.transactions?.items.length === 0 && <tr><td colSpan={6} className="px-4 py-6 text-center text-gray-600">No transactions</td></tr>}
+                                                                                    {rows.transactions?.items.map(t => (
                                                                                         <tr key={t.id} className="hover:bg-gray-800/30">
                                                                                             <td className="px-4 py-2 text-gray-500 whitespace-nowrap">{t.date}</td>
                                                                                             <td className="px-4 py-2"><span className={`px-1.5 py-0.5 rounded text-xs font-semibold ${TYPE_COLORS[t.type] || 'bg-gray-700 text-gray-300'}`}>{t.type}</span></td>
@@ -342,6 +380,7 @@ export default function AdminPortalPage() {
                                                                                 </tbody>
                                                                             </table>
                                                                         </div>
+                                                                        {loadMore('transactions')}
                                                                     </div>
                                                                 )}
 
@@ -350,8 +389,8 @@ export default function AdminPortalPage() {
                                                                         <table className="w-full text-xs">
                                                                             <thead className="bg-gray-900"><tr>{['Category', 'Allocated', 'Spent', 'Remaining', 'Progress'].map(h => <th key={h} className="px-4 py-2 text-left text-gray-500 font-medium">{h}</th>)}</tr></thead>
                                                                             <tbody className="divide-y divide-gray-800/50">
-                                                                                {detail.envelopes.length === 0 && <tr><td colSpan={5} className="px-4 py-6 text-center text-gray-600">No envelopes</td></tr>}
-                                                                                {detail.envelopes.map(e => {
+                                                                                {rows.envelopes?.items.length === 0 && <tr><td colSpan={5} className="px-4 py-6 text-center text-gray-600">No envelopes</td></tr>}
+                                                                                {rows.envelopes?.items.map(e => {
                                                                                     const pct = e.allocated > 0 ? Math.min(100, (e.spent / e.allocated) * 100) : 0;
                                                                                     return (<tr key={e.id} className="hover:bg-gray-800/30">
                                                                                         <td className="px-4 py-2 capitalize font-medium text-gray-200">{e.category}</td>
@@ -363,6 +402,7 @@ export default function AdminPortalPage() {
                                                                                 })}
                                                                             </tbody>
                                                                         </table>
+                                                                        {loadMore('envelopes')}
                                                                     </div>
                                                                 )}
 
@@ -371,8 +411,8 @@ export default function AdminPortalPage() {
                                                                         <table className="w-full text-xs">
                                                                             <thead className="bg-gray-900"><tr>{['Title', 'Type', 'Amount', 'Due', 'Status'].map(h => <th key={h} className="px-4 py-2 text-left text-gray-500 font-medium">{h}</th>)}</tr></thead>
                                                                             <tbody className="divide-y divide-gray-800/50">
-                                                                                {detail.reminders.length === 0 && <tr><td colSpan={5} className="px-4 py-6 text-center text-gray-600">No reminders</td></tr>}
-                                                                                {detail.reminders.map(r => (
+                                                                                {rows.reminders?.items.length === 0 && <tr><td colSpan={5} className="px-4 py-6 text-center text-gray-600">No reminders</td></tr>}
+                                                                                {rows.reminders?.items.map(r => (
                                                                                     <tr key={r.id} className="hover:bg-gray-800/30">
                                                                                         <td className="px-4 py-2 font-medium text-gray-200">{r.title}</td>
                                                                                         <td className="px-4 py-2 text-gray-500">{r.type}</td>
@@ -387,6 +427,7 @@ export default function AdminPortalPage() {
                                                                                 ))}
                                                                             </tbody>
                                                                         </table>
+                                                                        {loadMore('reminders')}
                                                                     </div>
                                                                 )}
                                                             </div>